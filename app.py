@@ -1,57 +1,154 @@
 import streamlit as st
-from gtts import gTTS
 import io
-from deep_translator import GoogleTranslator
-import pdfplumber  # Alternative PDF text extraction
+import os
 from PIL import Image  # To open image files
-import requests
-from bs4 import BeautifulSoup
+from jobs import JobQueue, conversion_key
+import tts_client
 
-# Function to convert text to speech using gTTS
-def generate_audio_gtts(translated_text, selected_language, speech_speed):
-    tts = gTTS(text=translated_text, lang=selected_language, slow=speech_speed)
-    
-    # Save the generated audio to a buffer
-    audio_buffer = io.BytesIO()
-    tts.write_to_fp(audio_buffer)
-    audio_buffer.seek(0)  # Reset buffer pointer for playback
-
-    return audio_buffer
-
-# Function to translate text using deep-translator
-def translate_text(input_text, target_language):
-    translated_text = GoogleTranslator(source='auto', target=target_language).translate(input_text)
-    return translated_text
-
-# Function to extract text from a PDF file using pdfplumber
-def extract_text_from_pdf(pdf_file):
-    with pdfplumber.open(pdf_file) as pdf:
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text()  # Extract text from each page
-    return text
-
-# Placeholder for image processing (without OCR for now)
+# The extraction, translation and speech synthesis run in the headless service (tts_service.py);
+# this page only collects the input and plays the result. Set TTS_SERVICE_URL to use a separate
+# service process, otherwise one is started inside this Streamlit process.
+
+# Speculative conversion: once the input, language and speed are set, the conversion starts in the
+# background, so pressing Convert usually finds the audio ready. It converts texts nobody may ask
+# for, so it is off unless TTS_SPECULATIVE=1.
+SPECULATIVE_MODE = os.environ.get("TTS_SPECULATIVE", "0") == "1"
+# Characters each session may convert speculatively, so users who try many inputs do not
+# crowd out real conversions
+SPECULATIVE_BUDGET_CHARS = int(os.environ.get("TTS_SPECULATIVE_BUDGET_CHARS", "20000"))
+# Seconds a speculative conversion waits before starting, in case the user is still choosing
+SPECULATIVE_DELAY = 1.5
+
+# Function to extract text from a PDF file through the service, page by page
+def extract_text_from_pdf(pdf_file, on_page=None):
+    return tts_client.extract(pdf=pdf_file.getvalue(), on_text=on_page)
+
+# Function to extract text from an image through the service
 def extract_text_from_image(image_file):
-    return "Image text extraction feature is not available in this environment."
+    return tts_client.extract(image=image_file.getvalue())
 
 # Function to fetch and validate text length from URL
 def fetch_text_from_url(url):
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            text = soup.get_text()
-            if len(text) > 5000:
-                st.error("The content fetched from the URL exceeds 5000 characters. Please provide a shorter article.")
-                return None
-            return text
-        else:
-            st.error("Failed to fetch content from the URL. Please check the link and try again.")
-            return None
-    except Exception as e:
-        st.error(f"Error fetching text from URL: {e}")
+        return tts_client.extract(url=url)
+    except tts_client.ServiceError as e:
+        st.error(str(e))
+        return None
+
+# One conversion queue per server process, shared by every user session
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+# Conversion job body, run on the queue's worker pool; streams the conversion from the service
+# and reports progress through job.update
+def run_conversion(job, input_text, target_language_code, slow):
+    converted_chars = 0
+
+    def on_text(translated_block):
+        nonlocal converted_chars
+        converted_chars += len(translated_block)
+        # Translations are about as long as their source, which is close enough for a progress bar
+        job.update(min(0.95, converted_chars / max(1, len(input_text))), "Converting the text to speech...")
+
+    job.update(0.05, "Translating the text...")
+    translated_text, audio_bytes = tts_client.convert(input_text, target_language_code, slow, on_text=on_text)
+    return {"translated_text": translated_text, "audio": audio_bytes}
+
+# Speculative job body: wait a moment (a change of language or speed cancels the job meanwhile,
+# and pressing Convert ends the wait), then run the conversion as if Convert had been pressed
+def run_speculation(job, input_text, target_language_code, slow):
+    job.hold(SPECULATIVE_DELAY)
+    job.update(0.0, "Preparing the audio...")
+    return run_conversion(job, input_text, target_language_code, slow)
+
+# Start converting the current input and options in the background, cancelling the previous
+# speculative conversion of this session if they changed
+def speculate(input_text, target_language_code, slow):
+    key = conversion_key(input_text, target_language_code, slow=slow) if input_text else None
+    current = st.session_state.get("speculative_job")
+    if current is not None and current[0] != key:
+        job = get_job_queue().get(current[1])
+        if job is not None:
+            get_job_queue().cancel_speculative(job)
+        del st.session_state["speculative_job"]
+        current = None
+    if key is None or current is not None:
+        return
+    converted = get_job_queue().get(st.session_state.get("conversion_job"))
+    if converted is not None and converted.key == key and converted.status != "cancelled":
+        return  # Already converted, or being converted, for this session
+
+    spent = st.session_state.get("speculative_chars", 0)
+    if spent + len(input_text) > SPECULATIVE_BUDGET_CHARS:
+        return
+    job, created = get_job_queue().speculate(key, run_speculation, input_text, target_language_code, slow)
+    # Joining a conversion that is already queued or running costs nothing extra
+    if created:
+        st.session_state["speculative_chars"] = spent + len(input_text)
+    st.session_state["speculative_job"] = (key, job.id)
+
+# The job for key, reusing this session's speculative conversion when it has already finished
+# (a running one is joined by JobQueue.submit)
+def submit_conversion(key, input_text, target_language_code, slow):
+    current = st.session_state.pop("speculative_job", None)
+    if current is not None and current[0] == key:
+        job = get_job_queue().get(current[1])
+        if job is not None and job.status == "done":
+            return job
+    return get_job_queue().submit(key, run_conversion, input_text, target_language_code, slow)
+
+# Show the result of the conversion job, or its progress while it is still running
+def show_conversion(job_id, selected_language):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return
+    if not job.finished:
+        st.progress(job.progress, text=f"⏳ {job.message}")
+    elif job.status == "failed":
+        st.error(f"🚨 Error generating audio: {job.error}")
+    elif job.status == "done":
+        # Play audio directly from memory
+        # gTTS returns MP3
+        st.audio(io.BytesIO(job.result["audio"]), format='audio/mpeg')
+        st.write(f"🗣️ **Translated Text ({selected_language}):** {job.result['translated_text']}")
+
+# Sections of a long document never change once written, so each is downloaded once
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_section_audio(doc_id, file_name, text_digest):
+    return tts_client.document_file(doc_id, file_name)
+
+# Show the sections of a long document converted so far, each with its own player
+def show_document(doc_id):
+    try:
+        document = tts_client.document_status(doc_id)
+    except tts_client.ServiceError as e:
+        st.error(str(e))
         return None
+    if document["status"] in ("queued", "running"):
+        st.progress(document["progress"], text=f"⏳ {document['message']}")
+    elif document["status"] == "failed":
+        st.error(f"🚨 Error generating audio: {document.get('error', document['message'])}. Press Convert again to continue where it stopped.")
+    elif document["status"] == "stopped":
+        st.warning("⚠️ The conversion was interrupted. Press Convert again to continue where it stopped.")
+    for section in document["sections"]:
+        st.write(f"🔈 **{section['index']}. {section['title']}**")
+        st.audio(io.BytesIO(load_section_audio(doc_id, section["file"], section["text_digest"])), format='audio/mpeg')
+    return document
+
+@st.fragment(run_every=2)
+def poll_document(doc_id):
+    document = show_document(doc_id)
+    if document is None or document["status"] not in ("queued", "running"):
+        st.rerun()
+
+# Poll a running job without rerunning the whole page; rerun the page once it has finished
+@st.fragment(run_every=0.5)
+def poll_conversion(job_id, selected_language):
+    job = get_job_queue().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    show_conversion(job_id, selected_language)
 
 def main():
     # Streamlit app layout with accessibility in mind
@@ -70,38 +167,49 @@ def main():
     # Input method selection
     input_option = st.radio("**Choose how you want to input your text:**", ("✍️ Type/Paste Text", "📄 Upload PDF", "📸 Upload Image", "🌐 Enter URL"))
 
+    # Long documents are converted section by section in the background, with one player per section
+    long_mode = input_option != "📸 Upload Image" and st.toggle("📚 **Long document mode**", help="For booklets and long articles: the audio is made section by section, and you can listen to the first sections while the rest is converted.")
+
     input_text = ""
+    pdf_file = None
+    url = None
 
     if input_option == "✍️ Type/Paste Text":
         # Input text box with larger placeholder text for readability
-        input_text = st.text_area("📝 **Type or Paste your text here**", height=200, max_chars=1000, placeholder="Paste or type your text here...", help="Enter the text you want to convert into speech.")
+        input_text = st.text_area("📝 **Type or Paste your text here**", height=200, max_chars=None if long_mode else 1000, placeholder="Paste or type your text here...", help="Enter the text you want to convert into speech.")
     
     elif input_option == "📄 Upload PDF":
         # File uploader for PDF
         pdf_file = st.file_uploader("📄 **Upload a PDF file**", type=["pdf"])
-        if pdf_file is not None:
-            input_text = extract_text_from_pdf(pdf_file)
+        if pdf_file is not None and not long_mode:
             st.write("**Extracted text from PDF:**")
-            st.write(input_text)
+            # Show each page as soon as it has been extracted
+            try:
+                input_text = extract_text_from_pdf(pdf_file, on_page=st.write)
+            except tts_client.ServiceError as e:
+                st.error(str(e))
     
     elif input_option == "📸 Upload Image":
-        # Caution: Image to Text extraction won't work in the Streamlit Cloud environment
-        st.warning("⚠️ **Note:** Image text extraction (OCR) is not supported in the current Streamlit environment.")
+        # Text is read with OCR on the service; a sharp, well-lit photo of the page works best
+        st.info("💡 **Tip:** Take the photo straight on, in good light, with the whole page in view.")
         image_file = st.file_uploader("📸 **Upload an image file**", type=["png", "jpg", "jpeg"])
         if image_file is not None:
-            input_text = extract_text_from_image(image_file)
-            st.write("**Extracted text from image:**")
-            st.write(input_text)
+            try:
+                input_text = extract_text_from_image(image_file)
+                st.write("**Extracted text from image:**")
+                st.write(input_text)
+            except tts_client.ServiceError as e:
+                st.error(str(e))
 
     elif input_option == "🌐 Enter URL":
         # URL input field
         url = st.text_input("🌐 **Enter the URL of the article or document**")
-        if url:
+        if url and not long_mode:
             input_text = fetch_text_from_url(url)
             if input_text:
                 st.write("**Extracted text from URL:**")
                 st.write(input_text)
-            st.markdown("⚠️ **Note:** If you're inputting text from a URL, ensure the content does not exceed 5000 characters. Long texts or articles may cause errors.")
+            st.markdown("⚠️ **Note:** If you're inputting text from a URL, ensure the content does not exceed 5000 characters. For longer articles, turn on long document mode.")
 
     # Language selection for translation with correct language codes
     language_options = {
@@ -121,29 +229,55 @@ def main():
     # Speech speed slider
     speech_speed = st.slider("⏩ **Select Speech Speed**:", min_value=0.5, max_value=1.5, value=1.0, step=0.1, help="Adjust the speed of the speech (slower or faster).")
 
+    target_language_code = language_options[selected_language]
+    slow = speech_speed < 1.0
+    if SPECULATIVE_MODE and not long_mode:
+        speculate(input_text, target_language_code, slow)
+
     # Convert button
     if st.button("🔊 **Convert to Speech**"):
-        if input_text:
+        if long_mode and (input_text or pdf_file is not None or url):
+            # Sending the same document again resumes its conversion where it stopped
             try:
-                # Translate the text to the selected language
-                target_language_code = language_options[selected_language]
-                translated_text = translate_text(input_text, target_language_code)
-
-                # Generate audio using gTTS
-                audio_buffer = generate_audio_gtts(translated_text, target_language_code, speech_speed < 1.0)
+                st.session_state["document_id"] = tts_client.start_document(
+                    target_language_code, slow,
+                    pdf=pdf_file.getvalue() if pdf_file is not None else None, text=input_text or None, url=url or None,
+                )
+                st.session_state.pop("conversion_job", None)
+            except tts_client.ServiceError as e:
+                st.error(str(e))
+        elif input_text:
+            # Queue the conversion; identical requests from other users share the same job
+            job = submit_conversion(conversion_key(input_text, target_language_code, slow=slow), input_text, target_language_code, slow)
+            st.session_state["conversion_job"] = job.id
+            st.session_state.pop("document_id", None)
+        else:
+            st.warning("⚠️ **Please enter or upload some text.**")
+            st.session_state.pop("conversion_job", None)
+            st.session_state.pop("document_id", None)
 
-                # Play audio directly from memory
-                st.audio(audio_buffer, format='audio/wav')
-                st.write(f"🗣️ **Translated Text ({selected_language}):** {translated_text}")
+    doc_id = st.session_state.get("document_id")
+    if doc_id is not None:
+        try:
+            running = tts_client.document_status(doc_id)["status"] in ("queued", "running")
+        except tts_client.ServiceError:
+            running = False
+        if running:
+            poll_document(doc_id)
+        else:
+            show_document(doc_id)
 
-            except Exception as e:
-                st.error(f"🚨 Error generating audio: {e}")
+    job_id = st.session_state.get("conversion_job")
+    if job_id is not None:
+        job = get_job_queue().get(job_id)
+        if job is not None and not job.finished:
+            poll_conversion(job_id, selected_language)
         else:
-            st.warning("⚠️ **Please enter or upload some text.**")
+            show_conversion(job_id, selected_language)
 
     # Funky Instructions with emojis and clearer explanation
     st.markdown("### 📜 **Instructions:**")
-    st.markdown("1. ✍️ **Choose how to input your text:** Type, upload a PDF, upload an image (OCR not supported), or enter a URL.")
+    st.markdown("1. ✍️ **Choose how to input your text:** Type, upload a PDF, upload a photo of a page or letter, or enter a URL.")
     st.markdown("2. 🌍 **Select your target language** for translation.")
     st.markdown("3. 🔊 **Click 'Convert to Speech'** to translate the text and listen to the audio!")
 
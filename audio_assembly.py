@@ -0,0 +1,98 @@
+import numpy as np
+
+# Joins generated speech segments into one document-length signal. Each segment is trimmed of
+# its leading and trailing silence and crossfaded into a single preallocated float32 buffer as
+# soon as it arrives, so the segments never have to be held in a list and concatenated. Every
+# segment is brought to the same speech loudness for the whole document, instead of being
+# peak-normalized on its own (which left quiet and loud sentences jumping in level).
+
+# Target speech level: RMS of the non-silent frames, in dB relative to full scale
+TARGET_LOUDNESS_DB = -18.0
+# Highest sample value after the loudness gain, to leave headroom for the encoder
+PEAK_LIMIT = 0.98
+# Frames quieter than this, relative to the loudest frame of the segment, are silence
+SILENCE_THRESHOLD_DB = -40.0
+# Frame length for the loudness and silence measurements
+FRAME_MS = 20
+# Silence kept around the speech of each segment, which becomes the pause between sentences
+KEEP_SILENCE_MS = 120
+# Length of the equal-power crossfade at every join
+CROSSFADE_MS = 30
+
+# Mean square of each FRAME_MS frame (the tail shorter than a frame is measured as its own frame)
+def frame_energies(audio_arr, frame_length):
+    full_frames = len(audio_arr) // frame_length
+    energies = np.square(audio_arr[:full_frames * frame_length], dtype=np.float64).reshape(full_frames, frame_length).mean(axis=1)
+    if len(audio_arr) > full_frames * frame_length:
+        energies = np.append(energies, np.square(audio_arr[full_frames * frame_length:], dtype=np.float64).mean())
+    return energies
+
+# Return a view of audio_arr without its leading and trailing silence, keeping keep samples around the speech
+def trim_silence(audio_arr, frame_length, keep, threshold_db=SILENCE_THRESHOLD_DB):
+    energies = frame_energies(audio_arr, frame_length)
+    if not len(energies) or energies.max() <= 0:
+        return audio_arr[:0]
+    active = np.flatnonzero(energies >= energies.max() * 10 ** (threshold_db / 10))
+    start = max(0, active[0] * frame_length - keep)
+    end = min(len(audio_arr), (active[-1] + 1) * frame_length + keep)
+    return audio_arr[start:end]
+
+class AudioAssembler:
+    # capacity: expected length in samples, if known; the buffer grows when it is exceeded
+    def __init__(self, samplerate, capacity=0, target_loudness_db=TARGET_LOUDNESS_DB):
+        self.samplerate = samplerate
+        self.target_loudness_db = target_loudness_db
+        self.frame_length = max(1, samplerate * FRAME_MS // 1000)
+        self.keep = samplerate * KEEP_SILENCE_MS // 1000
+        self.length = 0
+        self._buffer = np.zeros(max(capacity, samplerate), dtype=np.float32)
+
+        crossfade = max(1, samplerate * CROSSFADE_MS // 1000)
+        ramp = np.linspace(0, np.pi / 2, crossfade, dtype=np.float32)
+        self._fade_in = np.sin(ramp)
+        self._fade_out = np.cos(ramp)
+
+    def _reserve(self, samples):
+        needed = self.length + samples
+        if needed > len(self._buffer):
+            # Grow geometrically so a missing or low capacity hint costs few copies
+            grown = np.zeros(max(needed, len(self._buffer) * 3 // 2), dtype=np.float32)
+            grown[:self.length] = self._buffer[:self.length]
+            self._buffer = grown
+
+    # Gain that brings the speech frames of a segment to the target loudness without exceeding PEAK_LIMIT
+    def _gain(self, audio_arr):
+        energies = frame_energies(audio_arr, self.frame_length)
+        speech = energies[energies >= energies.max() * 10 ** (SILENCE_THRESHOLD_DB / 10)]
+        loudness_db = 10 * np.log10(speech.mean())
+        gain = 10 ** ((self.target_loudness_db - loudness_db) / 20)
+        return min(gain, PEAK_LIMIT / float(np.abs(audio_arr).max()))
+
+    # Trim and level the segment and crossfade it onto the end of the buffer; returns the
+    # trimmed, leveled segment
+    def append(self, audio_arr):
+        audio_arr = trim_silence(np.asarray(audio_arr, dtype=np.float32), self.frame_length, self.keep)
+        if not len(audio_arr):
+            return audio_arr
+        audio_arr = audio_arr * np.float32(self._gain(audio_arr))
+
+        overlap = min(len(self._fade_in), len(audio_arr), self.length)
+        self._reserve(len(audio_arr) - overlap)
+        if overlap:
+            joint = self._buffer[self.length - overlap:self.length]
+            joint *= self._fade_out[:overlap]
+            joint += audio_arr[:overlap] * self._fade_in[:overlap]
+        self._buffer[self.length:self.length + len(audio_arr) - overlap] = audio_arr[overlap:]
+        self.length += len(audio_arr) - overlap
+        return audio_arr
+
+    # The assembled audio (a view of the buffer, valid until the next append)
+    def finish(self):
+        return self._buffer[:self.length]
+
+# Assemble a sequence of segments in one go
+def assemble_audio(segments, samplerate, capacity=0):
+    assembler = AudioAssembler(samplerate, capacity)
+    for audio_arr in segments:
+        assembler.append(audio_arr)
+    return assembler.finish()
@@ -0,0 +1,21 @@
+import hashlib
+import json
+import os
+from disk_cache import DiskCache
+
+# Where the generated audio is stored and how many bytes it may take before old entries are evicted
+AUDIO_CACHE_DIR = os.environ.get("TTS_AUDIO_CACHE_DIR", os.path.join(".cache", "audio"))
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("TTS_AUDIO_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Build the cache key from everything that changes the generated audio; encoding names the
+# output format when the engine can produce more than one
+def audio_cache_key(text, language, slow, voice, engine, encoding=None):
+    fields = [engine, voice, language, bool(slow), text]
+    if encoding is not None:
+        fields.append(encoding)
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# The shared audio store; repeated texts are played from it instead of being synthesized again
+def open_audio_cache(cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+    return DiskCache(cache_dir, max_bytes, name="audio")
@@ -0,0 +1,101 @@
+import io
+import os
+from collections import namedtuple
+import numpy as np
+import soundfile as sf
+
+# Output encodings for generated speech. The encoder is fed one audio block (e.g. one sentence)
+# at a time and writes compressed frames as it goes, so a long text never exists as a second
+# full-length float copy next to the encoded bytes.
+
+AudioFormat = namedtuple("AudioFormat", ("label", "mime", "extension", "container", "subtype", "bitrate_range", "sample_rates"))
+
+AUDIO_FORMATS = {
+    "mp3": AudioFormat("MP3", "audio/mpeg", "mp3", "MP3", "MPEG_LAYER_III", (32, 320), None),
+    "opus": AudioFormat("Opus (Ogg)", "audio/ogg", "ogg", "OGG", "OPUS", (6, 256), (8000, 12000, 16000, 24000, 48000)),
+    "flac": AudioFormat("FLAC (lossless)", "audio/flac", "flac", "FLAC", "PCM_16", None, None),
+    "pcm16": AudioFormat("WAV, 16-bit", "audio/wav", "wav", "WAV", "PCM_16", None, None),
+    "wav": AudioFormat("WAV, 32-bit float", "audio/wav", "wav", "WAV", "FLOAT", None, None),
+}
+# MP3 plays in every browser; 48 kbps mono is clear speech at about 6 KB per second
+DEFAULT_AUDIO_FORMAT = os.environ.get("TTS_AUDIO_FORMAT", "mp3")
+DEFAULT_BITRATE_KBPS = int(os.environ.get("TTS_AUDIO_BITRATE", "48"))
+
+# Bitrates offered to users; each format offers the ones inside its bitrate_range
+STANDARD_BITRATES_KBPS = (6, 12, 16, 24, 32, 48, 64, 96, 128, 160, 192, 256, 320)
+
+# Bitrates the format accepts, and which of them to preselect (the default, or the nearest to it)
+def bitrate_options(format_name):
+    low, high = AUDIO_FORMATS[format_name].bitrate_range
+    options = [bitrate for bitrate in STANDARD_BITRATES_KBPS if low <= bitrate <= high]
+    return options, min(options, key=lambda bitrate: abs(bitrate - DEFAULT_BITRATE_KBPS))
+
+# libsndfile sets the bitrate through a compression level from 0 (highest) to 1 (lowest bitrate)
+def compression_level(audio_format, bitrate_kbps):
+    low, high = audio_format.bitrate_range
+    # The MP3 encoder rejects exactly 1.0
+    return float(np.clip((high - bitrate_kbps) / (high - low), 0.0, 0.99))
+
+# Streaming linear-interpolation resampler, for codecs that only accept some sample rates
+class LinearResampler:
+    def __init__(self, input_rate, output_rate):
+        self.step = input_rate / output_rate
+        self._previous = np.zeros(0, dtype=np.float32)
+        self._position = 0.0  # Next output sample, in input samples from the start of the buffer
+
+    def process(self, audio_arr):
+        buffer = np.concatenate([self._previous, np.asarray(audio_arr, dtype=np.float32)])
+        if len(buffer) < 2:
+            self._previous = buffer
+            return buffer[:0]
+        positions = np.arange(self._position, len(buffer) - 1, self.step)
+        output = np.interp(positions, np.arange(len(buffer)), buffer).astype(np.float32)
+        # Keep the last sample so the next block interpolates across the boundary
+        next_position = positions[-1] + self.step if len(positions) else self._position
+        self._position = next_position - (len(buffer) - 1)
+        self._previous = buffer[-1:]
+        return output
+
+class StreamingEncoder:
+    def __init__(self, output, format_name, samplerate, bitrate_kbps=None):
+        self.format = AUDIO_FORMATS[format_name]
+        self.samplerate = samplerate
+        self._resampler = None
+        if self.format.sample_rates and samplerate not in self.format.sample_rates:
+            # e.g. Opus has no 44.1 kHz mode: encode at the next supported rate up
+            self.samplerate = min((rate for rate in self.format.sample_rates if rate >= samplerate), default=self.format.sample_rates[-1])
+            self._resampler = LinearResampler(samplerate, self.samplerate)
+
+        options = {}
+        if self.format.bitrate_range and bitrate_kbps:
+            options["compression_level"] = compression_level(self.format, bitrate_kbps)
+            if self.format.container == "MP3":
+                options["bitrate_mode"] = "CONSTANT"
+        self._file = sf.SoundFile(output, "w", samplerate=self.samplerate, channels=1,
+                                  format=self.format.container, subtype=self.format.subtype, **options)
+
+    def write(self, audio_arr):
+        if self._resampler is not None:
+            audio_arr = self._resampler.process(audio_arr)
+        if len(audio_arr):
+            self._file.write(audio_arr)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+# Encode one array, or an iterable of arrays played back to back, and return the bytes
+def encode_audio(blocks, format_name, samplerate, bitrate_kbps=None):
+    if isinstance(blocks, np.ndarray):
+        blocks = [blocks]
+    audio_buffer = io.BytesIO()
+    with StreamingEncoder(audio_buffer, format_name, samplerate, bitrate_kbps) as encoder:
+        for audio_arr in blocks:
+            encoder.write(audio_arr)
+    return audio_buffer.getvalue()
@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+# Collects sentences from concurrent requests into batches for one model.
+# batch_fn(prompts, descriptions, seeds) takes lists, like a Gradio batch=True function, and returns
+# one (sampling_rate, audio) tuple per item. A batch runs as soon as max_batch_size compatible items
+# are waiting, or batch_wait seconds after the oldest one arrived. Items are compatible when
+# batch_key(prompt, description, seed) is equal. batch_fn must sample each item from its own seed
+# (see parler_generation.SeededSampler), so a request's audio does not depend on who else is served.
+#
+# A request queues all of its sentences at once, so only a new request can add to a batch. With
+# max_requests (the server's concurrency limit) the scheduler stops waiting as soon as that many
+# requests are in progress, since no new one can arrive until one of them finishes.
+class BatchScheduler:
+    def __init__(
+        self,
+        batch_fn: Callable,
+        max_batch_size: int = 4,
+        batch_wait: float = 0.1,
+        batch_key: Optional[Callable] = None,
+        max_requests: Optional[int] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.batch_key = batch_key or (lambda prompt, description, seed: None)
+        self.max_requests = max_requests
+        self._pending = []  # (args, key, future, arrival time)
+        self._active_requests = 0
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name="tts-batcher").start()
+
+    def submit(self, prompt, description, seed) -> Future:
+        return self.submit_many([prompt], description, seed)[0]
+
+    # Queue all sentences of one request; the request counts as in progress until all are done
+    def submit_many(self, prompts, description, seed) -> list:
+        futures = [Future() for _ in prompts]
+        if not futures:
+            return futures
+        remaining = [len(futures)]
+
+        def on_done(_):
+            with self._condition:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self._active_requests -= 1
+
+        with self._condition:
+            self._active_requests += 1
+            now = time.monotonic()
+            for prompt, future in zip(prompts, futures):
+                args = (prompt, description, seed)
+                self._pending.append((args, self.batch_key(*args), future, now))
+            self._condition.notify()
+        for future in futures:
+            future.add_done_callback(on_done)
+        return futures
+
+    # Whether more items for key may still arrive before the batch is full
+    def _can_grow(self, key):
+        if sum(1 for item in self._pending if item[1] == key) >= self.max_batch_size:
+            return False
+        return self.max_requests is None or self._active_requests < self.max_requests
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            # Wait until batch_wait after the oldest item arrived for more items like it
+            _, key, _, arrival = self._pending[0]
+            deadline = arrival + self.batch_wait
+            while self._can_grow(key):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [item for item in self._pending if item[1] == key][: self.max_batch_size]
+            batched = {id(item) for item in batch}
+            self._pending = [item for item in self._pending if id(item) not in batched]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            futures = [future for _, _, future, _ in batch]
+            prompts, descriptions, seeds = (list(column) for column in zip(*(args for args, _, _, _ in batch)))
+            try:
+                results = list(self.batch_fn(prompts, descriptions, seeds))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+            # A batch_fn that returns too few results must not leave requests waiting forever
+            for future in futures[len(results):]:
+                future.set_exception(RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items"))
@@ -0,0 +1,343 @@
+import argparse
+import io
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from stubs import GTTSStubHandler, HTMLStubHandler, StubTranslator, make_text_pdf, make_text_photo, start_stub_server
+
+# Offline, stage-level benchmark for the TTS pipeline. Network stages run against the local
+# stubs in stubs.py so results are repeatable without network access.
+#
+#   python benchmark.py                                  # every stage that can run here
+#   python benchmark.py --stages gtts,wav_encoding --repeat 50 --output bench.json
+#   python benchmark.py --stages encode_mp3,encode_opus,encode_flac,encode_pcm16,encode_wav_float
+#   python benchmark.py --backend openvino               # Parler stages on the OpenVINO backend
+#   python benchmark.py --stages ocr_preprocess,ocr --repeat 3
+
+SAMPLE_TEXT = (
+    "The community centre opens at nine o'clock on weekdays. "
+    "Lunch is served at noon, and the bus to the market leaves at two. "
+    "Please bring your health card to the clinic on Tuesday. "
+) * 8
+PARLER_PROMPT = "Your appointment at the health centre is on Tuesday at ten o'clock in the morning."
+PARLER_DESCRIPTION = "A clear, slow, and soft-spoken female voice with distinct articulation, perfect for elderly listeners."
+SAMPLE_RATE = 44100
+
+# Each stage setup returns (run, info): run() executes the stage once and returns the seconds of
+# audio it produced (or None), and info holds static facts about the input
+def setup_pdf_extraction(context):
+    from pdf_extract import iter_pdf_text
+
+    pdf_bytes = make_text_pdf([SAMPLE_TEXT] * 20)
+
+    def run():
+        for _ in iter_pdf_text(pdf_bytes):
+            pass
+
+    return run, {"pages": 20, "bytes": len(pdf_bytes)}
+
+# Sample phone photos: a one-column letter and a two-column newsletter page
+def _sample_photos():
+    return [make_text_photo(SAMPLE_TEXT * 2, columns=1, seed=0), make_text_photo(SAMPLE_TEXT * 4, columns=2, seed=1)]
+
+# Downscaling, binarization and tiling of the sample photos, without recognition
+def setup_ocr_preprocess(context):
+    from PIL import Image
+    from ocr import prepare_image, tile_page
+
+    photos = _sample_photos()
+
+    def run():
+        for photo in photos:
+            tile_page(prepare_image(Image.open(io.BytesIO(photo))))
+
+    ink = prepare_image(Image.open(io.BytesIO(photos[1])))
+    return run, {"photos": len(photos), "tiles_two_column": len(tile_page(ink))}
+
+# Full OCR of the sample photos, uncached, with tiles recognized in parallel
+def setup_ocr(context):
+    from ocr import OCR_WORKERS, ocr_available, recognize_image
+
+    if not ocr_available():
+        raise ImportError("pytesseract or the tesseract binary is not installed")
+    photos = _sample_photos()
+
+    def run():
+        for photo in photos:
+            recognize_image(photo, use_cache=False)
+
+    return run, {"photos": len(photos), "workers": OCR_WORKERS, "photo_pixels": "3024x4032"}
+
+def setup_url_parsing(context):
+    from url_fetch import fetch_article_text
+
+    server, url = start_stub_server(HTMLStubHandler)
+    context["servers"].append(server)
+
+    def run():
+        fetch_article_text(url)
+
+    return run, {"url": "local stub"}
+
+def setup_translation(context):
+    from translation import SegmentTranslator, TranslationMemo
+
+    def run():
+        # A fresh memo every run, so each run measures the uncached path against the stub translator
+        memo = TranslationMemo(tempfile.mktemp(suffix=".sqlite3", dir=context["tmp_dir"]))
+        SegmentTranslator(lambda source, target: StubTranslator(target, delay=context["stub_delay"]), memo).translate(SAMPLE_TEXT, "fr")
+
+    return run, {"chars": len(SAMPLE_TEXT)}
+
+# Offline language identification of every sentence, as done before each translation
+def setup_language_detection(context):
+    from text_segments import split_sentences
+    from translation import sentence_languages
+
+    sentences = split_sentences(SAMPLE_TEXT)
+
+    def run():
+        sentence_languages(sentences)
+
+    return run, {"sentences": len(sentences)}
+
+def setup_gtts(context):
+    from gtts_pool import make_session, synthesize_parallel
+
+    GTTSStubHandler.delay = context["stub_delay"]
+    server, url = start_stub_server(GTTSStubHandler)
+    context["servers"].append(server)
+    session = make_session()
+
+    def run():
+        synthesize_parallel(SAMPLE_TEXT, "en", False, session=session, endpoint=url)
+
+    return run, {"chars": len(SAMPLE_TEXT)}
+
+# Parler-TTS model shared by the Parler stages, loaded on first use
+def _parler(context):
+    if "parler" not in context:
+        import torch
+        from model_loader import load_parler
+
+        model, tokenizer, _ = load_parler(backend=context["backend"])
+        context["parler"] = (torch, model, tokenizer)
+    return context["parler"]
+
+def setup_parler_tokenization(context):
+    _, _, tokenizer = _parler(context)
+
+    def run():
+        tokenizer(PARLER_PROMPT, return_tensors="pt")
+
+    return run, {}
+
+def setup_parler_encoder(context):
+    torch, model, tokenizer = _parler(context)
+    input_ids = tokenizer(PARLER_DESCRIPTION, return_tensors="pt").input_ids
+
+    def run():
+        with torch.no_grad():
+            model.get_encoder()(input_ids=input_ids)
+
+    return run, {"tokens": input_ids.shape[1]}
+
+def setup_parler_generate(context):
+    torch, model, tokenizer = _parler(context)
+    input_ids = tokenizer(PARLER_DESCRIPTION, return_tensors="pt").input_ids
+    prompt_input_ids = tokenizer(PARLER_PROMPT, return_tensors="pt").input_ids
+    decoder = model.decoder.model.decoder
+    step_latencies = []
+
+    # Record every decoder call; the OpenVINO wrappers time themselves, torch modules use hooks
+    if hasattr(decoder, "step_latencies"):
+        decoder.step_latencies = step_latencies
+    else:
+        starts = []
+        decoder.register_forward_pre_hook(lambda module, args: starts.append(time.perf_counter()))
+        decoder.register_forward_hook(lambda module, args, output: step_latencies.append(time.perf_counter() - starts.pop()))
+    context["decode_step_latencies"] = step_latencies
+
+    def run():
+        with torch.no_grad():
+            generation = model.generate(input_ids=input_ids, prompt_input_ids=prompt_input_ids, do_sample=False)
+        return generation.shape[-1] / model.config.sampling_rate
+
+    return run, {"backend": context["backend"]}
+
+def setup_audio_concatenation(context):
+    rng = np.random.default_rng(0)
+    segments = [rng.standard_normal(SAMPLE_RATE * 4).astype(np.float32) for _ in range(30)]
+
+    def run():
+        np.concatenate(segments)
+
+    return run, {"segments": 30, "audio_seconds": 120}
+
+# The same segments trimmed, leveled and crossfaded into one preallocated buffer
+def setup_audio_assembly(context):
+    from audio_assembly import assemble_audio
+
+    rng = np.random.default_rng(0)
+    segments = [rng.standard_normal(SAMPLE_RATE * 4).astype(np.float32) for _ in range(30)]
+
+    def run():
+        assemble_audio(segments, SAMPLE_RATE, capacity=SAMPLE_RATE * 120)
+
+    return run, {"segments": 30, "audio_seconds": 120}
+
+def setup_wav_encoding(context):
+    audio_arr = np.random.default_rng(0).standard_normal(SAMPLE_RATE * 60).astype(np.float32) * 0.1
+
+    def run():
+        audio_buffer = io.BytesIO()
+        sf.write(audio_buffer, audio_arr, samplerate=SAMPLE_RATE, format="WAV")
+
+    return run, {"audio_seconds": 60}
+
+# Speech-like test signal: a voiced tone with a syllable-rate envelope and some breath noise
+def speech_like_audio(seconds):
+    t = np.arange(SAMPLE_RATE * seconds) / SAMPLE_RATE
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    voiced = sum(np.sin(2 * np.pi * 140 * harmonic * t) / harmonic for harmonic in range(1, 8))
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.01
+    return (0.2 * envelope * voiced + noise).astype(np.float32)
+
+# One stage per output format: a minute of audio fed to the encoder one 4-second sentence at a time
+def make_encoding_stage(format_name):
+    def setup(context):
+        from audio_encoding import AUDIO_FORMATS, DEFAULT_BITRATE_KBPS, encode_audio
+
+        audio_format = AUDIO_FORMATS[format_name]
+        bitrate_kbps = DEFAULT_BITRATE_KBPS if audio_format.bitrate_range else None
+        sentences = np.array_split(speech_like_audio(60), 15)
+        payload_bytes = len(encode_audio(sentences, format_name, SAMPLE_RATE, bitrate_kbps))
+
+        def run():
+            encode_audio(sentences, format_name, SAMPLE_RATE, bitrate_kbps)
+            return 60
+
+        return run, {
+            "audio_seconds": 60,
+            "mime": audio_format.mime,
+            "bitrate_kbps": bitrate_kbps,
+            "payload_bytes": payload_bytes,
+            "payload_kb_per_audio_second": round(payload_bytes / 60 / 1024, 2),
+        }
+
+    return setup
+
+STAGES = {
+    "pdf_extraction": setup_pdf_extraction,
+    "ocr_preprocess": setup_ocr_preprocess,
+    "ocr": setup_ocr,
+    "url_parsing": setup_url_parsing,
+    "translation": setup_translation,
+    "language_detection": setup_language_detection,
+    "gtts": setup_gtts,
+    "parler_tokenization": setup_parler_tokenization,
+    "parler_encoder": setup_parler_encoder,
+    "parler_generate": setup_parler_generate,
+    "audio_concatenation": setup_audio_concatenation,
+    "audio_assembly": setup_audio_assembly,
+    "wav_encoding": setup_wav_encoding,
+    "encode_mp3": make_encoding_stage("mp3"),
+    "encode_opus": make_encoding_stage("opus"),
+    "encode_flac": make_encoding_stage("flac"),
+    "encode_pcm16": make_encoding_stage("pcm16"),
+    "encode_wav_float": make_encoding_stage("wav"),
+}
+PARLER_STAGES = ("parler_tokenization", "parler_encoder", "parler_generate")
+
+def percentiles_ms(seconds):
+    milliseconds = np.array(seconds) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p90_ms": round(float(np.percentile(milliseconds, 90)), 3),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 3),
+        "mean_ms": round(float(milliseconds.mean()), 3),
+    }
+
+# Run one stage: a warm-up run, a traced run for peak Python memory, then the timed runs
+def run_stage(name, context, repeat):
+    run, info = STAGES[name](context)
+    run()
+
+    tracemalloc.start()
+    run()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = []
+    audio_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        produced = run()
+        latencies.append(time.perf_counter() - start)
+        if produced:
+            audio_seconds.append(produced)
+
+    result = {"stage": name, "runs": repeat, **percentiles_ms(latencies), "peak_alloc_mb": round(peak_bytes / 2**20, 3), **info}
+    if audio_seconds:
+        # Real-time factor: seconds of compute per second of audio produced (below 1 is faster than real time)
+        result["real_time_factor"] = round(sum(latencies) / sum(audio_seconds), 4)
+    if name == "parler_generate" and context["decode_step_latencies"]:
+        result["decode_step"] = percentiles_ms(context["decode_step_latencies"])
+        result["decode_steps_per_run"] = len(context["decode_step_latencies"]) // (repeat + 2)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the TTS pipeline offline.")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per stage")
+    parser.add_argument("--backend", choices=("torch", "openvino", "none"), default="torch",
+                        help="Parler-TTS backend; 'none' skips the Parler stages")
+    parser.add_argument("--stub-delay", type=float, default=0.05, help="simulated latency of each stub request, in seconds")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    if args.backend == "none":
+        stages = [stage for stage in stages if stage not in PARLER_STAGES]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        context = {"backend": args.backend, "stub_delay": args.stub_delay, "servers": [], "tmp_dir": tmp_dir}
+        try:
+            for stage in stages:
+                try:
+                    results.append(run_stage(stage, context, args.repeat))
+                except ImportError as e:
+                    # e.g. the Parler stages on a machine without torch installed
+                    results.append({"stage": stage, "skipped": str(e)})
+        finally:
+            for server in context["servers"]:
+                server.shutdown()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "backend": args.backend,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    return report
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from metrics import record_cache
+
+try:
+    import fcntl  # File locks to coordinate eviction between Streamlit processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+# Eviction frees space down to this share of the budget, so the next writes do not evict again
+EVICT_TO_FRACTION = 0.9
+
+# On-disk, content-addressed byte store (generated audio, OCR results) with least-recently-used
+# eviction under a byte budget.
+# Entries are written to a temporary file and renamed into place, so readers in other processes
+# never see a half-written file; eviction is serialized with a lock file. The directory is only
+# scanned when the running size total says the budget is exceeded (other processes writing to
+# the same directory are accounted for at that scan).
+# name labels the cache in the metrics.
+class DiskCache:
+    def __init__(self, cache_dir, max_bytes, name):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.name = name
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = None  # Running size of the entries, counted on the first write
+        self._total_lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    # Return the cached bytes for key, or None on a miss
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            record_cache(self.name, misses=1)
+            return None
+        record_cache(self.name, hits=1)
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+        return data
+
+    # Store data under key and evict the least recently used entries if over budget
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._total_lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+        try:
+            replaced_bytes = os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            replaced_bytes = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._total_lock:
+            self._total_bytes += len(data) - replaced_bytes
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    @contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # (mtime, size, path) of every entry
+    def _scan(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        with self._lock():
+            entries = self._scan()
+            total_bytes = sum(size for _, size, _ in entries)
+            target_bytes = self.max_bytes * EVICT_TO_FRACTION
+            if total_bytes > self.max_bytes:
+                # Oldest access time first
+                entries.sort()
+                for _, size, path in entries:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total_bytes -= size
+                    if total_bytes <= target_bytes:
+                        break
+            with self._total_lock:
+                self._total_bytes = total_bytes
@@ -1,7 +1,10 @@
-from typing import Callable
+from typing import Callable, Optional
 import gradio as gr
 import numpy as np
 
+from batch_scheduler import BatchScheduler
+from text_segments import split_sentences
+
 
 title = "Text-to-speech (TTS) with Parler-TTS and OpenVINO"
 
@@ -25,22 +28,65 @@ examples = [
 ]
 
 
-def make_demo(fn: Callable):
+def make_demo(
+    fn: Callable,
+    batch_fn: Optional[Callable] = None,
+    max_batch_size: int = 4,
+    batch_wait: float = 0.1,
+    concurrency_limit: int = 8,
+    stream: bool = True,
+    batch_key: Optional[Callable] = None,
+):
+    # With batch_fn the demo serves many users at once: each prompt is split into sentences, the
+    # sentences of up to concurrency_limit concurrent requests are batched by a BatchScheduler, and
+    # with stream each sentence's audio is sent as soon as it is ready. Gradio's own batch=True
+    # mode cannot stream (generator) outputs and has no wait window, so batching happens here.
+    inputs = [
+        gr.Text(label="Prompt"),
+        gr.Text(label="Description"),
+        gr.Slider(
+            label="Seed",
+            value=42,
+            step=1,
+            minimum=0,
+            maximum=np.iinfo(np.int32).max,
+        ),
+    ]
+
+    if batch_fn is None:
+        return gr.Interface(
+            fn=fn,
+            inputs=inputs,
+            outputs=gr.Audio(label="Output Audio", type="numpy"),
+            title=title,
+            examples=examples,
+        )
+
+    scheduler = BatchScheduler(batch_fn, max_batch_size, batch_wait, batch_key, max_requests=concurrency_limit)
+
+    def submit_sentences(prompt, description, seed):
+        sentences = split_sentences(prompt) or [prompt]
+        return scheduler.submit_many(sentences, description, int(seed))
+
+    if stream:
+
+        def serve(prompt, description, seed):
+            for future in submit_sentences(prompt, description, seed):
+                yield future.result()
+
+    else:
+
+        def serve(prompt, description, seed):
+            results = [future.result() for future in submit_sentences(prompt, description, seed)]
+            return results[0][0], np.concatenate([audio for _, audio in results])
+
     demo = gr.Interface(
-        fn=fn,
-        inputs=[
-            gr.Text(label="Prompt"),
-            gr.Text(label="Description"),
-            gr.Slider(
-                label="Seed",
-                value=42,
-                step=1,
-                minimum=0,
-                maximum=np.iinfo(np.int32).max,
-            ),
-        ],
-        outputs=gr.Audio(label="Output Audio", type="numpy"),
+        fn=serve,
+        inputs=inputs,
+        outputs=gr.Audio(label="Output Audio", type="numpy", streaming=stream, autoplay=stream),
         title=title,
         examples=examples,
+        cache_examples=False,
+        concurrency_limit=concurrency_limit,
     )
     return demo
@@ -0,0 +1,110 @@
+import base64
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from gtts import gTTS
+
+# Number of gTTS chunks fetched at the same time across all users of this process
+GTTS_MAX_WORKERS = 8
+
+# gTTS answers each chunk with base64 MP3 data inside its "jQ1olc" RPC response line
+GTTS_AUDIO_PATTERN = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+_executor = ThreadPoolExecutor(max_workers=GTTS_MAX_WORKERS, thread_name_prefix="gtts")
+_session = None
+_session_lock = threading.Lock()
+
+# Session with keep-alive connections and retry/backoff on throttling and server errors
+def make_session(pool_size=GTTS_MAX_WORKERS, retries=3, backoff_factor=0.5):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,  # The TTS endpoint is a POST, which urllib3 does not retry by default
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# One session shared by every synthesis in this process, so connections are reused
+def shared_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+# Send one prepared gTTS request and return its decoded MP3 bytes
+def fetch_chunk(session, prepared_request, endpoint=None, timeout=(5, 30)):
+    if endpoint is not None:
+        prepared_request.url = endpoint
+    response = session.send(prepared_request, timeout=timeout)
+    response.raise_for_status()
+
+    audio_parts = []
+    for line in response.iter_lines(chunk_size=1024):
+        decoded_line = line.decode("utf-8")
+        if "jQ1olc" in decoded_line:
+            audio_search = GTTS_AUDIO_PATTERN.search(decoded_line)
+            if audio_search:
+                audio_parts.append(base64.b64decode(audio_search.group(1).encode("ascii")))
+    if not audio_parts:
+        raise ValueError("No audio returned by the TTS endpoint")
+    return b"".join(audio_parts)
+
+# Synthesize text with gTTS, fetching its chunks concurrently instead of one after another.
+# gTTS already splits text at sentence and clause boundaries into chunks of at most 100 characters;
+# the chunks are fetched on the shared pool and their MP3 frames joined in order.
+# endpoint overrides the Google URL, e.g. to point at stubs.GTTSStubHandler.
+def synthesize_parallel(text, lang, slow, session=None, endpoint=None, executor=None):
+    prepared_requests = gTTS(text=text, lang=lang, slow=slow)._prepare_requests()
+    session = session or shared_session()
+    executor = executor or _executor
+    futures = [executor.submit(fetch_chunk, session, pr, endpoint) for pr in prepared_requests]
+    return b"".join(future.result() for future in futures)
+
+# Time sequential fresh-connection fetching (what gTTS.write_to_fp does) against the pooled,
+# parallel mode on the local stub for 1k, 5k and 20k character inputs
+def benchmark(sizes=(1000, 5000, 20000), lang="en", workers=GTTS_MAX_WORKERS):
+    from stubs import GTTSStubHandler, start_stub_server
+
+    server, url = start_stub_server(GTTSStubHandler)
+    sentence = "The community centre opens at nine o'clock on weekdays. "
+    results = []
+    try:
+        for size in sizes:
+            text = (sentence * (size // len(sentence) + 1))[:size]
+            prepared_requests = gTTS(text=text, lang=lang)._prepare_requests()
+
+            start = time.perf_counter()
+            for pr in prepared_requests:
+                with requests.Session() as session:
+                    fetch_chunk(session, pr, url)
+            sequential = time.perf_counter() - start
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                start = time.perf_counter()
+                audio = synthesize_parallel(text, lang, False, session=make_session(workers), endpoint=url, executor=executor)
+                parallel = time.perf_counter() - start
+
+            results.append({
+                "chars": size,
+                "chunks": len(prepared_requests),
+                "sequential_s": round(sequential, 3),
+                "parallel_s": round(parallel, 3),
+                "speedup": round(sequential / parallel, 2),
+                "audio_bytes": len(audio),
+            })
+    finally:
+        server.shutdown()
+    return results
+
+if __name__ == "__main__":
+    print(json.dumps(benchmark(), indent=2))
@@ -0,0 +1,170 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# In-process job queue for conversions. Work runs on a bounded worker pool instead of the
+# Streamlit script thread, and identical requests submitted while one is still queued or running
+# share that job (single-flight), so a popular article is translated and synthesized once.
+
+# Conversions running at the same time in this process
+JOB_WORKERS = int(os.environ.get("TTS_JOB_WORKERS", "4"))
+# Finished jobs kept so their results can still be collected
+JOB_HISTORY = 256
+
+# Key identifying identical conversion requests
+def conversion_key(text, language, voice=None, slow=False):
+    payload = json.dumps([text, language, voice, bool(slow)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    def __init__(self, job_id, key):
+        self.id = job_id
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.progress = 0.0
+        self.message = "Waiting to start"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.speculative = False  # Started ahead of a request that may never come; see speculate
+        self._speculators = 0  # Sessions that speculatively asked for this job and have not cancelled
+        self._cancel = threading.Event()
+        self._wake = threading.Event()  # Set when the job is cancelled or a real request joins it
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    # Called by the job function to report progress (0.0 - 1.0); raises if the job was cancelled
+    def update(self, progress, message=None):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = progress
+        if message is not None:
+            self.message = message
+
+    # Cancels the job for everyone sharing it: identical submits get this same Job, so a caller that
+    # only stops waiting for the result should drop its reference rather than cancel
+    def cancel(self):
+        self._cancel.set()
+        self._wake.set()
+
+    # A real request joined this speculative job
+    def promote(self):
+        self.speculative = False
+        self._wake.set()
+
+    # Wait up to timeout seconds while the job is only speculative; returns as soon as a real
+    # request joins it, and raises if it is cancelled meanwhile
+    def hold(self, timeout):
+        if self.speculative:
+            self._wake.wait(timeout)
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="conversion")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()  # job id -> Job
+        self._in_flight = {}        # key -> Job
+
+    # Queue fn(job, *args) under key, or return the job already queued or running for that key
+    def submit(self, key, fn, *args):
+        return self._submit(key, fn, args, speculative=False)[0]
+
+    # Queue fn(job, *args) under key as speculative work, started before anyone asked for it.
+    # Returns (job, created); created is False when an existing job for key was joined. A real
+    # submit for the same key joins the job and makes it an ordinary one, which cancel_speculative
+    # then leaves alone.
+    def speculate(self, key, fn, *args):
+        return self._submit(key, fn, args, speculative=True)
+
+    def _submit(self, key, fn, args, speculative):
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None and not job.finished and not job.cancelled:
+                if not speculative:
+                    job.promote()
+                elif job.speculative:
+                    job._speculators += 1
+                return job, False
+            job = Job(str(next(self._ids)), key)
+            job.speculative = speculative
+            job._speculators = int(speculative)
+            self._in_flight[key] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > JOB_HISTORY:
+                old_id, old_job = next(iter(self._jobs.items()))
+                if not old_job.finished:
+                    break
+                del self._jobs[old_id]
+        self._executor.submit(self._run, job, fn, args)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # Withdraw one speculate() call for job; a speculative job is cancelled once every session
+    # that speculated on it has withdrawn and nobody has asked for it for real
+    def cancel_speculative(self, job):
+        with self._lock:
+            if not job.speculative:
+                return
+            job._speculators -= 1
+            if job._speculators <= 0:
+                job.cancel()
+
+    # The most recent job submitted under key, finished or not
+    def latest(self, key):
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.key == key:
+                    return job
+        return None
+
+    def _run(self, job, fn, args):
+        try:
+            if job.cancelled:
+                raise JobCancelled()
+            job.status = "running"
+            job.message = "Starting"
+            job.result = fn(job, *args)
+            job.progress = 1.0
+            job.message = "Done"
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+            job.message = "Cancelled"
+        except Exception as e:
+            job.error = e
+            job.message = f"Failed: {e}"
+            job.status = "failed"
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+
+    # Block until the job finishes or timeout seconds pass; returns the job
+    def wait(self, job, timeout=None, poll_interval=0.05):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not job.finished and (deadline is None or time.monotonic() < deadline):
+            time.sleep(poll_interval)
+        return job
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,98 @@
+import re
+import unicodedata
+
+# Offline language identification for the languages the app offers, so text that is already in
+# the target language skips the translator and other text is sent with an explicit source
+# language. Scripts decide Korean, Japanese, Chinese and Hindi; Latin-script languages are told
+# apart by their most common short words. When unsure, detect_language returns None and the
+# translator detects the language itself; only a positive detection skips the translator.
+
+# Frequent short words of each Latin-script language
+STOPWORDS = {
+    "en": {"the", "and", "is", "are", "to", "of", "that", "it", "for", "you", "with", "on", "this", "be",
+           "was", "have", "not", "at", "your", "will", "from", "by", "we", "please", "or", "an", "can", "our",
+           "i", "am", "me", "my", "call", "happy", "very", "much", "thank", "thanks", "yes", "hello", "do", "what"},
+    "fr": {"le", "la", "les", "et", "est", "des", "un", "une", "du", "que", "dans", "pour", "pas", "vous",
+           "sur", "au", "avec", "ce", "il", "sont", "nous", "qui", "à", "aux", "votre", "mais", "ou", "être"},
+    "es": {"el", "la", "los", "las", "y", "es", "que", "en", "un", "una", "por", "para", "con", "no", "se",
+           "del", "al", "su", "está", "son", "usted", "como", "más", "lo", "pero", "muy", "hay", "sus"},
+    "de": {"der", "die", "das", "und", "ist", "nicht", "ein", "eine", "zu", "den", "mit", "sich", "des", "auf",
+           "für", "im", "dem", "sie", "es", "wir", "ihr", "bitte", "von", "auch", "werden", "sind", "bei", "oder"},
+    "it": {"il", "lo", "la", "gli", "le", "e", "è", "di", "che", "un", "una", "per", "non", "con", "del", "della",
+           "sono", "si", "al", "nel", "da", "come", "più", "questo", "anche", "ma", "alla", "dei", "suo", "sua"},
+}
+# Letters only one of the languages uses, each worth one extra word
+DISTINCT_LETTERS = {"es": "ñ¿¡", "de": "ßäöü", "fr": "çœêâîôûë"}
+# Common characters that differ between simplified and traditional Chinese
+SIMPLIFIED_CHARS = set(
+    "这们说对时会国来为过还个么后发经现进动问实关长开区见无业门东车书马鸟鱼语话电学气华钱银医药请谢"
+    "买卖习写读听间机场处头义乐爱亲儿几张边应样认识让给从两万与岁级线网号术体办环报总统条觉难变证热"
+)
+TRADITIONAL_CHARS = set(
+    "這們說對時會國來為過還個麼後發經現進動問實關長開區見無業門東車書馬鳥魚語話電學氣華錢銀醫藥請謝"
+    "買賣習寫讀聽間機場處頭義樂愛親兒幾張邊應樣認識讓給從兩萬與歲級線網號術體辦環報總統條覺難變證熱"
+)
+
+# Simplified forms used only in Japanese (shinjitai); kanji-only Japanese such as 東京都庁 can otherwise
+# look like traditional Chinese
+JAPANESE_CHARS = set("庁駅図気県広払売読変戦歳労働楽薬関発転鉄険験経続様沢桜込畑峠枠実帰児満営応悪圧囲")
+
+WORD = re.compile(r"[^\W\d_]+")
+
+# Share of letters in each script
+def _script_shares(text):
+    counts = {"hangul": 0, "kana": 0, "han": 0, "devanagari": 0, "latin": 0}
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        code = ord(char)
+        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            counts["hangul"] += 1
+        elif 0x3040 <= code <= 0x30FF:
+            counts["kana"] += 1
+        elif 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+            counts["han"] += 1
+        elif 0x0900 <= code <= 0x097F:
+            counts["devanagari"] += 1
+        elif code < 0x250 or unicodedata.name(char, "").startswith("LATIN"):
+            counts["latin"] += 1
+    return {script: count / letters for script, count in counts.items()} if letters else None
+
+def _latin_language(text):
+    words = WORD.findall(text.lower())
+    scores = {language: sum(word in stopwords for word in words) for language, stopwords in STOPWORDS.items()}
+    for language, letters in DISTINCT_LETTERS.items():
+        if any(letter in text.lower() for letter in letters):
+            scores[language] += 1
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    # Require two hits and a clear lead; a single shared word like "la" decides nothing
+    if best_score >= 2 and best_score >= 1.5 * second_score:
+        return best
+    return None
+
+# The language code (as used by the translator: "en", "ko", "zh-CN", ...) of text, or None if unsure
+def detect_language(text):
+    shares = _script_shares(text)
+    if shares is None:
+        return None
+    if shares["hangul"] > 0.3:
+        return "ko"
+    if shares["kana"] > 0.1:
+        return "ja"
+    if shares["han"] > 0.3:
+        if any(char in JAPANESE_CHARS for char in text):
+            return None
+        simplified = sum(char in SIMPLIFIED_CHARS for char in text)
+        traditional = sum(char in TRADITIONAL_CHARS for char in text)
+        # Without telling characters the text may be either form, or Japanese written in kanji only
+        if simplified == traditional:
+            return None
+        return "zh-TW" if traditional > simplified else "zh-CN"
+    if shares["devanagari"] > 0.3:
+        return "hi"
+    if shares["latin"] > 0.6:
+        return _latin_language(text)
+    return None
@@ -1,79 +1,155 @@
 import streamlit as st
-import torch
-from parler_tts import ParlerTTSForConditionalGeneration
-from transformers import AutoTokenizer
-import soundfile as sf
-import numpy as np
 import io
+import os
+import queue
+import threading
+from audio_assembly import AudioAssembler
+from audio_cache import audio_cache_key, open_audio_cache
+from audio_encoding import AUDIO_FORMATS, DEFAULT_AUDIO_FORMAT, DEFAULT_BITRATE_KBPS, bitrate_options, encode_audio
+from model_loader import load_tokenizer, start_model
+from parler_generation import DEFAULT_VOICE, build_voice_cache, expected_audio_seconds, generate_batch, segment_text
+from replica_pool import TTS_REPLICAS, ReplicaPool
+
+# Shared on-disk audio cache so repeated texts skip model inference entirely
+audio_cache = open_audio_cache()
+
+# Number of sentences padded together into a single generate call (1 disables batching)
+DEFAULT_BATCH_SIZE = 4
+
+# Inference backend: "torch" runs the PyTorch model, "openvino" swaps in compiled OpenVINO IR
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "torch")
+
+# Cache the model to avoid reloading it on every run. torch and parler_tts are imported here
+# rather than at the top of the file; set TTS_MODEL_PATH to load from a local snapshot.
+# The model is warmed up before it is returned, and the import/load/warm-up times are reported.
+@st.cache_resource
+def load_model_and_tokenizer(backend=TTS_BACKEND):
+    return start_model(backend=backend)
+
+# Only the tokenizer is needed in this process when the replicas run the model
+@st.cache_resource
+def load_segment_tokenizer():
+    return load_tokenizer()
+
+# Start the model replica processes once per server process (only when TTS_REPLICAS > 0)
+@st.cache_resource
+def load_replica_pool(replicas=TTS_REPLICAS, backend=TTS_BACKEND):
+    return ReplicaPool(replicas, backend=backend)
 
-# Cache the model to avoid reloading it on every run
+# Tokenize each voice description and run the text encoder on it once per process
 @st.cache_resource
-def load_model_and_tokenizer():
-    device = "cpu"
-    repo_id = "parler-tts/parler_tts_mini_v0.1"
-    model = ParlerTTSForConditionalGeneration.from_pretrained(repo_id).to(device)
-    tokenizer = AutoTokenizer.from_pretrained(repo_id)
-    return model, tokenizer
+def load_voice_cache(_model, _tokenizer):
+    return build_voice_cache(_model, _tokenizer)
 
 # Preprocess text to improve smoothness
 def preprocess_text(input_text):
-    # Split the text into sentences to make the model handle sentence boundaries better
-    sentences = input_text.strip().split(". ")
-    processed_text = [sentence + "." for sentence in sentences if sentence]
-    return processed_text
-
-def generate_audio(input_text, selected_voice):
-    # Improved voice descriptions for clarity, slower speed, and easier listening for the elderly
-    if selected_voice == "Female Voice":
-        description = "A clear, slow, and soft-spoken female voice with distinct articulation, perfect for elderly listeners."
+    # Split the text at sentence boundaries and pack the sentences into evenly sized segments
+    # near the token budget, so the model gets few, similar-length generate calls
+    return segment_text(input_text, tokenizer)
+
+# Yield one raw audio array per segment, in order, as soon as each batch is generated
+def iter_sentence_audio(processed_text, selected_voice, batch_size):
+    if replica_pool is not None:
+        # Shard the batches across the model replicas; results still arrive in sentence order
+        batches = replica_pool.iter_generate(processed_text, selected_voice, batch_size)
     else:
-        description = "A slow, calm, and soothing male voice, speaking clearly and at a measured pace, ideal for elderly listeners."
+        # Look up the precomputed description tokens and encoder states for the chosen voice
+        voice = voice_cache.get(selected_voice, voice_cache[DEFAULT_VOICE])
+        batches = (
+            generate_batch(model, tokenizer, processed_text[start:start + batch_size], voice)
+            for start in range(0, len(processed_text), batch_size)
+        )
+    for batch in batches:
+        yield from batch
 
-    # Preprocess text for smoother output
-    processed_text = preprocess_text(input_text)
+# Assembler for a text of processed_text segments, with its buffer sized for the expected audio
+def make_assembler(processed_text):
+    return AudioAssembler(sampling_rate, capacity=int(expected_audio_seconds(processed_text) * sampling_rate))
 
-    # Initialize audio buffer to concatenate multiple sentence outputs
-    full_audio = []
-
-    for sentence in processed_text:
-        input_ids = tokenizer(description, return_tensors="pt").input_ids.to("cpu")
-        prompt_input_ids = tokenizer(sentence, return_tensors="pt").input_ids.to("cpu")
-
-        # Generate the speech audio using greedy decoding (no beam search)
-        generation = model.generate(
-            input_ids=input_ids,
-            prompt_input_ids=prompt_input_ids,
-            num_beams=1,                   # Set to 1 for greedy decoding
-            num_beam_groups=1,             # Also set this to 1 for compatibility
-            max_length=500,                # Increase max_length to ensure complete sentences
-            no_repeat_ngram_size=3,         # Avoid repetition
-            early_stopping=True             # Stop early if necessary
-        )
-        audio_arr = generation.cpu().numpy().squeeze()
+# Encode one audio array (or a sequence of them) in the chosen output format into a bytes buffer
+def encode_output(audio, audio_format=DEFAULT_AUDIO_FORMAT, bitrate_kbps=DEFAULT_BITRATE_KBPS):
+    return io.BytesIO(encode_audio(audio, audio_format, sampling_rate, bitrate_kbps))
 
-        # Normalize audio to prevent clipping
-        max_abs_value = np.max(np.abs(audio_arr))
-        if max_abs_value > 0:
-            audio_arr = audio_arr / max_abs_value
+# Cache key for Parler-TTS audio; the model only speaks English and has no slow flag
+def parler_cache_key(input_text, selected_voice, audio_format=DEFAULT_AUDIO_FORMAT, bitrate_kbps=DEFAULT_BITRATE_KBPS):
+    return audio_cache_key(input_text, "en", False, selected_voice, "parler-tts", encoding=f"{audio_format}@{bitrate_kbps}")
 
-        # Append each sentence's audio output to the full audio list
-        full_audio.append(audio_arr)
+def generate_audio(input_text, selected_voice, batch_size=DEFAULT_BATCH_SIZE,
+                   audio_format=DEFAULT_AUDIO_FORMAT, bitrate_kbps=DEFAULT_BITRATE_KBPS):
+    # Return the stored audio if this text was already converted with this voice and format
+    key = parler_cache_key(input_text, selected_voice, audio_format, bitrate_kbps)
+    cached_audio = audio_cache.get(key)
+    if cached_audio is not None:
+        return io.BytesIO(cached_audio)
 
-    # Concatenate all the audio segments into a single array
-    full_audio_arr = np.concatenate(full_audio)
+    # Preprocess text for smoother output
+    processed_text = preprocess_text(input_text)
 
-    # Convert the numpy array into bytes buffer instead of saving to a file
-    audio_buffer = io.BytesIO()
-    sf.write(audio_buffer, full_audio_arr, samplerate=model.config.sampling_rate, format="WAV")
-    audio_buffer.seek(0)  # Reset buffer pointer
+    # Generate the sentences batch_size at a time so decoding uses more CPU cores per step; each
+    # one is trimmed, leveled and crossfaded into a single buffer as it arrives
+    assembler = make_assembler(processed_text)
+    for audio_arr in iter_sentence_audio(processed_text, selected_voice, batch_size):
+        assembler.append(audio_arr)
 
+    audio_buffer = encode_output(assembler.finish(), audio_format, bitrate_kbps)
+    audio_cache.put(key, audio_buffer.getvalue())
     return audio_buffer
 
+# Streaming variant of generate_audio: a background thread synthesizes sentence N+1 while the
+# caller is still playing sentence N, so the first audio is ready after a single sentence
+def generate_audio_stream(input_text, selected_voice, batch_size=1):
+    processed_text = preprocess_text(input_text)
+
+    # A one-slot queue keeps the producer exactly one sentence ahead of playback
+    sentence_queue = queue.Queue(maxsize=1)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for audio_arr in iter_sentence_audio(processed_text, selected_voice, batch_size):
+                if stop.is_set():
+                    return
+                sentence_queue.put(audio_arr)
+            sentence_queue.put(done)
+        except Exception as e:
+            sentence_queue.put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = sentence_queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Let the producer exit if the consumer stops early (e.g. the script was rerun)
+        stop.set()
+        while producer.is_alive():
+            try:
+                sentence_queue.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+
 def main():
     # Load model and tokenizer with feedback spinner
     with st.spinner('Loading Text-to-Speech Model...'):
-        global model, tokenizer
-        model, tokenizer = load_model_and_tokenizer()
+        global model, tokenizer, voice_cache, replica_pool, sampling_rate
+        if TTS_REPLICAS > 0:
+            # Generation runs in the replica processes; this process does not load a model
+            model = voice_cache = None
+            tokenizer = load_segment_tokenizer()
+            replica_pool = load_replica_pool()
+            sampling_rate = replica_pool.sampling_rate
+            startup_timings = replica_pool.startup_timings
+        else:
+            model, tokenizer, startup_timings = load_model_and_tokenizer()
+            voice_cache = load_voice_cache(model, tokenizer)
+            replica_pool = None
+            sampling_rate = model.config.sampling_rate
 
     # Streamlit app layout with accessibility in mind
     st.title("📖 Text to Speech Converter for the Elderly")
@@ -86,14 +162,55 @@ def main():
     voice_options = ["Female Voice", "Male Voice"]
     selected_voice = st.selectbox("Choose voice:", voice_options)
 
+    # Sentences generated together; larger batches keep more CPU cores busy during decoding
+    batch_size = st.slider("Sentences per batch:", min_value=1, max_value=16, value=DEFAULT_BATCH_SIZE)
+    if TTS_BACKEND == "openvino":
+        # The exported decoder IR has no prompt attention mask input, so padded batches are not supported
+        batch_size = 1
+
+    # Output encoding: compressed formats are a fraction of the size of WAV on slow connections
+    format_names = list(AUDIO_FORMATS)
+    audio_format = st.selectbox("Audio format:", format_names, index=format_names.index(DEFAULT_AUDIO_FORMAT),
+                                format_func=lambda name: AUDIO_FORMATS[name].label)
+    bitrate_kbps = None
+    if AUDIO_FORMATS[audio_format].bitrate_range:
+        # Only bitrates the encoder accepts for this format, e.g. MP3 starts at 32 kbps
+        bitrates, default_bitrate = bitrate_options(audio_format)
+        bitrate_kbps = st.select_slider("Bitrate (kbps):", options=bitrates, value=default_bitrate)
+    audio_mime = AUDIO_FORMATS[audio_format].mime
+
+    # Streaming plays each sentence as soon as it is ready instead of waiting for the whole text
+    stream_audio = st.checkbox("Start playing while the rest is being converted", value=True)
+
     # Convert button
     if st.button("Convert to Speech"):
         if input_text:
             try:
-                # Generate audio
-                audio_buffer = generate_audio(input_text, selected_voice)
-                # Play audio directly from memory
-                st.audio(audio_buffer, format='audio/wav')
+                key = parler_cache_key(input_text, selected_voice, audio_format, bitrate_kbps)
+                cached_audio = audio_cache.get(key)
+                if cached_audio is not None:
+                    # Already converted before: play the stored audio without running the model
+                    st.audio(io.BytesIO(cached_audio), format=audio_mime)
+                elif stream_audio:
+                    # Show a player per sentence as it arrives, then the full audio once it is done;
+                    # each part is played exactly as it was trimmed and leveled into the full audio
+                    assembler = AudioAssembler(sampling_rate)
+                    sentence_players = st.container()
+                    for i, audio_arr in enumerate(generate_audio_stream(input_text, selected_voice, batch_size)):
+                        audio_arr = assembler.append(audio_arr)
+                        if not len(audio_arr):
+                            continue
+                        sentence_players.write(f"Part {i + 1}")
+                        sentence_players.audio(encode_output(audio_arr, audio_format, bitrate_kbps), format=audio_mime)
+                    audio_buffer = encode_output(assembler.finish(), audio_format, bitrate_kbps)
+                    audio_cache.put(key, audio_buffer.getvalue())
+                    st.write("Full audio:")
+                    st.audio(audio_buffer, format=audio_mime)
+                else:
+                    # Generate audio
+                    audio_buffer = generate_audio(input_text, selected_voice, batch_size, audio_format, bitrate_kbps)
+                    # Play audio directly from memory
+                    st.audio(audio_buffer, format=audio_mime)
 
             except Exception as e:
                 st.error(f"Error generating audio: {e}")
@@ -106,6 +223,10 @@ def main():
     st.markdown("2. Choose your preferred voice.")
     st.markdown("3. Click 'Convert to Speech' to listen to the audio.")
 
+    # Startup cost of this server process, for operators
+    with st.expander("Model startup timings"):
+        st.json(startup_timings)
+
     # Add team credit at the bottom of the page
     st.markdown("<br><br><center><b>MADE BY TEAM IRJJ 😝</b></center>", unsafe_allow_html=True)
 
@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from pdf_extract import iter_pdf_pages
+from text_segments import SENTENCE_END, end_sentence, split_sentences
+
+# Long-document mode: a booklet or long letter is converted section by section, so memory stays
+# flat however long the document is. The source is read page by page (or line by line), cut into
+# sections at headings or after SECTION_CHARS characters, and every section is translated,
+# synthesized and written to its own MP3 file before the next one is read. A manifest records
+# each finished section, so a crashed or restarted job resumes after the last one; a playlist
+# (playlist.m3u) and the manifest (index.json) list the sections in order.
+#
+#   python long_document.py booklet.pdf --language fr
+
+DOCUMENTS_DIR = os.environ.get("TTS_DOCUMENTS_DIR", os.path.join(".cache", "documents"))
+# Longest section; longer stretches of text are split at sentence boundaries
+SECTION_CHARS = 4000
+# A heading starts a new section only once the current one has at least this much text
+MIN_SECTION_CHARS = 600
+
+MANIFEST_NAME = "index.json"
+PLAYLIST_NAME = "playlist.m3u"
+
+# Lines that start a chapter or section: "Chapter 3", "Section 2: Benefits", "4.1 How to apply", or all capitals
+HEADING = re.compile(r"^(chapter|section|part|article|annex|appendix)\b.{0,70}$|^\d+(\.\d+)*\.?\s+[^\W\d].{0,70}$", re.IGNORECASE)
+
+def is_heading(line):
+    if len(line) > 80 or SENTENCE_END.search(line):
+        return False
+    return HEADING.match(line) is not None or (line.isupper() and len(line) > 3)
+
+# Cut a stream of text pieces (pages, paragraphs) into (title, text) sections, holding at most
+# one section in memory. Sentences that continue across line or page breaks are kept whole.
+def iter_sections(pieces, max_chars=SECTION_CHARS, min_chars=MIN_SECTION_CHARS):
+    title = None
+    sentences = []
+    length = 0
+    carry = ""  # Start of a sentence that continues on the next line
+    for piece in pieces:
+        for line in piece.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            if is_heading(line):
+                if carry:
+                    sentences.append(carry)
+                    length += len(carry) + 1
+                    carry = ""
+                if length >= min_chars:
+                    yield title, " ".join(sentences)
+                    # The heading is read at the start of its section
+                    title, sentences, length = line, [end_sentence(line)], len(line) + 1
+                else:
+                    # Too little text for a section of its own yet; the heading is read as part of it
+                    title = title or line
+                    sentences.append(end_sentence(line))
+                    length += len(line) + 1
+                continue
+
+            carry = f"{carry} {line}" if carry else line
+            complete = split_sentences(carry)
+            # The last sentence may go on in the next line unless it ends with punctuation
+            carry = "" if SENTENCE_END.search(complete[-1]) or len(complete[-1]) > max_chars else complete.pop()
+            for sentence in complete:
+                if sentences and length + len(sentence) > max_chars:
+                    yield title, " ".join(sentences)
+                    sentences, length = [], 0
+                sentences.append(sentence)
+                length += len(sentence) + 1
+    if carry:
+        sentences.append(carry)
+    if sentences:
+        yield title, " ".join(sentences)
+
+def document_id(source_digest, language, slow):
+    payload = json.dumps([source_digest, language, bool(slow)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+def document_dir(doc_id, documents_dir=DOCUMENTS_DIR):
+    return os.path.join(documents_dir, doc_id)
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def load_manifest(doc_id, documents_dir=DOCUMENTS_DIR):
+    try:
+        with open(os.path.join(document_dir(doc_id, documents_dir), MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_manifest(directory, manifest):
+    _write_atomic(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+
+    # Extended M3U playlist with the section titles, playable by most audio players
+    lines = ["#EXTM3U"]
+    for section in manifest["sections"]:
+        lines.append(f"#EXTINF:-1,{section['title']}")
+        lines.append(section["file"])
+    _write_atomic(os.path.join(directory, PLAYLIST_NAME), ("\n".join(lines) + "\n").encode("utf-8"))
+
+# Register a document; source_path is moved into the document directory. kind is "pdf" or "text"
+# (UTF-8). Returns the document id; registering the same document again returns the same id.
+def create_document(source_path, kind, language, slow, source_digest, documents_dir=DOCUMENTS_DIR):
+    doc_id = document_id(source_digest, language, slow)
+    directory = document_dir(doc_id, documents_dir)
+    os.makedirs(directory, exist_ok=True)
+    source_name = "source.pdf" if kind == "pdf" else "source.txt"
+    if os.path.exists(os.path.join(directory, source_name)):
+        os.remove(source_path)
+    else:
+        shutil.move(source_path, os.path.join(directory, source_name))
+    if load_manifest(doc_id, documents_dir) is None:
+        _save_manifest(directory, {
+            "id": doc_id, "kind": kind, "source": source_name, "language": language, "slow": bool(slow),
+            "created": time.time(), "finished": False, "sections": [],
+        })
+    return doc_id
+
+# Register text (e.g. a fetched article) as a document
+def create_text_document(text, language, slow, documents_dir=DOCUMENTS_DIR):
+    os.makedirs(documents_dir, exist_ok=True)
+    data = text.encode("utf-8")
+    fd, path = tempfile.mkstemp(dir=documents_dir, suffix=".upload")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return create_document(path, "text", language, slow, hashlib.sha256(data).hexdigest(), documents_dir)
+
+# Yield the source's text a page (PDF) or a line (text) at a time; progress["read"] and
+# progress["total"] track how far through the source the reader is
+def iter_source_text(directory, manifest, progress):
+    path = os.path.join(directory, manifest["source"])
+    if manifest["kind"] == "pdf":
+        import pdfplumber
+
+        with pdfplumber.open(path) as pdf:
+            progress["total"] = len(pdf.pages)
+        for page_number, text in iter_pdf_pages(path):
+            progress["read"] = page_number + 1
+            yield text
+    else:
+        progress["total"] = os.path.getsize(path)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                progress["read"] += len(line.encode("utf-8"))
+                yield line
+
+def _text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+# Convert the document section by section, skipping the sections a previous run finished.
+# on_progress(fraction, message) is called after each section and may raise to stop the job.
+def convert_document(doc_id, on_progress=None, documents_dir=DOCUMENTS_DIR):
+    # Imported here so reading manifests and playlists does not load the translation and TTS clients
+    from pipeline import generate_audio_gtts, translate_text
+
+    directory = document_dir(doc_id, documents_dir)
+    manifest = load_manifest(doc_id, documents_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Unknown document: {doc_id}")
+    if manifest["finished"]:
+        return manifest
+
+    finished = manifest["sections"]
+    progress = {"read": 0, "total": 0}
+    previous_title = None
+    for index, (title, text) in enumerate(iter_sections(iter_source_text(directory, manifest, progress))):
+        if title is None or title == previous_title:
+            section_title = f"{title} (continued)" if title else f"Part {index + 1}"
+        else:
+            section_title = title
+        previous_title = title or previous_title
+
+        digest = _text_digest(text)
+        if index < len(finished):
+            if finished[index]["text_digest"] == digest and os.path.exists(os.path.join(directory, finished[index]["file"])):
+                continue  # Done in an earlier run
+            # The sections no longer line up with the earlier run; redo everything from here
+            del finished[index:]
+
+        translated_text = translate_text(text, manifest["language"])
+        audio_bytes = generate_audio_gtts(translated_text, manifest["language"], manifest["slow"]).getvalue()
+        file_name = f"section_{index + 1:04d}.mp3"
+        _write_atomic(os.path.join(directory, file_name), audio_bytes)
+
+        finished.append({
+            "index": index + 1, "title": section_title, "file": file_name, "text_digest": digest,
+            "chars": len(text), "bytes": len(audio_bytes),
+        })
+        _save_manifest(directory, manifest)
+        if on_progress is not None:
+            fraction = progress["read"] / progress["total"] if progress["total"] else 0.0
+            on_progress(min(fraction, 0.99), f"Converted section {index + 1}: {section_title}")
+
+    manifest["finished"] = True
+    _save_manifest(directory, manifest)
+    return manifest
+
+# Documents whose conversion was interrupted, e.g. by a crash or restart
+def unfinished_documents(documents_dir=DOCUMENTS_DIR):
+    if not os.path.isdir(documents_dir):
+        return []
+    doc_ids = []
+    for doc_id in sorted(os.listdir(documents_dir)):
+        if not os.path.isdir(document_dir(doc_id, documents_dir)):
+            continue
+        manifest = load_manifest(doc_id, documents_dir)
+        if manifest is not None and not manifest["finished"]:
+            doc_ids.append(doc_id)
+    return doc_ids
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a long document into per-section audio files and a playlist.")
+    parser.add_argument("source", help="a PDF or UTF-8 text file")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--slow", action="store_true")
+    parser.add_argument("--documents-dir", default=DOCUMENTS_DIR)
+    args = parser.parse_args()
+
+    kind = "pdf" if args.source.lower().endswith(".pdf") else "text"
+    os.makedirs(args.documents_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, upload_path = tempfile.mkstemp(dir=args.documents_dir, suffix=".upload")
+    with open(args.source, "rb") as source, os.fdopen(fd, "wb") as upload:
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+            upload.write(block)
+    doc_id = create_document(upload_path, kind, args.language, args.slow, digest.hexdigest(), args.documents_dir)
+    manifest = convert_document(doc_id, lambda fraction, message: print(f"{fraction:6.1%}  {message}"), args.documents_dir)
+    print(os.path.join(document_dir(doc_id, args.documents_dir), PLAYLIST_NAME))
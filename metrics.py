@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Lightweight per-request instrumentation for the conversion pipeline. Every stage runs inside
+# span(stage, **fields); finished spans are logged as JSON lines and aggregated into
+# Prometheus-style histograms, written to TTS_METRICS_FILE and served on TTS_METRICS_PORT.
+# With TTS_METRICS unset, span() returns a shared no-op object and records nothing.
+
+METRICS_ENABLED = os.environ.get("TTS_METRICS", "0") == "1"
+METRICS_FILE = os.environ.get("TTS_METRICS_FILE", os.path.join(".cache", "metrics.prom"))
+METRICS_PORT = int(os.environ.get("TTS_METRICS_PORT", "0"))
+
+# Minimum seconds between rewrites of the metrics file
+METRICS_FILE_INTERVAL = 5.0
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("tts.metrics")
+if METRICS_ENABLED and not logger.handlers:
+    # One JSON object per line on stderr
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_histograms = {}   # stage -> [bucket counts..., +Inf count, sum]
+_errors = {}       # stage -> count
+_cache_counts = {} # (cache, "hit" | "miss") -> count
+_last_file_write = 0.0
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    # Attach more fields once they are known, e.g. output size or cache_hit
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.fields["error"] = f"{exc_type.__name__}: {exc}"
+        _observe(self.stage, duration, exc_type is not None)
+        logger.info(json.dumps({"stage": self.stage, "seconds": round(duration, 6), **self.fields}, default=str))
+        return False
+
+# Time a pipeline stage: `with span("translate_text", chars=len(text)) as s: ...; s.set(cache_hit=True)`
+def span(stage, **fields):
+    if not METRICS_ENABLED:
+        return _NULL_SPAN
+    return Span(stage, fields)
+
+# Count a cache lookup result for the named cache
+def record_cache(cache, hits=0, misses=0):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _cache_counts[(cache, "hit")] = _cache_counts.get((cache, "hit"), 0) + hits
+        _cache_counts[(cache, "miss")] = _cache_counts.get((cache, "miss"), 0) + misses
+
+def _observe(stage, duration, failed):
+    global _last_file_write
+    with _lock:
+        histogram = _histograms.setdefault(stage, [0] * (len(LATENCY_BUCKETS) + 2))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += duration
+        if failed:
+            _errors[stage] = _errors.get(stage, 0) + 1
+        write_file = METRICS_FILE and time.monotonic() - _last_file_write >= METRICS_FILE_INTERVAL
+        if write_file:
+            _last_file_write = time.monotonic()
+    if write_file:
+        write_metrics_file(METRICS_FILE)
+
+# Render every metric in the Prometheus text exposition format
+def render_prometheus():
+    lines = [
+        "# HELP tts_stage_seconds Time spent in each pipeline stage.",
+        "# TYPE tts_stage_seconds histogram",
+    ]
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                lines.append(f'tts_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'tts_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram[-2]}')
+            lines.append(f'tts_stage_seconds_sum{{stage="{stage}"}} {histogram[-1]:.6f}')
+            lines.append(f'tts_stage_seconds_count{{stage="{stage}"}} {histogram[-2]}')
+
+        lines.append("# HELP tts_stage_errors_total Pipeline stage runs that raised an error.")
+        lines.append("# TYPE tts_stage_errors_total counter")
+        for stage, count in sorted(_errors.items()):
+            lines.append(f'tts_stage_errors_total{{stage="{stage}"}} {count}')
+
+        lines.append("# HELP tts_cache_requests_total Cache lookups by cache and result.")
+        lines.append("# TYPE tts_cache_requests_total counter")
+        for (cache, result), count in sorted(_cache_counts.items()):
+            lines.append(f'tts_cache_requests_total{{cache="{cache}",result="{result}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+# Atomically replace path with the current metrics, for a node exporter textfile collector
+def write_metrics_file(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Serve /metrics from a background thread; returns the server
+def start_metrics_server(port, host="0.0.0.0"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Modules are imported once per process, so the endpoint starts once even though Streamlit reruns app.py
+if METRICS_ENABLED and METRICS_PORT:
+    try:
+        start_metrics_server(METRICS_PORT)
+    except OSError as e:
+        # Another Streamlit process on this host already serves the port
+        logger.warning(f"Metrics endpoint not started: {e}")
@@ -0,0 +1,113 @@
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+# Parler-TTS model loading with a fast cold start. torch, transformers and parler_tts are only
+# imported when the model is loaded; the model is read from a pre-materialized local snapshot
+# (safetensors, no hub lookups) when TTS_MODEL_PATH points at one; and a short warm-up
+# generation pays the one-time kernel and allocation costs before the app reports ready.
+#
+#   python model_loader.py --snapshot models/parler_tts_mini    # run once at build time
+
+REPO_ID = "parler-tts/parler_tts_mini_v0.1"
+
+# Local snapshot directory; when set, nothing is fetched from or checked against the hub
+TTS_MODEL_PATH = os.environ.get("TTS_MODEL_PATH")
+# Written with the startup timings once the model is loaded and warmed up (for readiness probes)
+TTS_READY_FILE = os.environ.get("TTS_READY_FILE", os.path.join(".cache", "tts_ready.json"))
+# Set TTS_WARMUP=0 to skip the warm-up generation
+TTS_WARMUP = os.environ.get("TTS_WARMUP", "1") == "1"
+
+WARMUP_PROMPT = "Hello."
+WARMUP_DESCRIPTION = "A clear, slow, and soft-spoken female voice."
+
+logger = logging.getLogger("tts.startup")
+
+# Load the model and tokenizer; returns (model, tokenizer, timings) with import and load seconds
+def load_parler(model_path=TTS_MODEL_PATH, backend="torch"):
+    timings = {}
+
+    start = time.perf_counter()
+    from parler_tts import ParlerTTSForConditionalGeneration
+    from transformers import AutoTokenizer
+    timings["import_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if model_path:
+        # Read only the local files, so a cold start makes no network requests
+        model = ParlerTTSForConditionalGeneration.from_pretrained(model_path, local_files_only=True, use_safetensors=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    else:
+        model = ParlerTTSForConditionalGeneration.from_pretrained(REPO_ID)
+        tokenizer = AutoTokenizer.from_pretrained(REPO_ID)
+    model = model.to("cpu").eval()
+    if backend == "openvino":
+        # Imported here so the torch backend does not need openvino installed
+        from ov_backend import load_openvino_model
+        model = load_openvino_model(model)
+    elif backend != "torch":
+        raise ValueError(f"Unknown TTS backend: {backend}")
+    timings["load_seconds"] = time.perf_counter() - start
+    return model, tokenizer, timings
+
+# Load only the tokenizer, e.g. for segmenting text in a process that does not run the model
+def load_tokenizer(model_path=TTS_MODEL_PATH):
+    from transformers import AutoTokenizer
+
+    if model_path:
+        return AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    return AutoTokenizer.from_pretrained(REPO_ID)
+
+# Run one short generation so the first user does not pay for kernel selection and allocations
+def warm_up(model, tokenizer):
+    import torch
+
+    start = time.perf_counter()
+    input_ids = tokenizer(WARMUP_DESCRIPTION, return_tensors="pt").input_ids
+    prompt_input_ids = tokenizer(WARMUP_PROMPT, return_tensors="pt").input_ids
+    with torch.no_grad():
+        model.generate(input_ids=input_ids, prompt_input_ids=prompt_input_ids, max_length=50)
+    return time.perf_counter() - start
+
+# Record the startup timings and write the ready file
+def mark_ready(timings, ready_file=TTS_READY_FILE):
+    timings = {name: round(seconds, 3) for name, seconds in timings.items()}
+    logger.info(json.dumps({"event": "tts_ready", **timings}))
+    if ready_file:
+        Path(ready_file).parent.mkdir(parents=True, exist_ok=True)
+        Path(ready_file).write_text(json.dumps(timings))
+    return timings
+
+# Load, warm up and mark ready; returns (model, tokenizer, timings). Pass ready_file=None when
+# another process writes the ready file (e.g. model replicas, whose parent waits for all of them)
+def start_model(model_path=TTS_MODEL_PATH, backend="torch", warmup=TTS_WARMUP, ready_file=TTS_READY_FILE):
+    model, tokenizer, timings = load_parler(model_path, backend)
+    if warmup:
+        timings["warmup_seconds"] = warm_up(model, tokenizer)
+    return model, tokenizer, mark_ready(timings, ready_file)
+
+# Save the model as safetensors plus its tokenizer and configs, for loading with TTS_MODEL_PATH
+def snapshot(output_dir, repo_id=REPO_ID):
+    from parler_tts import ParlerTTSForConditionalGeneration
+    from transformers import AutoTokenizer
+
+    model = ParlerTTSForConditionalGeneration.from_pretrained(repo_id)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    AutoTokenizer.from_pretrained(repo_id).save_pretrained(output_dir)
+    return output_dir
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare or time the Parler-TTS cold start.")
+    parser.add_argument("--snapshot", metavar="DIR", help="write a local safetensors snapshot of the model to DIR")
+    parser.add_argument("--backend", choices=("torch", "openvino"), default="torch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.snapshot:
+        print(snapshot(args.snapshot))
+    else:
+        # Time a full cold start: imports, load and warm-up
+        print(json.dumps(start_model(backend=args.backend)[2], indent=2))
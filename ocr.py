@@ -0,0 +1,203 @@
+import hashlib
+import io
+import logging
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps
+from disk_cache import DiskCache
+
+# Local OCR with Tesseract (pytesseract) for photos of letters and scanned PDF pages. Large
+# photos are downscaled and binarized first; pages with several columns or many lines are cut
+# into tiles along blank gutters and rows, and the tiles are recognized in parallel. Results are
+# cached by image hash, so the same photo or scanned page is recognized once.
+
+# Tesseract language packs to use, e.g. "eng+kor"
+OCR_LANGUAGES = os.environ.get("TTS_OCR_LANGUAGES", "eng")
+# Longest image side after downscaling; phone photos are often 4000 px, more than Tesseract needs
+OCR_MAX_SIDE = int(os.environ.get("TTS_OCR_MAX_SIDE", "2400"))
+# Tiles recognized at the same time
+OCR_WORKERS = int(os.environ.get("TTS_OCR_WORKERS", str(os.cpu_count() or 1)))
+# Pages taller than this (after downscaling) are cut into bands of about this height
+OCR_TILE_HEIGHT = 800
+# Resolution scanned PDF pages are rendered at before recognition
+OCR_PDF_RESOLUTION = 200
+OCR_CACHE_DIR = os.environ.get("TTS_OCR_CACHE_DIR", os.path.join(".cache", "ocr"))
+OCR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger("tts.ocr")
+
+class OCRError(Exception):
+    pass
+
+_available = None
+_available_lock = threading.Lock()
+
+# Whether pytesseract and the tesseract binary are installed
+def ocr_available():
+    global _available
+    with _available_lock:
+        if _available is None:
+            try:
+                import pytesseract
+
+                pytesseract.get_tesseract_version()
+                _available = True
+            except Exception as e:
+                logger.warning("OCR is unavailable: %s", e)
+                _available = False
+        return _available
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _ocr_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES, name="ocr")
+        return _cache
+
+# Greyscale, downscale to max_side and binarize with Otsu's threshold (black text on white)
+def prepare_image(image, max_side=OCR_MAX_SIDE):
+    if image.format == "JPEG" and max(image.size) > max_side:
+        # Let the JPEG decoder skip the detail that downscaling would throw away
+        scale = max_side / max(image.size)
+        image.draft("L", (round(image.width * scale), round(image.height * scale)))
+    image = ImageOps.exif_transpose(image).convert("L")
+    if max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.LANCZOS)
+    pixels = np.asarray(ImageOps.autocontrast(image, cutoff=1))
+    if pixels.min() == pixels.max():
+        return np.zeros(pixels.shape, dtype=bool)  # Blank (e.g. a separator page): nothing to read
+
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (means[-1] * weights / weights[-1] - means) ** 2 / (weights * (weights[-1] - weights))
+    threshold = int(np.nanargmax(between))
+    ink = pixels <= threshold
+    if ink.mean() > 0.5:
+        ink = ~ink  # Light text on a dark background
+    return ink
+
+# (start, end) runs of at least min_length positions whose profile is zero
+def _gaps(profile, min_length):
+    empty = np.concatenate(([False], profile == 0, [False]))
+    edges = np.flatnonzero(np.diff(empty.astype(np.int8)))
+    return [(start, end) for start, end in zip(edges[::2], edges[1::2]) if end - start >= min_length]
+
+# Split the page into columns at blank vertical gutters in its middle part
+def split_columns(ink):
+    height, width = ink.shape
+    # Ignore specks: a column counts as ink when more than 0.5% of its pixels are dark
+    profile = (ink.sum(axis=0) > height * 0.005).astype(np.int8)
+    margin = width // 10
+    cuts = [
+        (start + end) // 2
+        for start, end in _gaps(profile, max(8, width // 50))
+        if margin < start and end < width - margin
+    ]
+    bounds = [0, *cuts, width]
+    return [(left, right) for left, right in zip(bounds, bounds[1:])]
+
+# Split a column into bands of about tile_height rows, cutting only between text lines
+def split_bands(ink, tile_height=OCR_TILE_HEIGHT):
+    height = ink.shape[0]
+    if height <= tile_height * 1.5:
+        return [(0, height)]
+    profile = ink.any(axis=1).astype(np.int8)
+    blank_rows = [(start + end) // 2 for start, end in _gaps(profile, 3)]
+    bands = []
+    top = 0
+    while height - top > tile_height * 1.5:
+        candidates = [row for row in blank_rows if top + tile_height // 2 < row <= top + tile_height * 3 // 2]
+        if not candidates:
+            break  # No gap between lines near enough; keep the rest as one tile
+        cut = min(candidates, key=lambda row: abs(row - top - tile_height))
+        bands.append((top, cut))
+        top = cut
+    bands.append((top, height))
+    return bands
+
+# Tiles of the page as (top, bottom, left, right), in reading order: column by column, top to bottom
+def tile_page(ink, tile_height=OCR_TILE_HEIGHT):
+    tiles = []
+    for left, right in split_columns(ink):
+        column = ink[:, left:right]
+        for top, bottom in split_bands(column, tile_height):
+            if column[top:bottom].any():
+                tiles.append((top, bottom, left, right))
+    return tiles
+
+# Each tile gets its own Tesseract process; stop each from also starting a thread per core. Only
+# the Tesseract processes get the limit, not this process or anything else it starts.
+def _tesseract_env():
+    env = dict(os.environ)
+    env.setdefault("OMP_THREAD_LIMIT", "1")
+    return env
+
+def _recognize(tile, languages):
+    import pytesseract
+
+    # Black text on white, with a white border so characters at the tile's edge are read
+    image = ImageOps.expand(Image.fromarray(np.where(tile, 0, 255).astype(np.uint8)), border=10, fill=255)
+    png = io.BytesIO()
+    image.save(png, format="PNG")
+    result = subprocess.run(
+        [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", languages, "--psm", "6"],
+        input=png.getvalue(), capture_output=True, env=_tesseract_env(),
+    )
+    if result.returncode != 0:
+        raise OCRError(f"Tesseract failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout.decode("utf-8").strip()
+
+# Recognize the text of an image (PIL image, bytes or a file object). Tiles are recognized on
+# up to workers threads (each runs its own Tesseract process); pass workers=1 inside worker processes.
+def recognize_image(image, languages=OCR_LANGUAGES, workers=OCR_WORKERS, use_cache=True):
+    if not isinstance(image, Image.Image):
+        data = image if isinstance(image, bytes) else image.read()
+        try:
+            image = Image.open(io.BytesIO(data))
+        except OSError as e:  # Includes UnidentifiedImageError for files that are not images
+            raise OCRError(f"The file could not be read as an image: {e}") from e
+    else:
+        data = None
+    if not ocr_available():
+        raise OCRError("Image text extraction (OCR) is not installed on this server.")
+
+    key = None
+    if use_cache:
+        if data is None:
+            data = image.tobytes() + repr((image.mode, image.size)).encode("ascii")
+        key = hashlib.sha256(data + repr((languages, OCR_MAX_SIDE, OCR_TILE_HEIGHT)).encode("ascii")).hexdigest()
+        cached = _ocr_cache().get(key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+    try:
+        ink = prepare_image(image)
+    except OSError as e:  # Truncated or corrupt image data
+        raise OCRError(f"The image could not be decoded: {e}") from e
+    tiles = [ink[top:bottom, left:right] for top, bottom, left, right in tile_page(ink)]
+    if workers > 1 and len(tiles) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(tiles)), thread_name_prefix="ocr") as pool:
+            texts = list(pool.map(_recognize, tiles, [languages] * len(tiles)))
+    else:
+        texts = [_recognize(tile, languages) for tile in tiles]
+    text = "\n".join(text for text in texts if text)
+
+    if key is not None:
+        _ocr_cache().put(key, text.encode("utf-8"))
+    return text
+
+# Recognize a pdfplumber page that has no text layer (a scan); returns "" when OCR is not installed
+def recognize_pdf_page(page, workers=OCR_WORKERS):
+    if not ocr_available():
+        return ""
+    image = page.to_image(resolution=OCR_PDF_RESOLUTION).original
+    return recognize_image(image, workers=workers)
@@ -0,0 +1,326 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+import torch
+import torch.nn as nn
+import openvino as ov
+
+# OpenVINO inference backend for Parler-TTS, moved out of parler-tts-text-to-speech.ipynb.
+# The text encoder and the two decoder stages are exported to OpenVINO IR once, then compiled
+# and swapped into the PyTorch model, so model.generate() returns the same audio as the torch path.
+
+# Where the IR files and OpenVINO's compiled-model cache are stored
+OV_MODEL_DIR = Path(os.environ.get("TTS_OV_MODEL_DIR", "models"))
+OV_CACHE_DIR = Path(os.environ.get("TTS_OV_CACHE_DIR", OV_MODEL_DIR / "cache"))
+OV_DEVICE = os.environ.get("TTS_OV_DEVICE", "CPU")
+
+# Weight precision of the IR to run: "fp32", or a compressed variant from ov_compress ("int8", "int4")
+OV_PRECISION = os.environ.get("TTS_OV_PRECISION", "fp32")
+
+# Keep the decoder KV cache inside the OpenVINO infer request instead of passing it through Python
+OV_STATEFUL = os.environ.get("TTS_OV_STATEFUL", "0") == "1"
+
+TEXT_ENCODER_IR_NAME = "text_encoder_ir.xml"
+DECODER_STAGE_1_IR_NAME = "decoder_stage_1_ir.xml"
+DECODER_STAGE_2_IR_NAME = "decoder_stage_2_ir.xml"
+DECODER_STATEFUL_IR_NAME = "decoder_stage_2_stateful_ir.xml"
+
+EncoderOutput = namedtuple("EncoderOutput", "last_hidden_state")
+DecoderOutput = namedtuple("DecoderOutput", ("last_hidden_state", "past_key_values", "hidden_states", "attentions", "cross_attentions"))
+
+# Convert a PyTorch module to OpenVINO IR and save it, unless the IR already exists
+def convert(model: torch.nn.Module, xml_path: str, example_input):
+    xml_path = Path(xml_path)
+    if not xml_path.exists():
+        xml_path.parent.mkdir(parents=True, exist_ok=True)
+        with torch.no_grad():
+            converted_model = ov.convert_model(model, example_input=example_input)
+
+        ov.save_model(converted_model, xml_path)
+
+        # cleanup memory
+        torch._C._jit_clear_class_registry()
+        torch.jit._recursive.concrete_type_store = torch.jit._recursive.ConcreteTypeStore()
+        torch.jit._state._clear_class_state()
+
+# First decoder stage: runs on the prompt and returns the initial past_key_values
+class DecoderStage1Wrapper(torch.nn.Module):
+    def __init__(self, decoder):
+        super().__init__()
+        self.decoder = decoder
+
+    def forward(self, input_ids=None, encoder_hidden_states=None, encoder_attention_mask=None, prompt_hidden_states=None):
+        return self.decoder(
+            input_ids=input_ids,
+            return_dict=False,
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_attention_mask=encoder_attention_mask,
+            prompt_hidden_states=prompt_hidden_states,
+        )
+
+# Second decoder stage: produces one token per run, taking the flattened past_key_values
+class DecoderStage2Wrapper(torch.nn.Module):
+    def __init__(self, decoder):
+        super().__init__()
+        self.decoder = decoder
+
+    def forward(self, input_ids=None, encoder_hidden_states=None, encoder_attention_mask=None, past_key_values=None):
+        past_key_values = tuple(tuple(past_key_values[i : i + 4]) for i in range(0, len(past_key_values), 4))
+        return self.decoder(
+            input_ids=input_ids,
+            return_dict=False,
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_attention_mask=encoder_attention_mask,
+            past_key_values=past_key_values,
+        )
+
+# Export the text encoder and both decoder stages of model to IR files in model_dir
+def export_models(model, model_dir=OV_MODEL_DIR):
+    model_dir = Path(model_dir)
+    decoder_config = model.decoder.config
+    num_codebooks = decoder_config.num_codebooks
+    hidden_size = decoder_config.hidden_size
+    num_heads = decoder_config.num_attention_heads
+    head_dim = hidden_size // num_heads
+    encoder_length = 39
+
+    convert(
+        model.text_encoder,
+        model_dir / TEXT_ENCODER_IR_NAME,
+        {"input_ids": torch.ones((1, encoder_length), dtype=torch.int64)},
+    )
+
+    decoder = model.decoder.model.decoder
+    convert(
+        DecoderStage1Wrapper(decoder),
+        model_dir / DECODER_STAGE_1_IR_NAME,
+        {
+            "input_ids": torch.ones((num_codebooks, 1), dtype=torch.int64),
+            "encoder_hidden_states": torch.ones((1, encoder_length, hidden_size), dtype=torch.float32),
+            "encoder_attention_mask": torch.ones((1, encoder_length), dtype=torch.int64),
+            "prompt_hidden_states": torch.ones((1, num_codebooks, hidden_size), dtype=torch.float32),
+        },
+    )
+    convert(
+        DecoderStage2Wrapper(decoder),
+        model_dir / DECODER_STAGE_2_IR_NAME,
+        {
+            "input_ids": torch.ones((num_codebooks, 1), dtype=torch.int64),
+            "encoder_hidden_states": torch.ones((1, encoder_length, hidden_size), dtype=torch.float32),
+            "encoder_attention_mask": torch.ones((1, encoder_length), dtype=torch.int64),
+            "past_key_values": (
+                (
+                    torch.ones(1, num_heads, num_codebooks + 1, head_dim, dtype=torch.float32),
+                    torch.ones(1, num_heads, num_codebooks + 1, head_dim, dtype=torch.float32),
+                    torch.ones(1, num_heads, encoder_length, head_dim, dtype=torch.float32),
+                    torch.ones(1, num_heads, encoder_length, head_dim, dtype=torch.float32),
+                )
+                * decoder_config.num_hidden_layers
+            ),
+        },
+    )
+
+# Turn the stage 2 decoder IR into a stateful model: every past_key_values input is paired with
+# the matching present output as an internal variable, so the KV cache stays in the infer request
+# and each decoding step only exchanges input ids and hidden states with Python
+def make_stateful_decoder(model_dir=OV_MODEL_DIR):
+    from openvino._offline_transformations import apply_make_stateful_transformation
+
+    model_dir = Path(model_dir)
+    stateful_path = model_dir / DECODER_STATEFUL_IR_NAME
+    if stateful_path.exists():
+        return stateful_path
+
+    ov_model = ov.Core().read_model(model_dir / DECODER_STAGE_2_IR_NAME)
+    # Inputs are (input_ids, encoder_hidden_states, encoder_attention_mask, *past_key_values) and
+    # outputs are (last_hidden_state, *present_key_values), in the same layer/key/value order
+    state_pairs = {}
+    for i, (kv_input, kv_output) in enumerate(zip(ov_model.inputs[3:], ov_model.outputs[1:])):
+        input_name = _kv_input_name(i)
+        output_name = f"present_{i:03d}"
+        kv_input.get_tensor().set_names({input_name})
+        kv_output.get_tensor().set_names({output_name})
+        state_pairs[input_name] = output_name
+    apply_make_stateful_transformation(ov_model, state_pairs)
+    ov.save_model(ov_model, stateful_path)
+    return stateful_path
+
+def _kv_input_name(i):
+    return f"past_key_values_{i:03d}_"
+
+# OpenVINO runtime with the compiled-model cache turned on, so later starts skip compilation
+def make_core(cache_dir=OV_CACHE_DIR):
+    core = ov.Core()
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        core.set_property({"CACHE_DIR": str(cache_dir)})
+    return core
+
+class TextEncoderModelWrapper(torch.nn.Module):
+    def __init__(self, core, encoder_ir_path, config, device=OV_DEVICE):
+        super().__init__()
+        ov_config = {}
+        if "GPU" in device:
+            ov_config = {"INFERENCE_PRECISION_HINT": "f32"}
+        self.encoder = core.compile_model(encoder_ir_path, device, ov_config)
+        self.config = config
+        self.dtype = self.config.torch_dtype
+
+    def __call__(self, input_ids, **_):
+        last_hidden_state = self.encoder(input_ids)[0]
+        return EncoderOutput(torch.from_numpy(last_hidden_state))
+
+class DecoderWrapper(torch.nn.Module):
+    def __init__(self, core, decoder_stage_1_ir_path, decoder_stage_2_ir_path, config, device=OV_DEVICE):
+        super().__init__()
+        self.decoder_stage_1 = core.compile_model(decoder_stage_1_ir_path, device)
+        self.decoder_stage_2 = core.compile_model(decoder_stage_2_ir_path, device)
+        self.config = config
+        self.embed_tokens = None
+        embed_dim = config.vocab_size + 1  # + 1 for pad token id
+        self.embed_tokens = nn.ModuleList([nn.Embedding(embed_dim, config.hidden_size) for _ in range(config.num_codebooks)])
+        # Set to a list to record the latency of every decoding step (used by the precision report)
+        self.step_latencies = None
+
+    def __call__(self, input_ids=None, encoder_hidden_states=None, encoder_attention_mask=None, past_key_values=None, prompt_hidden_states=None, **kwargs):
+        if self.step_latencies is None:
+            return self._run(input_ids, encoder_hidden_states, encoder_attention_mask, past_key_values, prompt_hidden_states)
+        start = time.perf_counter()
+        output = self._run(input_ids, encoder_hidden_states, encoder_attention_mask, past_key_values, prompt_hidden_states)
+        self.step_latencies.append(time.perf_counter() - start)
+        return output
+
+    def _run(self, input_ids, encoder_hidden_states, encoder_attention_mask, past_key_values, prompt_hidden_states):
+        inputs = {}
+        if input_ids is not None:
+            inputs["input_ids"] = input_ids
+        if encoder_hidden_states is not None:
+            inputs["encoder_hidden_states"] = encoder_hidden_states
+        if encoder_attention_mask is not None:
+            inputs["encoder_attention_mask"] = encoder_attention_mask
+        if prompt_hidden_states is not None:
+            inputs["prompt_hidden_states"] = prompt_hidden_states
+        if past_key_values is not None:
+            past_key_values = tuple(past_key_value for pkv_per_layer in past_key_values for past_key_value in pkv_per_layer)
+            inputs["past_key_values"] = past_key_values
+            arguments = (
+                input_ids,
+                encoder_hidden_states,
+                encoder_attention_mask,
+                *past_key_values,
+            )
+            outs = self.decoder_stage_2(arguments)
+        else:
+            outs = self.decoder_stage_1(inputs)
+
+        outs = [torch.from_numpy(out) for out in outs.values()]
+        past_key_values = list(list(outs[i : i + 4]) for i in range(1, len(outs), 4))
+
+        return DecoderOutput(outs[0], past_key_values, None, None, None)
+
+# Stands in for past_key_values while the real KV cache lives in the stateful infer request.
+# generate() only needs past_key_values[0][0].shape[2], the number of positions already decoded.
+class StatefulPastKeyValues:
+    def __init__(self, batch_size, past_length):
+        self.shape = (batch_size, None, past_length, None)
+
+    def __getitem__(self, index):
+        return self
+
+class StatefulDecoderWrapper(DecoderWrapper):
+    def __init__(self, core, decoder_stage_1_ir_path, decoder_stateful_ir_path, config, device=OV_DEVICE):
+        super().__init__(core, decoder_stage_1_ir_path, decoder_stateful_ir_path, config, device)
+        # One infer request (and so one KV cache) per thread, so concurrent users do not share state
+        self._local = threading.local()
+
+    def _request(self):
+        if not hasattr(self._local, "request"):
+            request = self.decoder_stage_2.create_infer_request()
+            # Map each KV variable to its index among the stage 1 past_key_values outputs
+            state_index = {}
+            states = request.query_state()
+            for state in states:
+                for i in range(len(states)):
+                    if _kv_input_name(i) in state.name:
+                        state_index[state.name] = i
+            self._local.request = request
+            self._local.state_index = state_index
+        return self._local.request
+
+    def _run(self, input_ids, encoder_hidden_states, encoder_attention_mask, past_key_values, prompt_hidden_states):
+        request = self._request()
+        if past_key_values is None:
+            # First step: run stage 1 on the prompt and load its KV outputs into the request state
+            inputs = {"input_ids": input_ids, "encoder_hidden_states": encoder_hidden_states, "encoder_attention_mask": encoder_attention_mask}
+            if prompt_hidden_states is not None:
+                inputs["prompt_hidden_states"] = prompt_hidden_states
+            outs = list(self.decoder_stage_1(inputs).values())
+            request.reset_state()
+            for state in request.query_state():
+                state.state = ov.Tensor(outs[1 + self._local.state_index[state.name]])
+            self._local.past_length = outs[1].shape[2]
+            last_hidden_state = outs[0]
+        else:
+            # Later steps: only input ids and the encoder inputs go in, only hidden states come out
+            request.infer({0: input_ids, 1: encoder_hidden_states, 2: encoder_attention_mask})
+            self._local.past_length += input_ids.shape[-1]
+            last_hidden_state = request.get_output_tensor(0).data
+
+        past = StatefulPastKeyValues(last_hidden_state.shape[0], self._local.past_length)
+        # Copy, because the request reuses its output buffer on the next step
+        return DecoderOutput(torch.from_numpy(last_hidden_state.copy()), past, None, None, None)
+
+# Directory holding the IR of the given precision
+def ir_dir(model_dir=OV_MODEL_DIR, precision=OV_PRECISION):
+    return Path(model_dir) if precision == "fp32" else Path(model_dir) / precision
+
+# Whether every IR file load_openvino_model needs for this precision has been written
+def ir_prepared(model_dir=OV_MODEL_DIR, precision=OV_PRECISION, stateful=OV_STATEFUL):
+    names = [TEXT_ENCODER_IR_NAME, DECODER_STAGE_1_IR_NAME, DECODER_STAGE_2_IR_NAME]
+    if stateful:
+        names.append(DECODER_STATEFUL_IR_NAME)
+    return all((ir_dir(model_dir, precision) / name).exists() for name in names)
+
+# Export the IR, compress it to the requested precision and make the stateful decoder, skipping
+# files that already exist; returns the directory of the IR to load
+def prepare_ir(model, model_dir=OV_MODEL_DIR, precision=OV_PRECISION, stateful=OV_STATEFUL):
+    model_dir = Path(model_dir)
+    export_models(model, model_dir)
+    if precision != "fp32":
+        from ov_compress import compress_models
+        model_dir = compress_models(model_dir, precision)
+    if stateful:
+        make_stateful_decoder(model_dir)
+    return model_dir
+
+# Export the IR on first use, then swap the compiled OpenVINO models into the PyTorch model.
+# Compressed precisions are produced from the FP32 IR the first time they are requested.
+def load_openvino_model(model, model_dir=OV_MODEL_DIR, device=OV_DEVICE, cache_dir=OV_CACHE_DIR, precision=OV_PRECISION, stateful=OV_STATEFUL):
+    model_dir = prepare_ir(model, model_dir, precision, stateful)
+
+    core = make_core(cache_dir)
+    torch_decoder = model.decoder.model.decoder
+    model.text_encoder = TextEncoderModelWrapper(core, model_dir / TEXT_ENCODER_IR_NAME, model.text_encoder.config, device)
+    if stateful:
+        model.decoder.model.decoder = StatefulDecoderWrapper(
+            core,
+            model_dir / DECODER_STAGE_1_IR_NAME,
+            make_stateful_decoder(model_dir),
+            torch_decoder.config,
+            device,
+        )
+    else:
+        model.decoder.model.decoder = DecoderWrapper(
+            core,
+            model_dir / DECODER_STAGE_1_IR_NAME,
+            model_dir / DECODER_STAGE_2_IR_NAME,
+            torch_decoder.config,
+            device,
+        )
+    # Keep the trained token embeddings in case generate() looks them up on the decoder
+    model.decoder.model.decoder.embed_tokens = torch_decoder.embed_tokens
+    model._supports_cache_class = False
+    model._supports_static_cache = False
+    return model
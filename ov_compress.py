@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import openvino as ov
+
+# Optional weight compression for the exported Parler-TTS IR, plus a report comparing each
+# precision against FP32 so the precision can be chosen per deployment from measurements.
+#
+#   python ov_compress.py --precision int8          # write models/int8/*.xml
+#   python ov_compress.py --report report.json      # compare fp32, int8 and int4
+#   python ov_compress.py --check-stateful          # check the stateful decoder against the stateless one
+
+from ov_backend import DECODER_STAGE_1_IR_NAME, DECODER_STAGE_2_IR_NAME, OV_MODEL_DIR, TEXT_ENCODER_IR_NAME
+
+IR_NAMES = (TEXT_ENCODER_IR_NAME, DECODER_STAGE_1_IR_NAME, DECODER_STAGE_2_IR_NAME)
+
+# Fixed prompts used by the report, covering short and long sentences
+REPORT_PROMPTS = [
+    "Hello, how are you doing today?",
+    "Your appointment at the community health centre is on Tuesday at ten o'clock in the morning.",
+    "Please remember to take your blood pressure medicine with a glass of water after breakfast, and call your doctor if you feel dizzy.",
+]
+REPORT_DESCRIPTION = "A clear, slow, and soft-spoken female voice with distinct articulation, perfect for elderly listeners."
+
+# Compress the weights of the text encoder and both decoder stages in model_dir with NNCF.
+# The compressed IR is written to model_dir/<precision> and that directory is returned.
+def compress_models(model_dir=OV_MODEL_DIR, precision="int8"):
+    import nncf  # Only needed to produce compressed IR, not to run it
+
+    modes = {
+        "int8": dict(mode=nncf.CompressWeightsMode.INT8_ASYM),
+        "int4": dict(mode=nncf.CompressWeightsMode.INT4_SYM, group_size=128, ratio=0.8),
+    }
+    if precision not in modes:
+        raise ValueError(f"Unsupported precision: {precision}")
+
+    model_dir = Path(model_dir)
+    output_dir = model_dir / precision
+    core = ov.Core()
+    for ir_name in IR_NAMES:
+        output_path = output_dir / ir_name
+        if output_path.exists():
+            continue
+        output_dir.mkdir(parents=True, exist_ok=True)
+        compressed_model = nncf.compress_weights(core.read_model(model_dir / ir_name), **modes[precision])
+        ov.save_model(compressed_model, output_path)
+    return output_dir
+
+# Log-magnitude spectrogram used to compare generated audio
+def log_spectrogram(audio_arr, frame_size=1024, hop=256):
+    if len(audio_arr) < frame_size:
+        audio_arr = np.pad(audio_arr, (0, frame_size - len(audio_arr)))
+    frame_count = 1 + (len(audio_arr) - frame_size) // hop
+    frames = np.lib.stride_tricks.sliding_window_view(audio_arr, frame_size)[::hop][:frame_count]
+    return np.log1p(np.abs(np.fft.rfft(frames * np.hanning(frame_size), axis=1)))
+
+# Objective similarity between two renderings of the same prompt: cosine similarity of the
+# log spectrograms over their common length (1.0 is identical), and the length ratio
+def audio_similarity(reference, candidate):
+    reference_spec = log_spectrogram(reference)
+    candidate_spec = log_spectrogram(candidate)
+    frames = min(len(reference_spec), len(candidate_spec))
+    a = reference_spec[:frames].ravel()
+    b = candidate_spec[:frames].ravel()
+    denominator = np.linalg.norm(a) * np.linalg.norm(b)
+    cosine = float(a @ b / denominator) if denominator > 0 else 0.0
+    return {"spectral_cosine": round(cosine, 4), "length_ratio": round(len(candidate) / max(len(reference), 1), 4)}
+
+# Generate the report prompts at one precision in this process and save audio and timings.
+# Run in a child process per precision so peak RSS is measured separately.
+def measure(precision, output_path, stateful=False):
+    import torch
+    from model_loader import load_parler
+    from ov_backend import load_openvino_model
+
+    model, tokenizer, _ = load_parler()
+    model = load_openvino_model(model, precision=precision, stateful=stateful)
+    decoder = model.decoder.model.decoder
+
+    input_ids = tokenizer(REPORT_DESCRIPTION, return_tensors="pt").input_ids
+    audios = {}
+    step_latencies = []
+    generate_seconds = 0.0
+    for i, prompt in enumerate(REPORT_PROMPTS):
+        prompt_input_ids = tokenizer(prompt, return_tensors="pt").input_ids
+        decoder.step_latencies = []
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        generation = model.generate(input_ids=input_ids, prompt_input_ids=prompt_input_ids, do_sample=False)
+        generate_seconds += time.perf_counter() - start
+        step_latencies.extend(decoder.step_latencies)
+        audios[f"prompt_{i}"] = generation.cpu().numpy().squeeze()
+
+    np.savez(output_path, **audios)
+    latencies_ms = np.array(step_latencies) * 1000
+    return {
+        "precision": precision,
+        "stateful": stateful,
+        "decode_steps": len(step_latencies),
+        "token_latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 3),
+        "token_latency_ms_p90": round(float(np.percentile(latencies_ms, 90)), 3),
+        "generate_seconds": round(generate_seconds, 3),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+# Run measure() in a child process and return its result
+def measure_in_child(precision, audio_path, stateful=False):
+    command = [sys.executable, __file__, "--measure", precision, "--audio", audio_path]
+    if stateful:
+        command.append("--stateful")
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# Generate the report prompts with the stateless and the stateful decoder from the same seed and
+# check that both pick the same codes. The audio codec is deterministic, so the same codes give
+# bit-identical audio and any difference in the audio means the KV cache handling differs.
+def check_stateful(precision="fp32"):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio = {}
+        for stateful in (False, True):
+            audio_path = os.path.join(tmp_dir, f"{precision}_{stateful}.npz")
+            measure_in_child(precision, audio_path, stateful)
+            audio[stateful] = np.load(audio_path)
+        stateless, stateful = audio[False], audio[True]
+        mismatched = [key for key in stateless.files if not np.array_equal(stateless[key], stateful[key])]
+    return {"precision": precision, "stateful_matches": not mismatched, "mismatched_prompts": mismatched}
+
+# Measure every precision in its own process and compare the audio with the FP32 output
+def report(precisions=("fp32", "int8", "int4")):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for precision in precisions:
+            audio_path = os.path.join(tmp_dir, f"{precision}.npz")
+            results.append(measure_in_child(precision, audio_path))
+
+        reference = np.load(os.path.join(tmp_dir, f"{precisions[0]}.npz"))
+        for result in results:
+            candidate = np.load(os.path.join(tmp_dir, f"{result['precision']}.npz"))
+            similarities = [audio_similarity(reference[key], candidate[key]) for key in reference.files]
+            result["spectral_cosine_vs_fp32"] = round(float(np.mean([s["spectral_cosine"] for s in similarities])), 4)
+            result["length_ratio_vs_fp32"] = round(float(np.mean([s["length_ratio"] for s in similarities])), 4)
+    results[0]["stateful_matches_stateless"] = check_stateful(precisions[0])["stateful_matches"]
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress Parler-TTS OpenVINO IR and compare precisions.")
+    parser.add_argument("--precision", choices=("int8", "int4"), help="write compressed IR for this precision")
+    parser.add_argument("--report", metavar="JSON", help="write a latency/memory/quality report to this file")
+    parser.add_argument("--check-stateful", action="store_true", help="check that the stateful decoder generates the same audio")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--stateful", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--audio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.audio, args.stateful)))
+    elif args.check_stateful:
+        result = check_stateful()
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if result["stateful_matches"] else 1)
+    elif args.precision:
+        print(compress_models(OV_MODEL_DIR, args.precision))
+    elif args.report:
+        results = report()
+        Path(args.report).write_text(json.dumps(results, indent=2))
+        print(json.dumps(results, indent=2))
+    else:
+        parser.print_help()
@@ -0,0 +1,175 @@
+import os
+import numpy as np
+from text_segments import end_sentence, pack_segments, split_sentences
+
+# Parler-TTS generation shared by the Streamlit app (localhost.py) and the replica worker
+# processes (replica_pool.py)
+
+# Improved voice descriptions for clarity, slower speed, and easier listening for the elderly
+VOICE_DESCRIPTIONS = {
+    "Female Voice": "A clear, slow, and soft-spoken female voice with distinct articulation, perfect for elderly listeners.",
+    "Male Voice": "A slow, calm, and soothing male voice, speaking clearly and at a measured pace, ideal for elderly listeners.",
+}
+DEFAULT_VOICE = "Male Voice"
+
+# Prompt tokens per segment: sentences are packed up to about this many tokens per generate call
+PARLER_SEGMENT_TOKENS = int(os.environ.get("PARLER_SEGMENT_TOKENS", "32"))
+# The slow voices speak about this many prompt tokens per second
+SPEECH_TOKENS_PER_SECOND = 3
+# Upper bound on decoder steps per prompt token. The audio codec runs at about 86 frames per
+# second, so this leaves ample headroom over SPEECH_TOKENS_PER_SECOND.
+FRAMES_PER_TOKEN = 40
+MIN_GENERATION_LENGTH = 100
+# The model's own generation limit (about 30 seconds of audio)
+MAX_GENERATION_LENGTH = 2580
+
+# Split text at sentence boundaries and pack it into segments of about PARLER_SEGMENT_TOKENS
+# prompt tokens, so a text needs few, evenly sized generate calls
+def segment_text(text, tokenizer, target_tokens=PARLER_SEGMENT_TOKENS):
+    def count_tokens(segment):
+        return len(tokenizer(segment, add_special_tokens=False).input_ids)
+
+    sentences = [end_sentence(sentence) for sentence in split_sentences(text)]
+    return pack_segments(sentences, count_tokens, target_tokens)
+
+# Rough length in seconds of the speech for segments packed by segment_text, for sizing buffers
+def expected_audio_seconds(segments, target_tokens=PARLER_SEGMENT_TOKENS):
+    return len(segments) * target_tokens / SPEECH_TOKENS_PER_SECOND
+
+# Decoder steps to allow for a prompt of prompt_tokens tokens; generation stops at the EOS frame
+# well before this, so the limit only cuts off runaway decoding past the end of the speech
+def generation_length(prompt_tokens, num_codebooks=0):
+    length = prompt_tokens * FRAMES_PER_TOKEN + num_codebooks
+    return max(MIN_GENERATION_LENGTH, min(MAX_GENERATION_LENGTH, length))
+
+# The description states as the decoder sees them: projected to the decoder's width when the
+# two differ, with padding positions zeroed. generate does this itself only when it runs the
+# text encoder, so states passed in as encoder_outputs must already be in this form.
+def decoder_encoder_states(model, last_hidden_state, attention_mask):
+    if (
+        model.text_encoder.config.hidden_size != model.decoder.config.hidden_size
+        and model.decoder.config.cross_attention_hidden_size is None
+    ):
+        last_hidden_state = model.enc_to_dec_proj(last_hidden_state)
+    return last_hidden_state * attention_mask[..., None]
+
+# Logits processor that samples each batch item from its own random generator, so an item's audio
+# depends only on its inputs and seed, not on the other items in the batch. Use it with
+# do_sample=False: it applies the temperature and top-k filter that sampling would and adds Gumbel
+# noise, so the greedy argmax is a draw from the filtered distribution (the Gumbel-max trick).
+class SeededSampler:
+    def __init__(self, seeds, temperature=1.0, top_k=None):
+        import torch
+
+        self.generators = [torch.Generator().manual_seed(int(seed)) for seed in seeds]
+        self.temperature = temperature
+        self.top_k = top_k
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        scores = scores / self.temperature
+        if self.top_k:
+            kth_best = torch.topk(scores, min(self.top_k, scores.shape[-1]), dim=-1).values[..., -1:]
+            scores = scores.masked_fill(scores < kth_best, float("-inf"))
+        # The decoder has one row of scores per codebook, item after item
+        rows = scores.shape[0] // len(self.generators)
+        uniform = torch.cat([torch.rand((rows, scores.shape[-1]), generator=generator) for generator in self.generators])
+        gumbel = -torch.log(-torch.log(uniform.clamp_min(torch.finfo(uniform.dtype).tiny)))
+        return scores + gumbel.to(scores.dtype)
+
+# Logits processors for a batch generated with per-item seeds; pass with do_sample=False
+def seeded_logits_processors(model, seeds):
+    from parler_tts.logits_processors import ParlerTTSLogitsProcessor
+    from transformers import LogitsProcessorList
+
+    config = model.generation_config
+    return LogitsProcessorList([
+        # generate only adds Parler's end-of-speech processor itself when no list is passed
+        ParlerTTSLogitsProcessor(config.eos_token_id, model.decoder.num_codebooks, len(seeds), "cpu"),
+        SeededSampler(seeds, config.temperature or 1.0, config.top_k),
+    ])
+
+# Tokenize each voice description and run the text encoder on it once, so every sentence
+# and every user reuses the same encoder states instead of recomputing them per generate call
+def build_voice_cache(model, tokenizer):
+    import torch
+
+    voice_cache = {}
+    with torch.no_grad():
+        for voice, description in VOICE_DESCRIPTIONS.items():
+            encoded = tokenizer(description, return_tensors="pt")
+            input_ids = encoded.input_ids.to("cpu")
+            attention_mask = encoded.attention_mask.to("cpu")
+            encoder_outputs = model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask)
+            voice_cache[voice] = {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "encoder_hidden_states": decoder_encoder_states(model, encoder_outputs.last_hidden_state, attention_mask),
+            }
+    return voice_cache
+
+# Generate sentences with and without the cached encoder states from the same seed and report
+# whether the audio matches; returns (matches, largest sample difference)
+def check_voice_cache(model, tokenizer, voice_cache, voice=DEFAULT_VOICE, sentences=("Hello, how are you today?",), seed=0):
+    from transformers import set_seed
+
+    set_seed(seed)
+    cached = generate_batch(model, tokenizer, list(sentences), voice_cache[voice])
+    set_seed(seed)
+    uncached = generate_batch(model, tokenizer, list(sentences), voice_cache[voice], use_cache=False)
+    difference = 0.0
+    for cached_arr, uncached_arr in zip(cached, uncached):
+        if cached_arr.shape != uncached_arr.shape:
+            return False, float("inf")
+        if len(cached_arr):
+            difference = max(difference, float(np.abs(cached_arr - uncached_arr).max()))
+    return difference <= 1e-4, difference
+
+# Generate a batch of sentences in one model.generate call and return one trimmed array per sentence.
+# use_cache=False runs the text encoder inside generate instead (see check_voice_cache).
+def generate_batch(model, tokenizer, sentences, voice, use_cache=True):
+    from transformers.modeling_outputs import BaseModelOutput
+
+    batch_size = len(sentences)
+
+    # Pad the prompts to a common length; the attention mask tells the decoder which tokens are real
+    prompts = tokenizer(sentences, return_tensors="pt", padding=True)
+    # Size the decoding limit from the longest prompt in the batch instead of a fixed length
+    max_length = generation_length(
+        int(prompts.attention_mask.sum(dim=1).max()),
+        getattr(model.decoder.config, "num_codebooks", 0),
+    )
+
+    # Passing encoder_outputs makes generate skip the text encoder for the description
+    encoder_kwargs = {}
+    if use_cache:
+        encoder_kwargs["encoder_outputs"] = BaseModelOutput(last_hidden_state=voice["encoder_hidden_states"].repeat(batch_size, 1, 1))
+
+    # Generate the speech audio using greedy decoding (no beam search)
+    generation = model.generate(
+        input_ids=voice["input_ids"].repeat(batch_size, 1),
+        attention_mask=voice["attention_mask"].repeat(batch_size, 1),
+        **encoder_kwargs,
+        prompt_input_ids=prompts.input_ids.to("cpu"),
+        prompt_attention_mask=prompts.attention_mask.to("cpu"),
+        num_beams=1,                   # Set to 1 for greedy decoding
+        num_beam_groups=1,             # Also set this to 1 for compatibility
+        max_length=max_length,         # Long enough for the longest prompt in the batch
+        no_repeat_ngram_size=3,         # Avoid repetition
+        early_stopping=True,            # Stop early if necessary
+        return_dict_in_generate=True    # Also return the real length of each audio in the batch
+    )
+    audio_batch = generation.sequences.cpu().numpy().reshape(batch_size, -1)
+    audio_lengths = getattr(generation, "audios_length", None)
+
+    audio_arrs = []
+    for i, audio_arr in enumerate(audio_batch):
+        # Trim the padding added to the shorter sentences of the batch
+        if audio_lengths is not None:
+            audio_arr = audio_arr[:int(audio_lengths[i])]
+        else:
+            non_zero = np.flatnonzero(audio_arr)
+            audio_arr = audio_arr[:non_zero[-1] + 1] if len(non_zero) else audio_arr[:0]
+        audio_arrs.append(audio_arr)
+    return audio_arrs
@@ -0,0 +1,119 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import pdfplumber
+from ocr import OCR_WORKERS, recognize_pdf_page
+
+# Pages handed to a worker process at a time in parallel mode
+PDF_PAGES_PER_TASK = 4
+
+# Documents with fewer pages than this are extracted in-process; starting workers costs more
+PDF_PARALLEL_MIN_PAGES = 8
+
+# Page indexes (0-based) to extract, in order; pages=None means every page
+def _page_numbers(page_count, pages):
+    if pages is None:
+        return list(range(page_count))
+    return [page_number for page_number in pages if 0 <= page_number < page_count]
+
+# Text of a page; scanned pages have no text layer and are read with OCR (empty when it is not installed)
+def _page_text(page, ocr_workers):
+    text = page.extract_text() or ""
+    if not text.strip():
+        text = recognize_pdf_page(page, workers=ocr_workers)
+    return text
+
+# Yield (page_number, text) for each requested page as soon as it is extracted.
+def iter_pdf_pages(pdf_file, pages=None):
+    with pdfplumber.open(pdf_file) as pdf:
+        for page_number in _page_numbers(len(pdf.pages), pages):
+            page = pdf.pages[page_number]
+            yield page_number, _page_text(page, OCR_WORKERS)
+            # Drop the parsed page objects so memory does not grow with the document
+            page.flush_cache()
+
+# Worker processes shared by every parallel extraction in this process
+PDF_MAX_WORKERS = os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# The pool is started on first use with the spawn context: forking a threaded server process
+# (aiohttp, Streamlit) can copy locks held by other threads into the children
+def _shared_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+# The document a worker process has open, reused by its following tasks for the same file
+_worker_pdf = None
+_worker_pdf_path = None
+
+def _extract_pages(pdf_path, page_numbers):
+    global _worker_pdf, _worker_pdf_path
+    if _worker_pdf_path != pdf_path:
+        if _worker_pdf is not None:
+            _worker_pdf.close()
+        _worker_pdf = pdfplumber.open(pdf_path)
+        _worker_pdf_path = pdf_path
+    results = []
+    for page_number in page_numbers:
+        page = _worker_pdf.pages[page_number]
+        # Pages already run in parallel across processes, so each OCRs its tiles one at a time
+        results.append((page_number, _page_text(page, 1)))
+        page.flush_cache()
+    return results
+
+# Same as iter_pdf_pages, but pages are extracted on the shared pool of worker processes, which
+# read the document from a temporary file. A document uses at most one worker per
+# PDF_PAGES_PER_TASK pages. Results are still yielded in page order, each batch as soon as it
+# and those before it are done.
+def iter_pdf_pages_parallel(pdf_file, pages=None):
+    pdf_bytes = pdf_file if isinstance(pdf_file, bytes) else pdf_file.read()
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page_numbers = _page_numbers(len(pdf.pages), pages)
+
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    futures = []
+    try:
+        pool = _shared_pool()
+        futures = [
+            pool.submit(_extract_pages, pdf_path, page_numbers[start:start + PDF_PAGES_PER_TASK])
+            for start in range(0, len(page_numbers), PDF_PAGES_PER_TASK)
+        ]
+        for future in futures:
+            yield from future.result()
+    except BrokenProcessPool:
+        _reset_pool()  # A worker died; the next extraction starts a fresh pool
+        raise
+    finally:
+        # Stop the remaining work if the consumer stops early
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        os.remove(pdf_path)
+
+# Yield page texts for any document, using worker processes only when the document is long enough
+def iter_pdf_text(pdf_file, pages=None):
+    pdf_bytes = pdf_file if isinstance(pdf_file, bytes) else pdf_file.read()
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page_count = len(_page_numbers(len(pdf.pages), pages))
+    if page_count >= PDF_PARALLEL_MIN_PAGES and PDF_MAX_WORKERS > 1:
+        page_iter = iter_pdf_pages_parallel(pdf_bytes, pages)
+    else:
+        page_iter = iter_pdf_pages(io.BytesIO(pdf_bytes), pages)
+    for _, text in page_iter:
+        yield text
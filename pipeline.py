@@ -0,0 +1,112 @@
+import io
+from audio_cache import audio_cache_key, open_audio_cache
+from translation import SegmentTranslator
+from gtts_pool import synthesize_parallel
+from pdf_extract import iter_pdf_text
+from metrics import span
+from ocr import recognize_image
+from text_segments import split_sentences
+from url_fetch import FetchError, fetch_article_text
+
+# The extract -> translate -> synthesize pipeline, free of any UI code. It is served by
+# tts_service.py; the Streamlit app is a client of that service.
+
+# Longest article accepted from a URL
+MAX_URL_CHARS = 5000
+# Sentences are translated and synthesized in blocks of about this many characters, so the
+# first audio of a long text is ready after one block instead of after the whole text
+CONVERT_BLOCK_CHARS = 600
+
+# Shared on-disk audio cache so repeated texts skip the gTTS network call entirely
+audio_cache = open_audio_cache()
+
+# Sentence-level translation memo; only sentences not translated before go over the network
+segment_translator = SegmentTranslator()
+
+# Function to convert text to speech using gTTS
+def generate_audio_gtts(translated_text, selected_language, speech_speed):
+    def synthesize():
+        # Fetch the gTTS chunks in parallel over pooled keep-alive connections
+        return synthesize_parallel(translated_text, selected_language, speech_speed)
+
+    with span("generate_audio_gtts", chars=len(translated_text), language=selected_language) as timing:
+        key = audio_cache_key(translated_text, selected_language, speech_speed, None, "gtts")
+        audio_bytes = audio_cache.get(key)
+        timing.set(cache_hit=audio_bytes is not None)
+        if audio_bytes is None:
+            audio_bytes = synthesize()
+            audio_cache.put(key, audio_bytes)
+        timing.set(output_bytes=len(audio_bytes))
+
+    audio_buffer = io.BytesIO(audio_bytes)
+    audio_buffer.seek(0)  # Reset buffer pointer for playback
+
+    return audio_buffer
+
+# Function to translate text using deep-translator
+def translate_text(input_text, target_language):
+    with span("translate_text", chars=len(input_text), language=target_language) as timing:
+        translated_text = segment_translator.translate(input_text, target_language)
+        timing.set(output_chars=len(translated_text))
+    return translated_text
+
+# Function to extract text from a PDF file using pdfplumber, page by page
+# (long documents are split across worker processes, and scanned pages are read with OCR)
+def extract_text_from_pdf(pdf_file, on_page=None):
+    page_texts = []
+    page_count = 0
+    with span("extract_text_from_pdf") as timing:
+        for page_text in iter_pdf_text(pdf_file):
+            page_count += 1
+            if page_text:
+                page_texts.append(page_text)
+                if on_page is not None:
+                    on_page(page_text)  # Let the caller show or process each page as it arrives
+        # pages counts every page read, text_pages only those with text (blank pages are skipped)
+        timing.set(pages=page_count, text_pages=len(page_texts), output_chars=sum(len(page_text) for page_text in page_texts))
+    return "\n".join(page_texts)
+
+# Function to extract text from an image file using Tesseract OCR; raises OCRError when OCR is not installed
+def extract_text_from_image(image_file):
+    with span("extract_text_from_image") as timing:
+        text = recognize_image(image_file)
+        timing.set(output_chars=len(text))
+    return text
+
+# Fetch the article text at url; raises FetchError when it cannot be used. max_chars=None
+# accepts articles of any length (long-document mode converts them section by section).
+def fetch_text_from_url(url, max_chars=MAX_URL_CHARS):
+    with span("fetch_text_from_url") as timing:
+        try:
+            text = fetch_article_text(url)
+        except FetchError:
+            raise
+        except Exception as e:
+            raise FetchError(f"Error fetching text from URL: {e}") from e
+        timing.set(output_chars=len(text))
+    if max_chars is not None and len(text) > max_chars:
+        raise FetchError(f"The content fetched from the URL exceeds {max_chars} characters. Please provide a shorter article.")
+    return text
+
+# Group sentences into blocks of about block_chars characters
+def iter_text_blocks(text, block_chars=CONVERT_BLOCK_CHARS):
+    block = []
+    block_length = 0
+    for sentence in split_sentences(text):
+        if block and block_length + len(sentence) > block_chars:
+            yield " ".join(block)
+            block = []
+            block_length = 0
+        block.append(sentence)
+        block_length += len(sentence) + 1
+    if block:
+        yield " ".join(block)
+
+# Translate and synthesize text block by block. Yields ("text", translated block) and then
+# ("audio", MP3 bytes) for each block; the MP3 blocks play back to back when concatenated.
+def iter_conversion(input_text, target_language_code, slow):
+    with span("convert", chars=len(input_text), language=target_language_code):
+        for block in iter_text_blocks(input_text):
+            translated_block = translate_text(block, target_language_code)
+            yield "text", translated_block
+            yield "audio", generate_audio_gtts(translated_block, target_language_code, slow).getvalue()
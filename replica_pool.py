@@ -0,0 +1,145 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from model_loader import TTS_MODEL_PATH, load_parler, mark_ready, start_model
+from parler_generation import DEFAULT_VOICE, build_voice_cache, generate_batch
+
+# Runs N Parler-TTS model replicas in worker processes, each pinned to its own share of the CPU
+# cores with a matching torch thread count, and shards sentence batches across them.
+# Every replica holds a full copy of the model, so N is bounded by memory as well as by cores.
+#
+#   python replica_pool.py --replicas 1,2,4,8     # throughput vs replica count on this node
+
+# Number of replicas localhost.py starts; 0 runs the model in the Streamlit process instead
+TTS_REPLICAS = int(os.environ.get("TTS_REPLICAS", "0"))
+
+BENCHMARK_SENTENCE = "Your appointment at the community health centre is on Tuesday at ten o'clock."
+
+# State of the replica in this worker process
+_model = None
+_tokenizer = None
+_voice_cache = None
+_startup = None
+_startup_barrier = None
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+# Split the available cores into one contiguous group per replica
+def plan_cores(replicas, cpus=None):
+    cpus = cpus or available_cpus()
+    per_replica = max(1, len(cpus) // replicas)
+    return [cpus[(i * per_replica) % len(cpus):][:per_replica] for i in range(replicas)]
+
+# Write the OpenVINO IR once in this process, so the replicas only load it instead of each
+# exporting (and compressing) the same files at the same time
+def prepare_backend(model_path, backend):
+    if backend != "openvino":
+        return
+    from ov_backend import ir_prepared, prepare_ir
+
+    if not ir_prepared():
+        model, _, _ = load_parler(model_path)
+        prepare_ir(model)
+
+def _init_replica(core_queue, startup_barrier, model_path, backend):
+    global _model, _tokenizer, _voice_cache, _startup, _startup_barrier
+    import torch
+
+    _startup_barrier = startup_barrier
+
+    cores = core_queue.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(1)
+
+    # The pool writes the ready file once every replica is up
+    _model, _tokenizer, timings = start_model(model_path, backend, ready_file=None)
+    _voice_cache = build_voice_cache(_model, _tokenizer)
+    _startup = {"pid": os.getpid(), "cores": cores, **timings}
+
+# Startup task: each one waits at the barrier until all replicas run one, so no worker can take
+# two of them and every worker has loaded its model when they return
+def _replica_info(_):
+    _startup_barrier.wait()
+    return _model.config.sampling_rate, _startup
+
+def _generate_task(sentences, voice_name):
+    voice = _voice_cache.get(voice_name, _voice_cache[DEFAULT_VOICE])
+    return generate_batch(_model, _tokenizer, sentences, voice)
+
+class ReplicaPool:
+    def __init__(self, replicas, model_path=TTS_MODEL_PATH, backend="torch"):
+        start = time.perf_counter()
+        prepare_backend(model_path, backend)
+
+        # Spawn fresh interpreters; forking a process that already initialized torch threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        core_queue = context.Queue()
+        for cores in plan_cores(replicas):
+            core_queue.put(cores)
+        self.replicas = replicas
+        self._executor = ProcessPoolExecutor(
+            max_workers=replicas, mp_context=context,
+            initializer=_init_replica, initargs=(core_queue, context.Barrier(replicas), model_path, backend),
+        )
+
+        # Start every replica now and wait until each has loaded and warmed up its model
+        infos = list(self._executor.map(_replica_info, range(replicas)))
+        self.sampling_rate = infos[0][0]
+        self.startup_timings = {str(startup["pid"]): startup for _, startup in infos}
+        mark_ready({"replicas": replicas, "startup_seconds": time.perf_counter() - start})
+
+    # Generate sentences batch_size at a time across the replicas; yields each batch's list of
+    # audio arrays in sentence order
+    def iter_generate(self, sentences, voice_name, batch_size=1):
+        batches = [sentences[start:start + batch_size] for start in range(0, len(sentences), batch_size)]
+        return self._executor.map(_generate_task, batches, [voice_name] * len(batches))
+
+    def generate(self, sentences, voice_name, batch_size=1):
+        return [audio_arr for batch in self.iter_generate(sentences, voice_name, batch_size) for audio_arr in batch]
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+# Measure sentence throughput for each replica count on this machine
+def benchmark(replica_counts, sentence_count=32, batch_size=1, backend="torch"):
+    sentences = [BENCHMARK_SENTENCE] * sentence_count
+    results = []
+    for replicas in replica_counts:
+        start = time.perf_counter()
+        pool = ReplicaPool(replicas, backend=backend)
+        startup_seconds = time.perf_counter() - start
+        try:
+            start = time.perf_counter()
+            audio_arrs = pool.generate(sentences, DEFAULT_VOICE, batch_size)
+            seconds = time.perf_counter() - start
+        finally:
+            pool.close()
+        audio_seconds = sum(len(audio_arr) for audio_arr in audio_arrs) / pool.sampling_rate
+        results.append({
+            "replicas": replicas,
+            "threads_per_replica": len(plan_cores(replicas)[0]),
+            "startup_seconds": round(startup_seconds, 2),
+            "seconds": round(seconds, 2),
+            "sentences_per_second": round(sentence_count / seconds, 3),
+            "audio_seconds_per_second": round(audio_seconds / seconds, 3),
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Parler-TTS throughput against the number of model replicas.")
+    parser.add_argument("--replicas", default="1,2,4", help="comma-separated replica counts to try")
+    parser.add_argument("--sentences", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--backend", choices=("torch", "openvino"), default="torch")
+    args = parser.parse_args()
+
+    replica_counts = [int(count) for count in args.replicas.split(",")]
+    print(json.dumps(benchmark(replica_counts, args.sentences, args.batch_size, args.backend), indent=2))
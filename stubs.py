@@ -0,0 +1,151 @@
+import base64
+import io
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the network services the pipeline talks to, so benchmarks and tests
+# run repeatably on a machine with no network access
+
+# Fake MP3 bytes returned per character of text, roughly what gTTS produces for normal speech
+STUB_MP3_BYTES_PER_CHAR = 120
+
+# Build a fake MP3 payload whose size grows with the text, starting with an MPEG frame header
+def fake_mp3(text):
+    return b"\xff\xf3\x44\xc4" + b"\x00" * (len(text) * STUB_MP3_BYTES_PER_CHAR)
+
+# Plays Google's batchexecute TTS endpoint: reads the RPC payload and answers with base64 audio
+class GTTSStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+    delay = 0.05  # Seconds of simulated network and server latency per request
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        rpc = json.loads(urllib.parse.parse_qs(body)["f.req"][0])
+        text = json.loads(rpc[0][0][1])[0]
+        time.sleep(self.delay)
+
+        audio = base64.b64encode(fake_mp3(text)).decode("ascii")
+        payload = json.dumps([["wrb.fr", "jQ1olc", json.dumps([audio]), None, None, None, "generic"]], separators=(",", ":"))
+        response = f")]}}'\n\n{len(payload)}\n{payload}\n".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+# Start a stub server on a free local port in a background thread; returns (server, base_url)
+def start_stub_server(handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# Serves a news-style HTML page with navigation, scripts and a long article body
+class HTMLStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    paragraphs = 40
+
+    def do_GET(self):
+        paragraph = "<p>The city council announced new bus routes for the old town starting next month. Residents can ask for a free travel card at the community centre.</p>"
+        page = (
+            "<html><head><title>Local news</title><script>var tracking = {};</script>"
+            "<style>body { font-family: sans-serif; }</style></head><body>"
+            "<nav><a href='/'>Home</a> <a href='/news'>News</a> <a href='/sport'>Sport</a></nav>"
+            f"<article><h1>New bus routes</h1>{paragraph * self.paragraphs}</article>"
+            "<footer>Copyright Local News</footer></body></html>"
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+# Local stand-in for deep_translator's GoogleTranslator: returns the text unchanged after a delay
+class StubTranslator:
+    def __init__(self, target="en", delay=0.05):
+        self.target = target
+        self.delay = delay
+
+    def translate(self, text):
+        time.sleep(self.delay)
+        return text
+
+    def translate_batch(self, texts):
+        return [self.translate(text) for text in texts]
+
+# Build a minimal PDF with one page per string in page_texts (an empty string gives a page
+# with no text layer, like a scanned page)
+def make_text_pdf(page_texts):
+    page_count = len(page_texts)
+    font_id = 3 + 2 * page_count
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(page_count))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>",
+    ]
+    for i, text in enumerate(page_texts):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        lines = [text[start:start + 90] for start in range(0, len(text), 90)]
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = "BT /F1 10 Tf 12 TL 40 750 Td " + " ".join(f"({line}) '" for line in lines) + " ET" if text else ""
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(pdf))
+        pdf += f"{i + 1} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref_offset = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    pdf += b"".join(f"{offset:010d} 00000 n \n".encode("latin-1") for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    return pdf
+
+# Build a JPEG that looks like a phone photo of a printed page: the text set in one or more
+# columns, under uneven lighting and with sensor noise
+def make_text_photo(text, columns=1, size=(3024, 4032), font_size=56, seed=0):
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = size
+    page = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=font_size)
+    margin = width // 12
+    gutter = width // 20
+    column_width = (width - 2 * margin - gutter * (columns - 1)) // columns
+    chars_per_line = max(10, int(column_width / (font_size * 0.55)))
+    line_height = int(font_size * 1.4)
+    lines = []
+    words = text.split()
+    while words:
+        line = words.pop(0)
+        while words and len(line) + 1 + len(words[0]) <= chars_per_line:
+            line += " " + words.pop(0)
+        lines.append(line)
+    lines_per_column = (height - 2 * margin) // line_height
+    for i, line in enumerate(lines[:lines_per_column * columns]):
+        column, row = divmod(i, lines_per_column)
+        draw.text((margin + column * (column_width + gutter), margin + row * line_height), line, fill=30, font=font)
+
+    rng = np.random.default_rng(seed)
+    lighting = np.linspace(0.65, 1.0, width)[None, :] * np.linspace(0.8, 1.0, height)[:, None]
+    pixels = np.asarray(page, dtype=np.float32) * lighting + rng.normal(0, 8, (height, width))
+    photo = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert("RGB")
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from audio_assembly import CROSSFADE_MS, KEEP_SILENCE_MS, PEAK_LIMIT, TARGET_LOUDNESS_DB, AudioAssembler, assemble_audio
+
+SAMPLERATE = 16000
+CROSSFADE = SAMPLERATE * CROSSFADE_MS // 1000
+KEEP = SAMPLERATE * KEEP_SILENCE_MS // 1000
+
+def tone(seconds, amplitude, frequency=220.0, phase=0.0):
+    t = np.arange(int(seconds * SAMPLERATE)) / SAMPLERATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t + phase)).astype(np.float32)
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLERATE), dtype=np.float32)
+
+def loudness_db(audio_arr):
+    return 20 * np.log10(np.sqrt(np.mean(np.square(audio_arr, dtype=np.float64))))
+
+def test_silence_around_the_speech_is_trimmed_to_the_pause():
+    segment = np.concatenate([silence(0.5), tone(1.0, 0.3), silence(0.7)])
+    trimmed = AudioAssembler(SAMPLERATE).append(segment)
+    assert len(trimmed) == SAMPLERATE + 2 * KEEP
+    assert not trimmed[:KEEP].any() and not trimmed[-KEEP:].any()
+
+@pytest.mark.parametrize("amplitude", [0.01, 0.2, 0.9])
+def test_segments_are_levelled_to_the_target_loudness(amplitude):
+    levelled = AudioAssembler(SAMPLERATE).append(tone(1.0, amplitude))
+    assert loudness_db(levelled) == pytest.approx(TARGET_LOUDNESS_DB, abs=0.1)
+
+def test_loud_and_quiet_segments_end_up_at_the_same_level():
+    assembler = AudioAssembler(SAMPLERATE)
+    quiet = assembler.append(tone(1.0, 0.02))
+    loud = assembler.append(tone(1.0, 0.8, frequency=330.0))
+    assert loudness_db(quiet) == pytest.approx(loudness_db(loud), abs=0.1)
+
+def test_gain_never_pushes_a_peak_past_the_limit():
+    segment = tone(1.0, 0.01)
+    segment[8000] = 0.5  # A click in otherwise quiet speech
+    assert np.abs(AudioAssembler(SAMPLERATE).append(segment)).max() <= PEAK_LIMIT + 1e-6
+
+def test_segments_overlap_by_the_crossfade():
+    segments = [tone(0.5, 0.3), tone(0.4, 0.3), tone(0.3, 0.3)]
+    audio = assemble_audio(segments, SAMPLERATE)
+    assert len(audio) == sum(len(segment) for segment in segments) - 2 * CROSSFADE
+
+def test_joins_are_continuous():
+    # The second tone starts at its peak where the first ends near zero, so butting them together would jump
+    first, second = tone(0.5, 0.3), tone(0.5, 0.3, phase=np.pi / 2)
+    assembler = AudioAssembler(SAMPLERATE)
+    first = assembler.append(first).copy()
+    second = assembler.append(second).copy()
+    audio = assembler.finish()
+
+    largest_step = np.abs(np.diff(first)).max()
+    assert np.abs(first[-1] - second[0]) > 5 * largest_step
+    join = slice(len(first) - CROSSFADE - 1, len(first) + 1)
+    assert np.abs(np.diff(audio[join])).max() <= 2 * largest_step
+    # Outside the crossfade both segments are copied unchanged
+    assert np.array_equal(audio[:len(first) - CROSSFADE], first[:-CROSSFADE])
+    assert np.array_equal(audio[len(first):], second[CROSSFADE:])
+
+def test_a_single_segment_is_returned_as_appended():
+    assembler = AudioAssembler(SAMPLERATE)
+    appended = assembler.append(np.concatenate([silence(0.3), tone(0.5, 0.4), silence(0.3)]))
+    assert np.array_equal(assembler.finish(), appended)
+
+def test_empty_and_silent_input_gives_no_audio():
+    assert len(assemble_audio([], SAMPLERATE)) == 0
+    assert len(assemble_audio([silence(1.0), np.zeros(0, dtype=np.float32)], SAMPLERATE)) == 0
+
+def test_silent_segments_are_skipped_between_speech():
+    segments = [tone(0.5, 0.3), silence(1.0), tone(0.5, 0.3)]
+    assert len(assemble_audio(segments, SAMPLERATE)) == SAMPLERATE - CROSSFADE
+
+def test_buffer_grows_past_the_capacity_hint():
+    segments = [tone(0.5, 0.3)] * 10
+    audio = assemble_audio(segments, SAMPLERATE, capacity=SAMPLERATE)
+    assert len(audio) == 10 * len(segments[0]) - 9 * CROSSFADE
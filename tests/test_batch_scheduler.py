@@ -0,0 +1,60 @@
+import threading
+import time
+from batch_scheduler import BatchScheduler
+
+# batch_fn stand-in that records the items of every call
+class RecordingBatchFn:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompts, descriptions, seeds):
+        self.calls.append(list(zip(prompts, descriptions, seeds)))
+        return [(16000, f"{prompt}/{seed}") for prompt, seed in zip(prompts, seeds)]
+
+def test_concurrent_requests_share_one_batch():
+    batch_fn = RecordingBatchFn()
+    # The first request waits up to batch_wait for a second one to fill the batch
+    scheduler = BatchScheduler(batch_fn, max_batch_size=2, batch_wait=5.0)
+    results = {}
+
+    def request(name, seed):
+        results[name] = scheduler.submit(f"{name} speaks.", "A calm voice.", seed).result(timeout=10)
+
+    threads = [threading.Thread(target=request, args=(name, seed)) for name, seed in (("Ann", 1), ("Bob", 2))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(batch_fn.calls) == 1
+    assert sorted(batch_fn.calls[0]) == [("Ann speaks.", "A calm voice.", 1), ("Bob speaks.", "A calm voice.", 2)]
+    assert results == {"Ann": (16000, "Ann speaks./1"), "Bob": (16000, "Bob speaks./2")}
+
+def test_full_batch_runs_without_waiting():
+    batch_fn = RecordingBatchFn()
+    scheduler = BatchScheduler(batch_fn, max_batch_size=2, batch_wait=5.0)
+    start = time.monotonic()
+    futures = scheduler.submit_many(["One.", "Two."], "A calm voice.", 7)
+    assert [future.result(timeout=10) for future in futures] == [(16000, "One./7"), (16000, "Two./7")]
+    assert time.monotonic() - start < 1.0
+
+def test_no_wait_when_every_request_slot_is_taken():
+    batch_fn = RecordingBatchFn()
+    scheduler = BatchScheduler(batch_fn, max_batch_size=4, batch_wait=5.0, max_requests=1)
+    start = time.monotonic()
+    scheduler.submit("Alone.", "A calm voice.", 3).result(timeout=10)
+    # No other request can arrive while the only slot is in use, so the batch ran at once
+    assert time.monotonic() - start < 1.0
+
+def test_items_with_different_keys_are_not_batched():
+    batch_fn = RecordingBatchFn()
+    scheduler = BatchScheduler(batch_fn, max_batch_size=4, batch_wait=0.05, batch_key=lambda prompt, description, seed: len(prompt))
+    futures = scheduler.submit_many(["Hi.", "Hello.", "Yo."], "A calm voice.", 1)
+    assert [result for _, result in (future.result(timeout=10) for future in futures)] == ["Hi./1", "Hello./1", "Yo./1"]
+    assert sorted(len(call) for call in batch_fn.calls) == [1, 2]
+
+def test_short_results_fail_the_unanswered_items():
+    scheduler = BatchScheduler(lambda prompts, descriptions, seeds: [(16000, prompts[0])], max_batch_size=2, batch_wait=5.0)
+    first, second = scheduler.submit_many(["One.", "Two."], "A calm voice.", 1)
+    assert first.result(timeout=10) == (16000, "One.")
+    assert isinstance(second.exception(timeout=10), RuntimeError)
@@ -0,0 +1,57 @@
+import json
+import re
+import urllib.parse
+import pytest
+from gtts import gTTS
+from gtts_pool import fetch_chunk, make_session, synthesize_parallel
+from stubs import GTTSStubHandler, fake_mp3, start_stub_server
+
+TEXT = "The community centre opens at nine o'clock on weekdays. " * 6
+
+@pytest.fixture(scope="module")
+def stub_url():
+    GTTSStubHandler.delay = 0.01
+    server, url = start_stub_server(GTTSStubHandler)
+    yield url
+    server.shutdown()
+
+# The text of each chunk, read back out of the prepared request bodies the way the endpoint does
+def chunk_texts(prepared_requests):
+    texts = []
+    for prepared_request in prepared_requests:
+        body = prepared_request.body if isinstance(prepared_request.body, str) else prepared_request.body.decode("utf-8")
+        rpc = json.loads(urllib.parse.parse_qs(body)["f.req"][0])
+        texts.append(json.loads(rpc[0][0][1])[0])
+    return texts
+
+# gtts_pool depends on this private API; an upgrade that changes it should fail here first
+def test_prepare_requests_still_builds_batchexecute_posts():
+    prepared_requests = gTTS(text=TEXT, lang="en")._prepare_requests()
+    assert len(prepared_requests) > 1
+    assert all(prepared_request.method == "POST" for prepared_request in prepared_requests)
+    # gTTS drops the punctuation it splits at, but every word arrives, in order
+    assert re.findall(r"[\w']+", " ".join(chunk_texts(prepared_requests))) == re.findall(r"[\w']+", TEXT)
+
+def test_parallel_synthesis_joins_chunks_in_order(stub_url):
+    expected = b"".join(fake_mp3(text) for text in chunk_texts(gTTS(text=TEXT, lang="en")._prepare_requests()))
+    audio = synthesize_parallel(TEXT, "en", False, session=make_session(), endpoint=stub_url)
+    assert audio == expected
+
+# Answers like the endpoint does when it has no audio for the request
+class NoAudioHandler(GTTSStubHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        response = b")]}'\n\n2\n[]\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+def test_fetch_chunk_rejects_a_response_without_audio():
+    server, url = start_stub_server(NoAudioHandler)
+    try:
+        prepared_request = gTTS(text="Hello.", lang="en")._prepare_requests()[0]
+        with pytest.raises(ValueError):
+            fetch_chunk(make_session(), prepared_request, endpoint=url)
+    finally:
+        server.shutdown()
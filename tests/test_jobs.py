@@ -0,0 +1,167 @@
+import threading
+import time
+import pytest
+import jobs
+from jobs import JobQueue
+
+@pytest.fixture
+def queue():
+    job_queue = JobQueue(max_workers=2)
+    yield job_queue
+    job_queue.shutdown()
+
+def test_identical_submits_share_one_run(queue):
+    release = threading.Event()
+    calls = []
+
+    def convert(job, text):
+        calls.append(text)
+        release.wait(5)
+        return text.upper()
+
+    first = queue.submit("key", convert, "hello")
+    second = queue.submit("key", convert, "hello")
+    release.set()
+    queue.wait(first, timeout=5)
+
+    assert second is first
+    assert calls == ["hello"]
+    assert first.status == "done" and first.result == "HELLO"
+
+def test_a_finished_key_runs_again(queue):
+    calls = []
+    first = queue.wait(queue.submit("key", lambda job: calls.append(1)), timeout=5)
+    assert first.finished
+    second = queue.wait(queue.submit("key", lambda job: calls.append(2)), timeout=5)
+    assert second is not first
+    assert calls == [1, 2]
+
+def test_no_more_than_max_workers_run_at_once(queue):
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+    release = threading.Event()
+
+    def convert(job):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+
+    submitted = [queue.submit(f"key {i}", convert) for i in range(5)]
+    queue.wait(submitted[0], timeout=0.2)
+    assert sum(job.status == "queued" for job in submitted) == 3
+    release.set()
+    for job in submitted:
+        queue.wait(job, timeout=5)
+    assert peak[0] == 2
+    assert all(job.status == "done" for job in submitted)
+
+def test_cancel_stops_the_job_at_its_next_update(queue):
+    started = threading.Event()
+    cancelled = threading.Event()
+    steps = []
+
+    def convert(job):
+        started.set()
+        cancelled.wait(5)
+        steps.append("before")
+        job.update(0.5, "Halfway")
+        steps.append("after")
+
+    job = queue.submit("key", convert)
+    started.wait(5)
+    job.cancel()
+    cancelled.set()
+    queue.wait(job, timeout=5)
+
+    assert job.status == "cancelled"
+    assert steps == ["before"]
+    # The key is free again, so the same request can be submitted anew
+    assert queue.submit("key", lambda job: None) is not job
+
+def test_update_reports_progress(queue):
+    def convert(job):
+        job.update(0.25, "A quarter")
+        return job.progress, job.message
+
+    job = queue.wait(queue.submit("key", convert), timeout=5)
+    assert job.result == (0.25, "A quarter")
+
+def test_failures_are_recorded(queue):
+    def convert(job):
+        raise ValueError("no audio")
+
+    job = queue.wait(queue.submit("key", convert), timeout=5)
+    assert job.status == "failed"
+    assert isinstance(job.error, ValueError)
+    assert job.message == "Failed: no audio"
+
+def test_history_keeps_only_the_newest_finished_jobs(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HISTORY", 3)
+    submitted = [queue.wait(queue.submit(f"key {i}", lambda job: None), timeout=5) for i in range(5)]
+    assert [queue.get(job.id) for job in submitted] == [None, None, *submitted[2:]]
+    assert queue.latest("key 4") is submitted[4]
+    assert queue.latest("key 0") is None
+
+# Speculative job body: waits like app.run_speculation, then records that it ran
+def held(seconds, ran):
+    def convert(job):
+        job.hold(seconds)
+        ran.append(job.id)
+        return "audio"
+    return convert
+
+def test_speculate_creates_one_job_and_joins_it_afterwards(queue):
+    ran = []
+    first, created = queue.speculate("key", held(5, ran))
+    second, joined_created = queue.speculate("key", held(5, ran))
+    assert created and not joined_created
+    assert second is first and first.speculative
+    queue.cancel_speculative(first)
+    queue.cancel_speculative(second)
+    queue.wait(first, timeout=5)
+    assert ran == []
+
+def test_a_real_submit_promotes_and_wakes_a_speculative_job(queue):
+    ran = []
+    speculative, _ = queue.speculate("key", held(30, ran))
+    start = time.monotonic()
+    job = queue.wait(queue.submit("key", held(30, ran)), timeout=5)
+    assert job is speculative
+    assert not job.speculative
+    assert job.status == "done" and ran == [job.id]
+    assert time.monotonic() - start < 5  # hold returned as soon as the real request joined
+
+def test_hold_waits_out_its_delay_when_nobody_joins(queue):
+    ran = []
+    start = time.monotonic()
+    job = queue.wait(queue.speculate("key", held(0.2, ran))[0], timeout=5)
+    assert job.status == "done"
+    assert time.monotonic() - start >= 0.2
+
+def test_speculative_job_is_cancelled_only_when_every_speculator_withdraws(queue):
+    ran = []
+    job, _ = queue.speculate("key", held(5, ran))
+    queue.speculate("key", held(5, ran))
+    queue.cancel_speculative(job)
+    assert not job.cancelled
+    queue.cancel_speculative(job)
+    assert queue.wait(job, timeout=5).status == "cancelled"
+    assert ran == []
+
+def test_cancel_speculative_leaves_a_promoted_job_alone(queue):
+    release = threading.Event()
+
+    def convert(job):
+        job.hold(5)
+        release.wait(5)
+        return "audio"
+
+    job, _ = queue.speculate("key", convert)
+    queue.submit("key", convert)
+    queue.cancel_speculative(job)
+    release.set()
+    assert queue.wait(job, timeout=5).status == "done"
@@ -0,0 +1,43 @@
+import pytest
+from language_id import detect_language
+
+@pytest.mark.parametrize("text, language", [
+    ("안녕하세요. 오늘 날씨가 좋네요.", "ko"),
+    ("東京都庁はどこですか。", "ja"),
+    ("这是我们的医院，请给我打电话。", "zh-CN"),
+    ("這是我們的醫院，請給我打電話。", "zh-TW"),
+    ("कृपया मुझे कल फ़ोन करें।", "hi"),
+])
+def test_scripts(text, language):
+    assert detect_language(text) == language
+
+@pytest.mark.parametrize("text", [
+    "東京都庁",  # Kanji-only Japanese
+    "東京駅",
+    "中山大道",  # No character that tells simplified from traditional
+])
+def test_han_without_telling_characters_is_undetected(text):
+    assert detect_language(text) is None
+
+@pytest.mark.parametrize("text, language", [
+    ("Please call me if you have any questions.", "en"),
+    ("I am happy.", "en"),
+    ("Le rendez-vous est dans la salle du fond, avec votre médecin.", "fr"),
+    ("El médico está en la sala del fondo y no hay cita.", "es"),
+    ("Der Termin ist nicht in dem Raum, bitte warten Sie.", "de"),
+    ("Il medico non è nella sala della clinica e questo è tutto.", "it"),
+    ("¿Dónde está la farmacia? Mañana.", "es"),
+])
+def test_stopwords(text, language):
+    assert detect_language(text) == language
+
+@pytest.mark.parametrize("text", [
+    "",
+    "12:30 - 14:00",
+    "OK",
+    "la",  # Shared by French, Spanish and Italian
+    "Maria Rossi",
+    "Ruta 66, km 12",
+])
+def test_ambiguous_text_is_undetected(text):
+    assert detect_language(text) is None
@@ -0,0 +1,108 @@
+import io
+import os
+import tempfile
+import pytest
+
+# The pipeline's stores are configured when it is imported; keep them out of the checkout
+_state_dir = tempfile.mkdtemp(prefix="long-document-test-")
+os.environ.setdefault("TTS_AUDIO_CACHE_DIR", os.path.join(_state_dir, "audio"))
+os.environ.setdefault("TTS_TRANSLATION_MEMO", os.path.join(_state_dir, "translations.sqlite3"))
+
+import pipeline
+from long_document import convert_document, create_text_document, document_dir, iter_sections, load_manifest
+
+# About 900 characters, enough for a heading to start a new section
+def chapter_text(topic):
+    return f"The {topic} office answers letters within a week. " * 18
+
+SOURCE = "\n".join(f"CHAPTER {number}\n{chapter_text(topic)}" for number, topic in
+                   (("ONE", "housing"), ("TWO", "pension"), ("THREE", "health"), ("FOUR", "transport")))
+
+class Stop(Exception):
+    pass
+
+# Stands in for translation and gTTS, recording the text of every synthesized section
+@pytest.fixture
+def synthesized(monkeypatch):
+    texts = []
+
+    def generate_audio(text, language, slow):
+        texts.append(text)
+        return io.BytesIO(f"audio of {text[:40]}".encode("utf-8"))
+
+    monkeypatch.setattr(pipeline, "translate_text", lambda text, language: text)
+    monkeypatch.setattr(pipeline, "generate_audio_gtts", generate_audio)
+    return texts
+
+# on_progress that stops the job after the given number of sections
+def stop_after(sections):
+    calls = []
+
+    def on_progress(fraction, message):
+        calls.append(message)
+        if len(calls) == sections:
+            raise Stop(message)
+    return on_progress
+
+def test_headings_start_sections_and_are_spoken():
+    sections = list(iter_sections([SOURCE]))
+    assert [title for title, _ in sections] == ["CHAPTER ONE", "CHAPTER TWO", "CHAPTER THREE", "CHAPTER FOUR"]
+    assert all(text.startswith(f"{title}. The ") for title, text in sections)
+
+def test_numbered_and_short_headings():
+    text = f"1. Getting started\n{chapter_text('housing')}\n2.1 Who can apply\n{chapter_text('pension')}"
+    assert [title for title, _ in iter_sections(text.splitlines(keepends=True))] == ["1. Getting started", "2.1 Who can apply"]
+    # A heading right after another is read as part of the same section
+    _, text = next(iter_sections(["CHAPTER ONE\nPART A\n" + chapter_text("housing")]))
+    assert text.startswith("CHAPTER ONE. PART A. The housing")
+
+def test_long_text_without_headings_is_split_at_sentences():
+    sections = list(iter_sections([chapter_text("housing") * 6], max_chars=1000))
+    assert len(sections) > 1
+    assert all(title is None and len(text) <= 1000 and text.endswith(".") for title, text in sections)
+
+def test_sentences_continue_across_line_breaks():
+    [(_, text)] = iter_sections(["The office is\n", "open on Monday.\n"])
+    assert text == "The office is open on Monday."
+
+def test_stopped_conversion_resumes_after_the_last_finished_section(tmp_path, synthesized):
+    doc_id = create_text_document(SOURCE, "fr", False, documents_dir=str(tmp_path))
+    with pytest.raises(Stop):
+        convert_document(doc_id, stop_after(2), documents_dir=str(tmp_path))
+    assert [section["title"] for section in load_manifest(doc_id, str(tmp_path))["sections"]] == ["CHAPTER ONE", "CHAPTER TWO"]
+    assert len(synthesized) == 2
+
+    manifest = convert_document(doc_id, documents_dir=str(tmp_path))
+    assert manifest["finished"]
+    assert [section["title"] for section in manifest["sections"]] == ["CHAPTER ONE", "CHAPTER TWO", "CHAPTER THREE", "CHAPTER FOUR"]
+    # The second run only synthesized the sections the first one had not finished
+    assert [text.split(".")[0] for text in synthesized] == ["CHAPTER ONE", "CHAPTER TWO", "CHAPTER THREE", "CHAPTER FOUR"]
+
+def test_changed_source_redoes_the_sections_from_the_change(tmp_path, synthesized):
+    doc_id = create_text_document(SOURCE, "fr", False, documents_dir=str(tmp_path))
+    with pytest.raises(Stop):
+        convert_document(doc_id, stop_after(3), documents_dir=str(tmp_path))
+    first_files = {section["file"]: section["text_digest"] for section in load_manifest(doc_id, str(tmp_path))["sections"]}
+
+    # The second chapter is edited before the run resumes
+    source_path = os.path.join(document_dir(doc_id, str(tmp_path)), "source.txt")
+    with open(source_path, "w", encoding="utf-8") as f:
+        f.write(SOURCE.replace(chapter_text("pension"), chapter_text("benefits")))
+    synthesized.clear()
+    manifest = convert_document(doc_id, documents_dir=str(tmp_path))
+
+    assert [text.split(".")[0] for text in synthesized] == ["CHAPTER TWO", "CHAPTER THREE", "CHAPTER FOUR"]
+    assert "benefits" in synthesized[0]
+    sections = manifest["sections"]
+    assert [section["index"] for section in sections] == [1, 2, 3, 4]
+    assert sections[0]["text_digest"] == first_files["section_0001.mp3"]
+    assert sections[1]["text_digest"] != first_files["section_0002.mp3"]
+
+def test_missing_section_file_is_synthesized_again(tmp_path, synthesized):
+    doc_id = create_text_document(SOURCE, "fr", False, documents_dir=str(tmp_path))
+    with pytest.raises(Stop):
+        convert_document(doc_id, stop_after(2), documents_dir=str(tmp_path))
+    os.remove(os.path.join(document_dir(doc_id, str(tmp_path)), "section_0002.mp3"))
+    synthesized.clear()
+    convert_document(doc_id, documents_dir=str(tmp_path))
+    assert [text.split(".")[0] for text in synthesized] == ["CHAPTER TWO", "CHAPTER THREE", "CHAPTER FOUR"]
@@ -0,0 +1,78 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from ocr import OCRError, prepare_image, recognize_image, split_bands, split_columns, tile_page
+from stubs import make_text_photo
+
+TEXT = "The pharmacy on Church Street is open from nine until six on weekdays. " * 30
+
+# Ink mask of a page: text lines of line_height rows with blank rows between them, in each of
+# the given (left, right) column ranges
+def lined_page(height, width, columns, line_height=10, gap=6):
+    ink = np.zeros((height, width), dtype=bool)
+    for top in range(gap, height - line_height, line_height + gap):
+        for left, right in columns:
+            ink[top:top + line_height, left:right] = True
+    return ink
+
+@pytest.mark.parametrize("colour", ["white", "black", (128, 128, 128)])
+def test_prepare_image_of_a_blank_image_has_no_ink(colour):
+    ink = prepare_image(Image.new("RGB", (100, 80), colour))
+    assert ink.shape == (80, 100)
+    assert not ink.any()
+
+def test_prepare_image_binarizes_and_downscales_a_photo():
+    photo = Image.open(io.BytesIO(make_text_photo(TEXT, size=(1200, 1600), font_size=28)))
+    ink = prepare_image(photo, max_side=800)
+    assert ink.dtype == bool
+    assert ink.shape == (800, 600)
+    assert 0.005 < ink.mean() < 0.5
+
+def test_prepare_image_keeps_text_as_ink_on_a_dark_background():
+    image = Image.new("L", (200, 100), 20)
+    image.paste(230, (40, 40, 160, 60))  # Light text bar
+    ink = prepare_image(image)
+    assert ink[50, 100]
+    assert not ink[10, 10]
+
+def test_split_columns_cuts_at_the_gutter():
+    ink = lined_page(400, 1000, [(100, 450), (550, 900)])
+    columns = split_columns(ink)
+    assert len(columns) == 2
+    (_, cut), (cut_again, right) = columns
+    assert cut == cut_again and 450 <= cut <= 550
+    assert right == 1000
+
+def test_split_columns_ignores_margins_and_specks():
+    ink = lined_page(400, 1000, [(20, 980)])
+    ink[5, 500] = True  # A speck does not make a column of ink
+    assert split_columns(ink) == [(0, 1000)]
+
+def test_split_bands_cuts_between_lines_near_the_tile_height():
+    ink = lined_page(2000, 300, [(10, 290)])
+    bands = split_bands(ink, tile_height=400)
+    assert bands[0][0] == 0 and bands[-1][1] == 2000
+    assert all(previous[1] == following[0] for previous, following in zip(bands, bands[1:]))
+    for top, bottom in bands[:-1]:
+        assert 200 < bottom - top <= 600
+        assert not ink[bottom].any()  # Never through a line of text
+
+def test_split_bands_keeps_a_short_column_whole():
+    assert split_bands(lined_page(500, 300, [(10, 290)]), tile_height=400) == [(0, 500)]
+
+def test_tile_page_orders_tiles_column_by_column():
+    ink = lined_page(1600, 1000, [(100, 450), (550, 900)])
+    tiles = tile_page(ink, tile_height=400)
+    lefts = [left for _, _, left, _ in tiles]
+    assert lefts == sorted(lefts)
+    first_column = [(top, bottom) for top, bottom, left, _ in tiles if left == 0]
+    assert len(first_column) > 1
+    assert first_column == sorted(first_column)
+
+def test_tile_page_of_a_blank_page_is_empty():
+    assert tile_page(np.zeros((500, 500), dtype=bool)) == []
+
+def test_recognize_image_rejects_data_that_is_not_an_image():
+    with pytest.raises(OCRError):
+        recognize_image(b"this is not an image")
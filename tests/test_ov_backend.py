@@ -0,0 +1,20 @@
+import importlib
+import os
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("openvino")
+
+import ov_backend
+
+def test_stateless_decoder_is_the_default(monkeypatch):
+    monkeypatch.delenv("TTS_OV_STATEFUL", raising=False)
+    assert importlib.reload(ov_backend).OV_STATEFUL is False
+
+@pytest.mark.skipif(not os.environ.get("TTS_MODEL_PATH"), reason="needs a local model snapshot in TTS_MODEL_PATH")
+def test_stateful_decoder_generates_the_same_codes():
+    pytest.importorskip("parler_tts")
+    from ov_compress import check_stateful
+
+    result = check_stateful("fp32")
+    assert result["stateful_matches"], f"stateful decoder differs on {result['mismatched_prompts']}"
@@ -0,0 +1,50 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from parler_generation import build_voice_cache, check_voice_cache, decoder_encoder_states
+
+def fake_model(text_hidden, decoder_hidden, cross_attention_hidden_size=None):
+    return SimpleNamespace(
+        text_encoder=SimpleNamespace(config=SimpleNamespace(hidden_size=text_hidden)),
+        decoder=SimpleNamespace(config=SimpleNamespace(hidden_size=decoder_hidden, cross_attention_hidden_size=cross_attention_hidden_size)),
+        enc_to_dec_proj=torch.nn.Linear(text_hidden, decoder_hidden),
+    )
+
+def test_states_are_projected_and_masked():
+    model = fake_model(8, 4)
+    states = torch.randn(1, 3, 8)
+    mask = torch.tensor([[1, 1, 0]])
+    result = decoder_encoder_states(model, states, mask)
+    expected = model.enc_to_dec_proj(states) * mask[..., None]
+    assert result.shape == (1, 3, 4)
+    assert torch.allclose(result, expected)
+    assert torch.all(result[0, 2] == 0)
+
+def test_states_are_not_projected_when_widths_match():
+    model = fake_model(4, 4)
+    states = torch.randn(1, 2, 4)
+    result = decoder_encoder_states(model, states, torch.ones(1, 2, dtype=torch.long))
+    assert torch.equal(result, states)
+
+@pytest.mark.skipif(not os.environ.get("TTS_MODEL_PATH"), reason="needs a local model snapshot in TTS_MODEL_PATH")
+def test_cached_generation_matches_uncached():
+    pytest.importorskip("parler_tts")
+    from model_loader import load_parler
+
+    model, tokenizer, _ = load_parler()
+    voice_cache = build_voice_cache(model, tokenizer)
+    matches, difference = check_voice_cache(model, tokenizer, voice_cache, seed=0)
+    assert matches, f"cached and uncached audio differ by up to {difference}"
+
+def test_seeded_sampler_draws_each_item_from_its_own_seed():
+    from parler_generation import SeededSampler
+
+    scores = torch.randn(2, 50)  # Two codebook rows per item
+    alone = SeededSampler([7], top_k=10)(None, scores.clone()).argmax(dim=-1)
+    batched = SeededSampler([3, 7], top_k=10)(None, torch.cat([torch.randn(2, 50), scores])).argmax(dim=-1)
+    assert torch.equal(batched[2:], alone)
+    # Only the top-k tokens can be drawn
+    assert set(alone.tolist()) <= set(torch.topk(scores, 10, dim=-1).indices.flatten().tolist())
@@ -0,0 +1,55 @@
+import pytest
+from text_segments import end_sentence, pack_segments, split_long, split_sentences
+
+# One token per word keeps the budgets easy to read
+def count_words(text):
+    return len(text.split())
+
+@pytest.mark.parametrize("text, expected", [
+    ("Dr. Smith arrived. He sat down.", ["Dr. Smith arrived.", "He sat down."]),
+    ("We met Mrs. Jones at 9 a.m. on Monday. It rained.", ["We met Mrs. Jones at 9 a.m. on Monday.", "It rained."]),
+    ("J. R. R. Tolkien wrote it. Read it!", ["J. R. R. Tolkien wrote it.", "Read it!"]),
+    ("Is it open? Yes, e.g. on Sundays.", ["Is it open?", "Yes, e.g. on Sundays."]),
+])
+def test_abbreviations_and_initials_do_not_end_a_sentence(text, expected):
+    assert split_sentences(text) == expected
+
+def test_line_breaks_and_cjk_punctuation_end_sentences():
+    assert split_sentences("Title\nFirst line.  \n\nSecond line") == ["Title", "First line.", "Second line"]
+    assert split_sentences("今日は晴れです。明日は雨です。") == ["今日は晴れです。", "明日は雨です。"]
+    # A line break ends the sentence even after an abbreviation
+    assert split_sentences("Ask Dr.\nSmith") == ["Ask Dr.", "Smith"]
+
+def test_split_long_prefers_clause_boundaries():
+    text = "one two three, four five six, seven eight"
+    assert split_long(text, count_words, 3) == ["one two three,", "four five six,", "seven eight"]
+    assert split_long(text, count_words, 8) == [text]
+
+def test_split_long_keeps_a_single_word_whole():
+    assert split_long("Donaudampfschifffahrtsgesellschaft", len, 5) == ["Donaudampfschifffahrtsgesellschaft"]
+
+def test_over_long_sentence_is_cut_at_the_target():
+    segments = pack_segments(["a " * 20], count_words, target_tokens=4)
+    assert [count_words(segment) for segment in segments] == [4, 4, 4, 4, 4]
+
+def test_sentences_are_packed_evenly_within_the_budget():
+    sentences = [f"Sentence number {i} is here." for i in range(7)]  # 5 words each
+    segments = pack_segments(sentences, count_words, target_tokens=12, max_tokens=16)
+    counts = [count_words(segment) for segment in segments]
+    assert sum(counts) == 35
+    assert max(counts) <= 16
+    assert max(counts) - min(counts) <= 5
+    # Segments only break between sentences
+    assert all(segment.endswith(".") for segment in segments)
+
+def test_a_sentence_within_the_ceiling_is_kept_whole():
+    sentence = "one two three four five six seven, eight nine ten."
+    assert pack_segments([sentence], count_words, target_tokens=6, max_tokens=12) == [sentence]
+
+def test_pack_segments_of_nothing_is_empty():
+    assert pack_segments([], count_words, target_tokens=4) == []
+
+def test_end_sentence_adds_a_period_only_when_missing():
+    assert end_sentence("Hello") == "Hello."
+    assert end_sentence('He said "stop!"') == 'He said "stop!"'
+    assert end_sentence("Fin.") == "Fin."
@@ -0,0 +1,131 @@
+import pytest
+import translation
+from translation import MAX_REQUEST_CHARS, SegmentTranslator, TranslationMemo
+
+# Stand-in for GoogleTranslator: tags every line with its source language and records each request
+class RecordingTranslator:
+    def __init__(self, requests, source, target):
+        self.requests = requests
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        self.requests.append((self.source, text))
+        return "\n".join(f"<{self.source}>{line}" for line in text.split("\n"))
+
+    def translate_batch(self, texts):
+        return [self.translate(text) for text in texts]
+
+@pytest.fixture
+def sent_requests():
+    return []
+
+@pytest.fixture
+def memo(tmp_path):
+    return TranslationMemo(str(tmp_path / "memo.sqlite3"))
+
+@pytest.fixture
+def translator(sent_requests, memo):
+    return SegmentTranslator(lambda source, target: RecordingTranslator(sent_requests, source, target), memo)
+
+def test_memo_hits_skip_the_translator(translator, sent_requests, memo):
+    text = "The library is open on Monday. Please bring your card with you."
+    first = translator.translate(text, "fr")
+    assert len(sent_requests) == 1
+
+    sent_requests.clear()
+    assert translator.translate(text, "fr") == first
+    # The memo is on disk, so a translator in another process finds the same entries
+    assert SegmentTranslator(lambda source, target: RecordingTranslator(sent_requests, source, target), memo).translate(text, "fr") == first
+    assert sent_requests == []
+
+    # Only the new sentence is sent
+    translator.translate(text + " The bus stops at the door.", "fr")
+    assert sent_requests == [("en", "The bus stops at the door.")]
+
+def test_memo_hits_and_misses_count_distinct_sentences(translator, monkeypatch):
+    counts = []
+    monkeypatch.setattr(translation, "record_cache", lambda cache, hits=0, misses=0: counts.append((hits, misses)))
+    repeated = "Please call us. Please call us. Please call us."
+    translator.translate(repeated, "fr")
+    translator.translate(repeated + " The bus stops at the door.", "fr")
+    assert counts == [(0, 1), (1, 1)]
+
+def test_requests_are_packed_up_to_the_limit(translator, sent_requests):
+    sentences = [f"This is sentence number {i} of the letter from the council." for i in range(200)]
+    translated = translator.translate(" ".join(sentences), "fr")
+
+    assert all(len(text) <= MAX_REQUEST_CHARS for _, text in sent_requests)
+    sent = [line for _, text in sent_requests for line in text.split("\n")]
+    assert sent == sentences
+    # As few requests as the limit allows
+    assert len(sent_requests) == -(-sum(len(sentence) + 1 for sentence in sentences) // MAX_REQUEST_CHARS)
+    assert translated == " ".join(f"<en>{sentence}" for sentence in sentences)
+
+def test_a_sentence_longer_than_one_request_is_cut(translator, sent_requests):
+    sentence = "and the form " * 600 + "must be signed."
+    translator.translate(sentence, "fr")
+    assert len(sent_requests) > 1
+    assert all(len(text) <= MAX_REQUEST_CHARS for _, text in sent_requests)
+
+def test_sentences_are_reassembled_in_order(translator, sent_requests):
+    text = (
+        "Le rendez-vous est à dix heures dans la salle. "
+        "Thank you very much. "
+        "안녕하세요 반갑습니다. "
+        "OK. "
+        "Nous vous remercions pour votre patience et votre aide."
+    )
+    translated = translator.translate(text, "ko")
+
+    # Each source language is one request, but the result follows the original sentence order;
+    # the Korean sentence is kept and the undetected one is left to the translator
+    assert sorted(source for source, _ in sent_requests) == ["auto", "en", "fr"]
+    assert translated == (
+        "<fr>Le rendez-vous est à dix heures dans la salle. "
+        "<en>Thank you very much. "
+        "안녕하세요 반갑습니다. "
+        "<auto>OK. "
+        "<fr>Nous vous remercions pour votre patience et votre aide."
+    )
+
+# Translates joined requests into a single line, as the real service sometimes does
+class MergingTranslator(RecordingTranslator):
+    def translate(self, text):
+        self.requests.append((self.source, text))
+        return f"<{self.source}>" + text.replace("\n", " ")
+
+def test_merged_lines_fall_back_to_one_request_per_sentence(sent_requests, memo):
+    translator = SegmentTranslator(lambda source, target: MergingTranslator(sent_requests, source, target), memo)
+    translated = translator.translate("The office is closed today. It opens again on Friday.", "fr")
+    assert translated == "<en>The office is closed today. <en>It opens again on Friday."
+
+# Merges lines like MergingTranslator, and fails on sentences containing any of the given words:
+# translate_batch gives None for them, and translate too when they are in always_fails
+class FailingTranslator(MergingTranslator):
+    def __init__(self, requests, source, target, batch_fails, always_fails=()):
+        super().__init__(requests, source, target)
+        self.batch_fails = batch_fails
+        self.always_fails = always_fails
+
+    def translate(self, text):
+        if any(word in text for word in self.always_fails):
+            self.requests.append((self.source, text))
+            return None
+        return super().translate(text)
+
+    def translate_batch(self, texts):
+        return [None if any(word in text for word in self.batch_fails) else self.translate(text) for text in texts]
+
+def test_sentences_missing_from_a_batch_are_retried_one_by_one(sent_requests, memo):
+    translator = SegmentTranslator(lambda source, target: FailingTranslator(sent_requests, source, target, ["Friday"]), memo)
+    translated = translator.translate("The office is closed today. It opens again on Friday.", "fr")
+    assert translated == "<en>The office is closed today. <en>It opens again on Friday."
+
+def test_untranslatable_sentences_keep_their_text_and_are_not_memoized(sent_requests, memo):
+    translator = SegmentTranslator(lambda source, target: FailingTranslator(sent_requests, source, target, ["Friday"], ["Friday"]), memo)
+    text = "The office is closed today. It opens again on Friday."
+    assert translator.translate(text, "fr") == "<en>The office is closed today. It opens again on Friday."
+    sent_requests.clear()
+    translator.translate(text, "fr")
+    assert sent_requests == [("en", "It opens again on Friday.")]
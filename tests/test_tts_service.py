@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import tempfile
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+# The service's stores are configured when its modules are imported; keep them out of the checkout
+_state_dir = tempfile.mkdtemp(prefix="tts-service-test-")
+os.environ.setdefault("TTS_AUDIO_CACHE_DIR", os.path.join(_state_dir, "audio"))
+os.environ.setdefault("TTS_TRANSLATION_MEMO", os.path.join(_state_dir, "translations.sqlite3"))
+os.environ.setdefault("TTS_DOCUMENTS_DIR", os.path.join(_state_dir, "documents"))
+
+import pipeline
+import tts_service
+from gtts_pool import make_session, synthesize_parallel
+from stubs import GTTSStubHandler, StubTranslator, start_stub_server
+from translation import SegmentTranslator, TranslationMemo
+
+TEXT = "The community centre opens at nine o'clock. Lunch is served at noon on weekdays."
+
+# Runs the whole service in this process: translation and speech go to local stand-ins
+@pytest.fixture(scope="module")
+def stub_pipeline():
+    GTTSStubHandler.delay = 0.0
+    server, url = start_stub_server(GTTSStubHandler)
+    session = make_session()
+    patch = pytest.MonkeyPatch()
+    patch.setattr(pipeline, "segment_translator", SegmentTranslator(
+        lambda source, target: StubTranslator(target, delay=0.0),
+        TranslationMemo(os.path.join(_state_dir, "stub-translations.sqlite3")),
+    ))
+    patch.setattr(pipeline, "synthesize_parallel", lambda text, language, slow: synthesize_parallel(text, language, slow, session=session, endpoint=url))
+    yield
+    patch.undo()
+    server.shutdown()
+
+# Run scenario(client) against a test server for the app
+def run(scenario):
+    async def main():
+        async with TestClient(TestServer(tts_service.make_app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+def test_speech_streams_mp3(stub_pipeline):
+    async def scenario(client):
+        response = await client.post("/v1/speech", json={"text": TEXT, "language": "fr"})
+        return response.status, response.content_type, await response.read()
+
+    status, content_type, audio = run(scenario)
+    assert status == 200
+    assert content_type == "audio/mpeg"
+    assert audio.startswith(b"\xff\xf3")
+
+def test_websocket_convert_sends_text_audio_and_done(stub_pipeline):
+    async def scenario(client):
+        messages = []
+        async with client.ws_connect("/v1/ws") as ws:
+            await ws.send_json({"text": TEXT, "language": "fr"})
+            while not messages or isinstance(messages[-1], bytes) or messages[-1]["type"] == "text":
+                message = await ws.receive()
+                messages.append(message.data if isinstance(message.data, bytes) else json.loads(message.data))
+        return messages
+
+    messages = run(scenario)
+    assert messages[0] == {"type": "text", "text": TEXT}
+    assert any(isinstance(message, bytes) and message.startswith(b"\xff\xf3") for message in messages)
+    assert messages[-1] == {"type": "done", "text": TEXT}
+
+def test_websocket_reports_bad_input(stub_pipeline):
+    async def scenario(client):
+        async with client.ws_connect("/v1/ws") as ws:
+            await ws.send_str("{not json")
+            first = await ws.receive_json()
+            await ws.send_json({"language": "fr"})
+            return first, await ws.receive_json()
+
+    invalid_json, missing_text = run(scenario)
+    assert invalid_json["type"] == "error"
+    assert missing_text == {"type": "error", "error": "Provide text or a url."}
+
+@pytest.mark.parametrize("kwargs", [
+    {"json": {"language": "fr"}},
+    {"data": b"{not json", "headers": {"Content-Type": "application/json"}},
+    {"data": b"hello", "headers": {"Content-Type": "text/plain"}},
+    {"json": {"text": "   ", "language": "fr"}},
+])
+def test_speech_rejects_bad_input(stub_pipeline, kwargs):
+    async def scenario(client):
+        response = await client.post("/v1/speech", **kwargs)
+        return response.status, await response.json()
+
+    status, body = run(scenario)
+    assert status == 400
+    assert body["error"]
+
+def test_speech_rejects_oversized_body(stub_pipeline, monkeypatch):
+    monkeypatch.setattr(tts_service, "MAX_UPLOAD_BYTES", 1024)
+
+    async def scenario(client):
+        response = await client.post("/v1/speech", data=b"%PDF" + b"\0" * 4096, headers={"Content-Type": "application/pdf"})
+        return response.status
+
+    assert run(scenario) == 413
+
+def test_long_document_completes(stub_pipeline):
+    chapter = "The bus leaves from the square every hour. " * 20
+    text = f"CHAPTER ONE\n{chapter}\nCHAPTER TWO\n{chapter}"
+
+    async def scenario(client):
+        response = await client.post("/v1/documents", json={"text": text, "language": "fr"})
+        assert response.status == 202
+        doc_id = (await response.json())["id"]
+        for _ in range(200):
+            status = await (await client.get(f"/v1/documents/{doc_id}")).json()
+            if status["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        playlist = await (await client.get(f"/v1/documents/{doc_id}/playlist.m3u")).text()
+        section = await client.get(f"/v1/documents/{doc_id}/{status['sections'][0]['file']}")
+        return status, playlist, section.status, await section.read()
+
+    status, playlist, section_status, section_audio = run(scenario)
+    assert status["status"] == "done"
+    assert [section["title"] for section in status["sections"]] == ["CHAPTER ONE", "CHAPTER TWO"]
+    assert playlist.splitlines()[:3] == ["#EXTM3U", "#EXTINF:-1,CHAPTER ONE", "section_0001.mp3"]
+    assert section_status == 200
+    assert len(section_audio) == status["sections"][0]["bytes"]
@@ -0,0 +1,68 @@
+from http.server import BaseHTTPRequestHandler
+import pytest
+import url_fetch
+from stubs import start_stub_server
+from url_fetch import extract_main_text, fetch_article_text
+
+ARTICLE = "<p>The library opens a new reading room for large-print books on Monday.</p>"
+
+# Serves one page with an ETag and answers revalidations with 304
+class RevalidatingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+    requests = []
+    on_not_modified = None
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            if self.on_not_modified is not None:
+                self.on_not_modified()
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        page = f"<html><body><article>{ARTICLE}</article></body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def page_url(monkeypatch):
+    monkeypatch.setattr(url_fetch, "_cache", type(url_fetch._cache)())
+    RevalidatingHandler.requests = []
+    RevalidatingHandler.on_not_modified = None
+    server, url = start_stub_server(RevalidatingHandler)
+    yield url + "/news"
+    server.shutdown()
+
+def test_site_header_is_dropped_but_article_header_is_read():
+    html = (
+        "<html><body><header><p>Local News - Subscribe today</p></header>"
+        "<article><header><h1>Reading room opens</h1><p>By Ana Lima</p></header>"
+        f"{ARTICLE}</article></body></html>"
+    )
+    assert extract_main_text(html).splitlines() == [
+        "Reading room opens", "By Ana Lima", "The library opens a new reading room for large-print books on Monday.",
+    ]
+
+def test_header_in_main_is_kept_without_an_article():
+    html = f"<header>Site banner</header><main><header><h2>Opening hours</h2></header>{ARTICLE}</main>"
+    assert extract_main_text(html).splitlines()[0] == "Opening hours"
+
+def test_unchanged_page_is_revalidated_from_the_cache(page_url):
+    text = fetch_article_text(page_url)
+    assert fetch_article_text(page_url) == text
+    assert RevalidatingHandler.requests == [None, '"v1"']
+
+def test_revalidation_survives_the_entry_being_evicted_meanwhile(page_url):
+    text = fetch_article_text(page_url)
+    RevalidatingHandler.on_not_modified = url_fetch._cache.clear
+    assert fetch_article_text(page_url) == text
+    assert url_fetch._cache[page_url][2] == text
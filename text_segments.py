@@ -0,0 +1,101 @@
+import math
+import re
+
+# Sentence boundaries: whitespace after sentence-ending punctuation (Latin or CJK), or a line break
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。！？])\s+|(?<=[。！？])|\n+")
+# Clause boundaries, used to break up sentences that are too long for one segment
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:，；：、])\s*")
+# Sentence endings, including closing quotes and brackets after the punctuation
+SENTENCE_END = re.compile(r"[.!?。！？][\"'”’)\]]*$")
+CJK_END = re.compile(r"[　-ヿ一-鿿가-힯＀-￯]$")
+
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "jr.", "sr.", "vs.", "no.", "fig.",
+    "approx.", "inc.", "ltd.", "co.", "e.g.", "i.e.", "a.m.", "p.m.", "u.s.", "u.k.",
+}
+INITIAL = re.compile(r"[A-Z]\.")
+
+def _ends_with_abbreviation(text):
+    words = text.split()
+    return bool(words) and (words[-1].lower() in ABBREVIATIONS or INITIAL.fullmatch(words[-1]) is not None)
+
+# Split text into trimmed, non-empty sentences
+def split_sentences(text):
+    sentences = []
+    start = 0
+    for boundary in SENTENCE_BOUNDARY.finditer(text):
+        sentence = text[start:boundary.start()]
+        # "Dr. Smith" or "J. R. Tolkien" continue the sentence; line breaks always end it
+        if "\n" not in boundary.group() and _ends_with_abbreviation(sentence):
+            continue
+        sentences.append(sentence)
+        start = boundary.end()
+    sentences.append(text[start:])
+    return [sentence.strip() for sentence in sentences if sentence.strip()]
+
+# Join two pieces of text, without a space after CJK text
+def _join(left, right):
+    if not left:
+        return right
+    return left + ("" if CJK_END.search(left) else " ") + right
+
+# Break a piece longer than max_tokens at clause boundaries, then between words
+def split_long(text, count_tokens, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    clauses = [clause for clause in CLAUSE_BOUNDARY.split(text) if clause.strip()]
+    if len(clauses) > 1:
+        return [piece for clause in clauses for piece in split_long(clause, count_tokens, max_tokens)]
+
+    words = text.split()
+    if len(words) == 1:
+        # A single unbreakable word (or unspaced CJK run) is kept whole
+        return [text]
+    pieces = []
+    current = ""
+    for word in words:
+        candidate = _join(current, word)
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = word
+        current = candidate
+    pieces.append(current)
+    return pieces
+
+# Pack sentences into segments of roughly target_tokens each (never above max_tokens unless a
+# single word is longer). Sentence boundaries are kept whenever possible, and the segments are
+# sized evenly so a batch of them pads very little. A sentence over max_tokens is cut into pieces
+# of about target_tokens, so it does not end up as a few segments twice the size of the rest.
+def pack_segments(sentences, count_tokens, target_tokens, max_tokens=None):
+    max_tokens = max_tokens or 2 * target_tokens
+    pieces = []
+    for sentence in sentences:
+        if count_tokens(sentence) > max_tokens:
+            pieces.extend(split_long(sentence, count_tokens, target_tokens))
+        else:
+            pieces.append(sentence)
+    counts = [count_tokens(piece) for piece in pieces]
+    total = sum(counts)
+    if not total:
+        return []
+
+    # Aim every segment at the same size instead of filling each one up to the target
+    goal = total / max(1, math.ceil(total / target_tokens))
+    segments = []
+    current = ""
+    current_tokens = 0
+    for piece, tokens in zip(pieces, counts):
+        if current and (current_tokens + tokens > max_tokens or
+                        abs(current_tokens + tokens - goal) > abs(current_tokens - goal)):
+            segments.append(current)
+            current = ""
+            current_tokens = 0
+        current = _join(current, piece)
+        current_tokens += tokens
+    segments.append(current)
+    return segments
+
+# Make sure a segment ends like a sentence, so the TTS model closes the intonation
+def end_sentence(text):
+    return text if SENTENCE_END.search(text) else text + "."
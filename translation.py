@@ -0,0 +1,143 @@
+import os
+import sqlite3
+from deep_translator import GoogleTranslator
+from language_id import detect_language
+from text_segments import split_long, split_sentences
+from metrics import record_cache
+
+# Persistent memo of sentence translations shared by all users and Streamlit processes
+TRANSLATION_MEMO_PATH = os.environ.get("TTS_TRANSLATION_MEMO", os.path.join(".cache", "translations.sqlite3"))
+
+# Longest string sent to the translator in one request (Google Translate rejects more than 5000 characters)
+MAX_REQUEST_CHARS = 4500
+
+# Languages written without spaces between sentences
+NO_SPACE_LANGUAGES = ("ja", "zh-CN", "zh-TW")
+
+# SQLite-backed (sentence, target language) -> translation store
+class TranslationMemo:
+    def __init__(self, path=TRANSLATION_MEMO_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memo ("
+                "target TEXT NOT NULL, source TEXT NOT NULL, translated TEXT NOT NULL, "
+                "PRIMARY KEY (target, source))"
+            )
+
+    def _connect(self):
+        # A fresh connection per call keeps the memo safe to use from Streamlit's worker threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Return {sentence: translation} for the sentences already in the memo
+    def get_many(self, sentences, target_language):
+        found = {}
+        sentences = list(sentences)
+        with self._connect() as conn:
+            # Stay under SQLite's limit on the number of query parameters
+            for start in range(0, len(sentences), 500):
+                chunk = sentences[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT source, translated FROM memo WHERE target = ? AND source IN ({placeholders})",
+                    [target_language, *chunk],
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, translations, target_language):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO memo (target, source, translated) VALUES (?, ?, ?)",
+                [(target_language, source, translated) for source, translated in translations.items()],
+            )
+
+# Sentences longer than one request are cut at clauses or words, and unbreakable runs
+# (e.g. unspaced CJK text) at MAX_REQUEST_CHARS
+def _request_pieces(sentence):
+    return [
+        piece[start:start + MAX_REQUEST_CHARS]
+        for piece in split_long(sentence, len, MAX_REQUEST_CHARS)
+        for start in range(0, len(piece), MAX_REQUEST_CHARS)
+    ]
+
+# The language of each sentence, or "auto" when it cannot be told (e.g. "OK." or "Tel: 555-0100");
+# the translator then detects it, so an undetected sentence is never mistaken for the target language
+def sentence_languages(sentences):
+    return [detect_language(sentence) or "auto" for sentence in sentences]
+
+# Translates text sentence by sentence, only sending sentences missing from the memo. Sentences
+# detected as the target language are kept as they are, and the rest are sent with their detected
+# source language ("auto" when undetected). translator_factory(source_language, target_language) must return an object
+# with translate(text) and translate_batch(list_of_texts); tests can pass a local stand-in
+# instead of GoogleTranslator.
+class SegmentTranslator:
+    def __init__(self, translator_factory=None, memo=None):
+        self.translator_factory = translator_factory or (lambda source, target: GoogleTranslator(source=source, target=target))
+        self.memo = memo if memo is not None else TranslationMemo()
+        self._translators = {}
+
+    # Reuse one translator client per language pair
+    def _translator(self, source_language, target_language):
+        if (source_language, target_language) not in self._translators:
+            self._translators[source_language, target_language] = self.translator_factory(source_language, target_language)
+        return self._translators[source_language, target_language]
+
+    # Translate the misses with as few requests as possible: sentences are joined by newlines
+    # into requests of up to MAX_REQUEST_CHARS, and split back apart afterwards
+    def _translate_misses(self, misses, source_language, target_language):
+        translator = self._translator(source_language, target_language)
+        translations = {}
+        request = []
+        request_chars = 0
+        for sentence in misses + [None]:
+            if sentence is not None and (not request or request_chars + len(sentence) + 1 <= MAX_REQUEST_CHARS):
+                request.append(sentence)
+                request_chars += len(sentence) + 1
+                continue
+
+            translated = (translator.translate("\n".join(request)) or "").split("\n")
+            if len(translated) != len(request):
+                # The translator merged or split lines; fall back to one request per sentence
+                translated = translator.translate_batch(request)
+            for source, translation in zip(request, translated):
+                # translate_batch gives None for a sentence it failed on; try that one on its own
+                if translation is None:
+                    translation = translator.translate(source)
+                if translation is not None:
+                    translations[source] = translation
+
+            if sentence is not None:
+                request = [sentence]
+                request_chars = len(sentence) + 1
+        return translations
+
+    def translate(self, text, target_language):
+        sentences = [piece for sentence in split_sentences(text) for piece in _request_pieces(sentence)]
+        if not sentences:
+            return ""
+
+        languages = sentence_languages(sentences)
+        # Sentences positively detected as the target language need no translation at all
+        translations = {sentence: sentence for sentence, language in zip(sentences, languages) if language == target_language}
+        foreign = [(sentence, language) for sentence, language in zip(sentences, languages) if sentence not in translations]
+        distinct_foreign = {sentence for sentence, _ in foreign}
+        translations.update(self.memo.get_many(distinct_foreign, target_language))
+
+        misses_by_language = {}
+        for sentence, language in foreign:
+            if sentence not in translations:
+                misses_by_language.setdefault(language, {})[sentence] = None
+        miss_count = sum(len(misses) for misses in misses_by_language.values())
+        # Counted per distinct sentence, so a sentence repeated in the text is not a memo hit
+        record_cache("translation", hits=len(distinct_foreign) - miss_count, misses=miss_count)
+        for language, misses in misses_by_language.items():
+            new_translations = self._translate_misses(list(misses), language, target_language)
+            self.memo.put_many(new_translations, target_language)
+            translations.update(new_translations)
+
+        joiner = "" if target_language in NO_SPACE_LANGUAGES else " "
+        # A sentence the translator could not translate is read in its own language and not memoized
+        return joiner.join(translations.get(sentence, sentence).strip() for sentence in sentences)
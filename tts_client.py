@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import threading
+import aiohttp
+
+# Client for tts_service.py, used by the Streamlit app. TTS_SERVICE_URL points at a running
+# service; when it is unset the service is started in a background thread of this process.
+
+TTS_SERVICE_URL = os.environ.get("TTS_SERVICE_URL")
+# Connect and read timeouts (seconds) for service requests; conversions can stream for minutes
+SERVICE_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=5, sock_read=120)
+
+class ServiceError(Exception):
+    pass
+
+_embedded_url = None
+_embedded_lock = threading.Lock()
+
+def service_url():
+    global _embedded_url
+    if TTS_SERVICE_URL:
+        return TTS_SERVICE_URL.rstrip("/")
+    with _embedded_lock:
+        if _embedded_url is None:
+            # Imported here so a client of an external service does not load the pipeline
+            from tts_service import start_service_thread
+            _embedded_url = start_service_thread()
+        return _embedded_url
+
+async def _extract(data, on_text):
+    texts = []
+    async with aiohttp.ClientSession(timeout=SERVICE_TIMEOUT) as session:
+        async with session.post(f"{service_url()}/v1/extract", data=data) as response:
+            if response.status != 200:
+                raise ServiceError((await response.json()).get("error", f"HTTP {response.status}"))
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise ServiceError(message["error"])
+                texts.append(message["text"])
+                if on_text is not None:
+                    on_text(message["text"])
+    return "\n".join(texts)
+
+# Extract the text of a PDF or image (bytes) or a URL; on_text is called with each page as it arrives
+def extract(pdf=None, image=None, url=None, on_text=None):
+    if url is not None:
+        data = aiohttp.FormData({"url": url})
+    else:
+        data = aiohttp.FormData()
+        name, content = ("pdf", pdf) if pdf is not None else ("image", image)
+        data.add_field(name, content, filename=name, content_type="application/octet-stream")
+    try:
+        return asyncio.run(_extract(data, on_text))
+    except aiohttp.ClientError as e:
+        raise ServiceError(f"The text-to-speech service is unavailable: {e}") from e
+
+async def _convert(request, on_text, on_audio):
+    audio_chunks = []
+    async with aiohttp.ClientSession(timeout=SERVICE_TIMEOUT) as session:
+        async with session.ws_connect(f"{service_url()}/v1/ws", max_msg_size=0) as ws:
+            await ws.send_json(request)
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.BINARY:
+                    audio_chunks.append(message.data)
+                    if on_audio is not None:
+                        on_audio(message.data)
+                    continue
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    break
+                event = json.loads(message.data)
+                if event["type"] == "text":
+                    if on_text is not None:
+                        on_text(event["text"])
+                elif event["type"] == "error":
+                    raise ServiceError(event["error"])
+                elif event["type"] == "done":
+                    return event["text"], b"".join(audio_chunks)
+    raise ServiceError("The text-to-speech service closed the connection.")
+
+# Translate and synthesize text over the service's WebSocket. on_text and on_audio are called as
+# each translated block and MP3 chunk arrives; returns (translated_text, mp3_bytes).
+def convert(text, language, slow, on_text=None, on_audio=None):
+    request = {"text": text, "language": language, "slow": bool(slow)}
+    try:
+        return asyncio.run(_convert(request, on_text, on_audio))
+    except aiohttp.ClientError as e:
+        raise ServiceError(f"The text-to-speech service is unavailable: {e}") from e
+
+async def _request(method, path, data=None):
+    async with aiohttp.ClientSession(timeout=SERVICE_TIMEOUT) as session:
+        async with session.request(method, f"{service_url()}{path}", data=data) as response:
+            if response.status >= 400:
+                raise ServiceError((await response.json()).get("error", f"HTTP {response.status}"))
+            if response.content_type == "application/json":
+                return await response.json()
+            return await response.read()
+
+def _run(coroutine):
+    try:
+        return asyncio.run(coroutine)
+    except aiohttp.ClientError as e:
+        raise ServiceError(f"The text-to-speech service is unavailable: {e}") from e
+
+# Start (or resume) converting a long document, given as PDF bytes, text or a URL; returns its id
+def start_document(language, slow, pdf=None, text=None, url=None):
+    data = aiohttp.FormData({"language": language, "slow": str(bool(slow)).lower()})
+    if pdf is not None:
+        data.add_field("pdf", pdf, filename="document.pdf", content_type="application/pdf")
+    elif url is not None:
+        data.add_field("url", url)
+    else:
+        data.add_field("text", text)
+    return _run(_request("POST", "/v1/documents", data))["id"]
+
+# The document's manifest (its finished "sections") with its "status", "progress" and "message"
+def document_status(doc_id):
+    return _run(_request("GET", f"/v1/documents/{doc_id}"))
+
+# A section's MP3 bytes, or the playlist (playlist.m3u)
+def document_file(doc_id, name):
+    return _run(_request("GET", f"/v1/documents/{doc_id}/{name}"))
@@ -0,0 +1,359 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from aiohttp import WSMsgType, web
+import long_document
+import pipeline
+from jobs import JobQueue
+from ocr import OCRError
+from translation import NO_SPACE_LANGUAGES
+from url_fetch import FetchError
+
+# Headless HTTP/WebSocket service for the extract -> translate -> synthesize pipeline, for
+# kiosks, phones and the Streamlit app (which is a thin client of it, see tts_client.py).
+#
+#   POST /v1/extract   {"url": ...} | {"text": ...} | PDF or image upload -> NDJSON lines {"text": ...}
+#   POST /v1/speech    {"text" | "url": ..., "language": "fr", "slow": false} | PDF or image upload
+#                      -> chunked audio/mpeg, sent block by block as it is synthesized
+#   GET  /v1/ws        WebSocket: send the same JSON as /v1/speech; receives {"type": "text"}
+#                      messages, binary MP3 frames and finally {"type": "done", "text": the
+#                      whole translation} (or {"type": "error"})
+#   POST /v1/documents {"text" | "url": ..., "language": ..., "slow": ...} | PDF upload
+#                      -> {"id": ...}; starts (or resumes) a long-document conversion
+#   GET  /v1/documents/{id}         -> its manifest plus "status", "progress" and "message"
+#   GET  /v1/documents/{id}/{file}  -> a section MP3, playlist.m3u or index.json
+#   GET  /healthz
+#
+# Uploads are multipart forms with a "pdf" or "image" file field (plus "language" and "slow"
+# fields), or a raw PDF body with Content-Type application/pdf and the options in the query string.
+#
+#   python tts_service.py --port 8600
+
+SERVICE_HOST = os.environ.get("TTS_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("TTS_SERVICE_PORT", "8600"))
+# Largest request body accepted, e.g. a PDF upload
+MAX_UPLOAD_BYTES = int(os.environ.get("TTS_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+# Largest long-document upload; it is streamed to disk, not held in memory
+MAX_DOCUMENT_BYTES = int(os.environ.get("TTS_MAX_DOCUMENT_BYTES", 200 * 1024 * 1024))
+# Long documents converted at the same time
+DOCUMENT_WORKERS = int(os.environ.get("TTS_DOCUMENT_WORKERS", "2"))
+
+logger = logging.getLogger("tts.service")
+
+class RequestError(Exception):
+    pass
+
+# Run a blocking generator on the default thread pool and iterate it without blocking the event loop
+async def iterate_in_thread(generator):
+    loop = asyncio.get_running_loop()
+    done = object()
+    try:
+        while True:
+            item = await loop.run_in_executor(None, next, generator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        try:
+            await loop.run_in_executor(None, generator.close)
+        except ValueError:
+            pass  # Still running in its thread after a cancellation; it is closed once collected
+
+def _as_bool(value):
+    return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes", "on")
+
+# Read the request into {"text" | "url" | "pdf": ..., "language": ..., "slow": ...}
+async def read_request(request):
+    content_type = request.content_type
+    if content_type == "application/json":
+        try:
+            fields = await request.json()
+        except json.JSONDecodeError as e:
+            raise RequestError(f"Invalid JSON: {e}") from e
+    elif content_type == "multipart/form-data":
+        fields = {}
+        async for part in await request.multipart():
+            if part.name in ("pdf", "image"):
+                fields[part.name] = await part.read(decode=False)
+            elif part.name:
+                fields[part.name] = await part.text()
+    elif content_type == "application/x-www-form-urlencoded":
+        fields = dict(await request.post())
+    elif content_type == "application/pdf":
+        fields = {**request.query, "pdf": await request.read()}
+    else:
+        raise RequestError("Send JSON, a form or a PDF.")
+    if not isinstance(fields, dict) or not any(fields.get(name) for name in ("text", "url", "pdf", "image")):
+        raise RequestError("Provide text, a url, a pdf or an image.")
+    return fields
+
+# Blocking: the text of the request's input, page by page for PDFs
+def iter_input_text(fields):
+    if fields.get("pdf"):
+        for page_text in pipeline.iter_pdf_text(bytes(fields["pdf"])):
+            if page_text:
+                yield page_text
+    elif fields.get("image"):
+        yield pipeline.extract_text_from_image(io.BytesIO(bytes(fields["image"])))
+    elif fields.get("url"):
+        yield pipeline.fetch_text_from_url(fields["url"])
+    else:
+        yield fields["text"]
+
+# Blocking: ("text", translated block) and ("audio", MP3 bytes) events for the request
+def iter_speech(fields):
+    input_text = "\n".join(iter_input_text(fields))
+    if not input_text.strip():
+        raise RequestError("No text found in the input.")
+    yield from pipeline.iter_conversion(input_text, fields.get("language", "en"), _as_bool(fields.get("slow", False)))
+
+def error_response(status, message):
+    return web.json_response({"error": message}, status=status)
+
+async def handle_extract(request):
+    try:
+        fields = await read_request(request)
+    except RequestError as e:
+        return error_response(400, str(e))
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    try:
+        async for text in iterate_in_thread(iter_input_text(fields)):
+            await response.write(json.dumps({"text": text}, ensure_ascii=False).encode("utf-8") + b"\n")
+    except (FetchError, OCRError, RequestError) as e:
+        await response.write(json.dumps({"error": str(e)}).encode("utf-8") + b"\n")
+    except Exception as e:
+        logger.exception("Extraction failed")
+        await response.write(json.dumps({"error": f"Extraction failed: {e}"}).encode("utf-8") + b"\n")
+    await response.write_eof()
+    return response
+
+async def handle_speech(request):
+    try:
+        fields = await read_request(request)
+    except RequestError as e:
+        return error_response(400, str(e))
+
+    events = iterate_in_thread(iter_speech(fields))
+    # Wait for the first audio before sending headers, so input errors still get a proper status
+    try:
+        async for kind, data in events:
+            if kind == "audio":
+                first_audio = data
+                break
+        else:
+            return error_response(400, "No text found in the input.")
+    except (FetchError, OCRError, RequestError) as e:
+        return error_response(400, str(e))
+    except Exception as e:
+        logger.exception("Conversion failed")
+        return error_response(502, f"Conversion failed: {e}")
+
+    response = web.StreamResponse(headers={"Content-Type": "audio/mpeg", "Cache-Control": "no-store"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    await response.write(first_audio)
+    # Headers are already sent, so a later failure propagates and aborts the connection; the
+    # missing final chunk tells the client the audio is incomplete
+    async for kind, data in events:
+        if kind == "audio":
+            await response.write(data)
+    await response.write_eof()
+    return response
+
+async def handle_ws(request):
+    ws = web.WebSocketResponse(heartbeat=30, max_msg_size=MAX_UPLOAD_BYTES)
+    await ws.prepare(request)
+    async for message in ws:
+        if message.type != WSMsgType.TEXT:
+            break
+        try:
+            fields = json.loads(message.data)
+            if not isinstance(fields, dict) or not any(fields.get(name) for name in ("text", "url")):
+                raise RequestError("Provide text or a url.")
+            translated_blocks = []
+            async for kind, data in iterate_in_thread(iter_speech(fields)):
+                if kind == "audio":
+                    await ws.send_bytes(data)
+                else:
+                    translated_blocks.append(data)
+                    await ws.send_json({"type": "text", "text": data})
+            joiner = "" if fields.get("language") in NO_SPACE_LANGUAGES else " "
+            await ws.send_json({"type": "done", "text": joiner.join(translated_blocks)})
+        except (FetchError, OCRError, RequestError, json.JSONDecodeError) as e:
+            await ws.send_json({"type": "error", "error": str(e)})
+        except Exception as e:
+            if ws.closed:
+                break  # The client went away mid-stream
+            logger.exception("Conversion failed")
+            await ws.send_json({"type": "error", "error": f"Conversion failed: {e}"})
+    return ws
+
+# Long-document conversions, keyed by document id so a document is converted by one job at a time
+document_jobs = JobQueue(max_workers=DOCUMENT_WORKERS)
+
+def run_document(job, doc_id):
+    job.update(0.0, "Starting the conversion...")
+    return long_document.convert_document(doc_id, on_progress=job.update)
+
+def start_document(doc_id):
+    return document_jobs.submit(doc_id, run_document, doc_id)
+
+def _open_upload_file():
+    os.makedirs(long_document.DOCUMENTS_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=long_document.DOCUMENTS_DIR, suffix=".upload")
+    return os.fdopen(fd, "wb"), path
+
+# Stream a document upload to a file under the documents directory; returns (path, sha256 hex).
+# The file is written on the thread pool so a slow disk does not stall the event loop.
+async def _save_upload(reader):
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+    f, path = await loop.run_in_executor(None, _open_upload_file)
+    try:
+        while True:
+            chunk = await reader.read_chunk()
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_DOCUMENT_BYTES:
+                raise RequestError(f"Documents are limited to {MAX_DOCUMENT_BYTES // (1024 * 1024)} MB.")
+            digest.update(chunk)
+            await loop.run_in_executor(None, f.write, chunk)
+        await loop.run_in_executor(None, f.close)
+    except BaseException:
+        f.close()
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+async def handle_create_document(request):
+    loop = asyncio.get_running_loop()
+    try:
+        if request.content_type == "multipart/form-data":
+            fields = {}
+            upload = None
+            async for part in await request.multipart():
+                if part.name == "pdf":
+                    upload = await _save_upload(part)
+                elif part.name:
+                    fields[part.name] = await part.text()
+        else:
+            fields = await read_request(request)
+            upload = None
+        language = fields.get("language", "en")
+        slow = _as_bool(fields.get("slow", False))
+        if upload is not None:
+            path, digest = upload
+            doc_id = await loop.run_in_executor(None, long_document.create_document, path, "pdf", language, slow, digest)
+        elif fields.get("url"):
+            text = await loop.run_in_executor(None, pipeline.fetch_text_from_url, fields["url"], None)
+            doc_id = await loop.run_in_executor(None, long_document.create_text_document, text, language, slow)
+        elif fields.get("text"):
+            doc_id = await loop.run_in_executor(None, long_document.create_text_document, fields["text"], language, slow)
+        else:
+            raise RequestError("Provide text, a url or a pdf.")
+    except (FetchError, OCRError, RequestError) as e:
+        return error_response(400, str(e))
+
+    start_document(doc_id)
+    return web.json_response({"id": doc_id}, status=202)
+
+async def handle_document_status(request):
+    doc_id = request.match_info["doc_id"]
+    manifest = long_document.load_manifest(doc_id)
+    if manifest is None:
+        return error_response(404, "Unknown document.")
+    job = document_jobs.latest(doc_id)
+    if manifest["finished"]:
+        status = {"status": "done", "progress": 1.0, "message": "Done"}
+    elif job is None:
+        status = {"status": "stopped", "progress": 0.0, "message": "Not running; send the document again to resume it."}
+    else:
+        status = {"status": job.status, "progress": job.progress, "message": job.message}
+        if job.error is not None:
+            status["error"] = str(job.error)
+    return web.json_response({**manifest, **status})
+
+async def handle_document_file(request):
+    doc_id = request.match_info["doc_id"]
+    name = request.match_info["name"]
+    manifest = long_document.load_manifest(doc_id)
+    if manifest is None:
+        return error_response(404, "Unknown document.")
+    names = {long_document.PLAYLIST_NAME, long_document.MANIFEST_NAME}
+    names.update(section["file"] for section in manifest["sections"])
+    if name not in names:
+        return error_response(404, "Unknown file.")
+    content_type = {".mp3": "audio/mpeg", ".m3u": "audio/x-mpegurl", ".json": "application/json"}[os.path.splitext(name)[1]]
+    return web.FileResponse(os.path.join(long_document.document_dir(doc_id), name), headers={"Content-Type": content_type})
+
+# Pick up long documents whose conversion was cut short by a crash or restart
+async def resume_documents(app):
+    for doc_id in long_document.unfinished_documents():
+        logger.info("Resuming document %s", doc_id)
+        start_document(doc_id)
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+def make_app():
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app.add_routes([
+        web.post("/v1/extract", handle_extract),
+        web.post("/v1/speech", handle_speech),
+        web.get("/v1/ws", handle_ws),
+        web.post("/v1/documents", handle_create_document),
+        web.get("/v1/documents/{doc_id:[0-9a-f]+}", handle_document_status),
+        web.get("/v1/documents/{doc_id:[0-9a-f]+}/{name}", handle_document_file),
+        web.get("/healthz", handle_health),
+    ])
+    app.on_startup.append(resume_documents)
+    return app
+
+# Serve from a background thread of this process (used when no external service is configured);
+# returns the base URL. Raises the server's startup error (e.g. the port is taken), or
+# TimeoutError if it has not started within timeout seconds.
+def start_service_thread(host=SERVICE_HOST, port=0, timeout=30):
+    started = threading.Event()
+    address = {}
+
+    def serve():
+        try:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            runner = web.AppRunner(make_app())
+            loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, host, port)
+            loop.run_until_complete(site.start())
+            address["port"] = runner.addresses[0][1]
+        except BaseException as e:
+            address["error"] = e  # Raised by the caller
+            return
+        finally:
+            started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True, name="tts-service").start()
+    if not started.wait(timeout):
+        raise TimeoutError(f"The TTS service did not start within {timeout} seconds")
+    if "error" in address:
+        raise address["error"]
+    return f"http://{host}:{address['port']}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the text-to-speech pipeline over HTTP and WebSocket.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    web.run_app(make_app(), host=args.host, port=args.port)
@@ -0,0 +1,135 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401  Much faster HTML parsing when installed
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Connect and read timeouts (seconds), and the whole-download deadline
+FETCH_TIMEOUT = (5, 10)
+FETCH_DEADLINE = 20
+# Pages larger than this are rejected while streaming, before they are fully downloaded
+FETCH_MAX_BYTES = 2 * 1024 * 1024
+# Number of URLs whose extracted text is kept for revalidation
+FETCH_CACHE_SIZE = 256
+
+# Elements that never hold article text
+NON_CONTENT_TAGS = ["script", "style", "noscript", "nav", "footer", "aside", "form", "iframe", "svg", "button"]
+
+class FetchError(Exception):
+    pass
+
+_session = None
+_session_lock = threading.Lock()
+_cache = OrderedDict()  # url -> (etag, last_modified, text)
+_cache_lock = threading.Lock()
+
+# One keep-alive session shared by every fetch in this process
+def shared_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=1)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session.headers["User-Agent"] = "Mozilla/5.0 (compatible; TeamIRJJ-TTS/1.0)"
+        return _session
+
+# Download the body of response, giving up once it exceeds max_bytes or the deadline passes
+def _read_capped(response, max_bytes, deadline):
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise FetchError("The page is too large to convert.")
+
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            raise FetchError("The page is too large to convert.")
+        if time.monotonic() > deadline:
+            raise FetchError("The page took too long to download.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+# Extract the readable article text from an HTML page, skipping scripts, menus and footers
+def extract_main_text(html, encoding=None):
+    soup = BeautifulSoup(html, HTML_PARSER, from_encoding=encoding)
+    for tag in soup(NON_CONTENT_TAGS):
+        tag.decompose()
+    # A <header> is the site banner, except inside an article where it holds the title and byline
+    for header in soup("header"):
+        if header.find_parent(["article", "main"]) is None:
+            header.decompose()
+
+    # Prefer an explicit article/main element; otherwise use the element holding the most paragraph text
+    container = soup.find("article") or soup.find("main") or soup.find(attrs={"role": "main"})
+    if container is None:
+        paragraph_text = {}
+        for paragraph in soup.find_all("p"):
+            parent = paragraph.parent
+            paragraph_text[parent] = paragraph_text.get(parent, 0) + len(paragraph.get_text(strip=True))
+        container = max(paragraph_text, key=paragraph_text.get) if paragraph_text else (soup.body or soup)
+
+    block_tags = ["h1", "h2", "h3", "p", "li", "blockquote"]
+    # Innermost blocks only, so a paragraph inside a list item is not read twice
+    blocks = [block for block in container.find_all(block_tags) if block.find(block_tags) is None] or [container]
+    lines = (re.sub(r"\s+", " ", block.get_text(" ", strip=True)) for block in blocks)
+    return "\n".join(line for line in lines if line)
+
+# Cache entry as the most recently used, evicting the oldest beyond FETCH_CACHE_SIZE
+def _remember(url, entry):
+    with _cache_lock:
+        _cache[url] = entry
+        _cache.move_to_end(url)
+        while len(_cache) > FETCH_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+# Fetch url and return its main text. Uses pooled connections, connect/read timeouts, a byte cap
+# while streaming, and a per-URL cache revalidated with ETag / Last-Modified.
+def fetch_article_text(url, max_bytes=FETCH_MAX_BYTES, timeout=FETCH_TIMEOUT, deadline_seconds=FETCH_DEADLINE):
+    with _cache_lock:
+        cached = _cache.get(url)
+
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    try:
+        with shared_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                # Store it again: another fetch may have evicted the entry since it was read
+                _remember(url, cached)
+                return cached[2]
+            if response.status_code != 200:
+                raise FetchError("Failed to fetch content from the URL. Please check the link and try again.")
+
+            content_type = response.headers.get("Content-Type", "text/html")
+            if "html" not in content_type and not content_type.startswith("text/"):
+                raise FetchError("The URL does not point to a web page.")
+
+            body = _read_capped(response, max_bytes, time.monotonic() + deadline_seconds)
+            # Only trust the charset when the server states one; otherwise let the parser read <meta charset>
+            encoding = response.encoding if "charset" in content_type else None
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except requests.RequestException as e:
+        raise FetchError(f"Error fetching text from URL: {e}") from e
+
+    text = extract_main_text(body, encoding) if "html" in content_type else body.decode(encoding or "utf-8", "replace")
+
+    if etag or last_modified:
+        _remember(url, (etag, last_modified, text))
+    return text